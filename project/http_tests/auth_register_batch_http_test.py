@@ -0,0 +1,40 @@
+import pytest
+import requests
+
+from src.config import url
+
+@pytest.fixture
+def owner():
+    requests.delete(url + "clear/v1")
+
+    return requests.post(url + "auth/register/v2", json={
+        "email": "validemail@gmail.com", "password": "123abc!@", "name_first": "Hayden", "name_last": "Everest"
+    }).json()
+
+
+def test_register_batch(owner):
+    response = requests.post(url + "auth/register/batch/v1", json={
+        "token": owner["token"], "users": [
+            {"email": "student0@gmail.com", "password": "123abc!@", "name_first": "Hayden", "name_last": "Everest"},
+            {"email": "invalid", "password": "123abc!@", "name_first": "Hayden", "name_last": "Everest"},
+        ]
+    })
+    assert response.status_code == 200
+    result = response.json()
+    assert [user["row"] for user in result["users"]] == [0]
+    assert result["errors"] == [{"row": 1, "error": "Invalid Email"}]
+
+    login = requests.post(url + "auth/login/v2", json={
+        "email": "student0@gmail.com", "password": "123abc!@"
+    })
+    assert login.json()["auth_user_id"] == result["users"][0]["auth_user_id"]
+
+def test_register_batch_not_owner(owner):
+    user = requests.post(url + "auth/register/v2", json={
+        "email": "anothervalidemail@gmail.com", "password": "123abc!@", "name_first": "M", "name_last": "J"
+    }).json()
+
+    response = requests.post(url + "auth/register/batch/v1", json={
+        "token": user["token"], "users": []
+    })
+    assert response.status_code == 403
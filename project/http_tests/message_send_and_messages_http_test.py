@@ -134,6 +134,28 @@ def test_110_messages_works(users, channels):
     assert message_list["start"] == 50
     assert message_list["end"] == 100
 
+def test_messages_before_cursor(users, channels):
+
+    list_of_message_ids = []
+    for x in range(60):
+        message_id = requests.post(url + "message/send/v2", json={
+            "token": users[0]["token"], "channel_id": channels[0], "message": f"test{x}"
+        }).json()["message_id"]
+        list_of_message_ids.append(message_id)
+
+    message_list = requests.get(url + "channel/messages/v2", params={
+        "token": users[0]["token"], "channel_id": channels[0], "start": 0,
+        "before": list_of_message_ids[10]}).json()
+
+    list_of_message_ids.reverse()
+    assert [message["message_id"] for message in message_list["messages"]] == list_of_message_ids[50:]
+    assert message_list["start"] == 50
+    assert message_list["end"] == -1
+
+    assert requests.get(url + "channel/messages/v2", params={
+        "token": users[0]["token"], "channel_id": channels[0], "start": 0,
+        "before": 42}).status_code == 400
+
 def test_messages_invalid_channel(users):
     assert requests.get(url + "channel/messages/v2", params={
         "token": users[0]["token"], "channel_id": 42, "start": 0}).status_code == 400
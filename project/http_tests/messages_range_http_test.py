@@ -0,0 +1,80 @@
+import pytest
+import requests
+import time
+
+from src.config import url
+
+@pytest.fixture
+def users():
+    requests.delete(url + "clear/v1")
+
+    users = []
+    for idx in range(2):
+        users.append(requests.post(url + "auth/register/v2", json={
+            "email": f"validemail{idx}@gmail.com", "password": "123abc!@", "name_first": "Hayden", "name_last": "Everest"
+        }).json())
+
+    return users
+
+
+def test_channel_messages_range(users):
+    channel_id = requests.post(url + "channels/create/v2", json={
+        "token": users[0]["token"], "name": "test", "is_public": True
+    }).json()["channel_id"]
+
+    now = int(time.time())
+    for idx in range(3):
+        requests.post(url + "message/send/v2", json={
+            "token": users[0]["token"], "channel_id": channel_id, "message": f"{idx}"
+        })
+
+    response = requests.get(url + "channel/messages/range/v1", params={
+        "token": users[0]["token"], "channel_id": channel_id, "time_start": now - 1, "time_end": now + 10
+    })
+    assert response.status_code == 200
+    assert [message["message"] for message in response.json()["messages"]] == ["2", "1", "0"]
+    assert response.json()["end"] == -1
+
+    assert requests.get(url + "channel/messages/range/v1", params={
+        "token": users[1]["token"], "channel_id": channel_id, "time_start": now - 1, "time_end": now + 10
+    }).status_code == 403
+
+def test_dm_messages_range(users):
+    dm_id = requests.post(url + "dm/create/v1", json={
+        "token": users[0]["token"], "u_ids": [users[1]["auth_user_id"]]
+    }).json()["dm_id"]
+
+    now = int(time.time())
+    requests.post(url + "message/senddm/v1", json={
+        "token": users[1]["token"], "dm_id": dm_id, "message": "hello"
+    })
+
+    response = requests.get(url + "dm/messages/range/v1", params={
+        "token": users[0]["token"], "dm_id": dm_id, "time_start": now - 1, "time_end": now + 10
+    })
+    assert [message["message"] for message in response.json()["messages"]] == ["hello"]
+
+    assert requests.get(url + "dm/messages/range/v1", params={
+        "token": users[0]["token"], "dm_id": dm_id, "time_start": now + 10, "time_end": now
+    }).status_code == 400
+
+def test_invalid_range_parameters(users):
+    channel_id = requests.post(url + "channels/create/v2", json={
+        "token": users[0]["token"], "name": "test", "is_public": True
+    }).json()["channel_id"]
+    dm_id = requests.post(url + "dm/create/v1", json={
+        "token": users[0]["token"], "u_ids": [users[1]["auth_user_id"]]
+    }).json()["dm_id"]
+
+    now = int(time.time())
+    for params in [{"time_end": now}, {"time_start": now - 10}, {"time_start": "soon", "time_end": now},
+                   {"time_start": now - 10, "time_end": now, "start": "abc"},
+                   {"time_start": now - 10, "time_end": now, "start": -1}]:
+        response = requests.get(url + "channel/messages/range/v1", params={
+            "token": users[0]["token"], "channel_id": channel_id, **params
+        })
+        assert response.status_code == 400
+        response = requests.get(url + "dm/messages/range/v1", params={
+            "token": users[0]["token"], "dm_id": dm_id, **params
+        })
+        assert response.status_code == 400
@@ -0,0 +1,62 @@
+import pytest
+import requests
+
+from src.config import url
+
+@pytest.fixture
+def users():
+    requests.delete(url + "clear/v1")
+
+    users = []
+    for idx in range(2):
+        users.append(requests.post(url + "auth/register/v2", json={
+            "email": f"validemail{idx}@gmail.com", "password": "123abc!@", "name_first": "Hayden", "name_last": "Everest"
+        }).json())
+
+    return users
+
+
+def test_channel_pins(users):
+    channel_id = requests.post(url + "channels/create/v2", json={
+        "token": users[0]["token"], "name": "test", "is_public": True
+    }).json()["channel_id"]
+
+    message_ids = []
+    for idx in range(3):
+        message_ids.append(requests.post(url + "message/send/v2", json={
+            "token": users[0]["token"], "channel_id": channel_id, "message": f"{idx}"
+        }).json()["message_id"])
+    for message_id in [message_ids[0], message_ids[2]]:
+        requests.post(url + "message/pin/v1", json={"token": users[0]["token"], "message_id": message_id})
+
+    response = requests.get(url + "channel/pins/v1", params={
+        "token": users[0]["token"], "channel_id": channel_id
+    })
+    assert response.status_code == 200
+    assert [message["message"] for message in response.json()["messages"]] == ["2", "0"]
+
+    assert requests.get(url + "channel/pins/v1", params={
+        "token": users[1]["token"], "channel_id": channel_id
+    }).status_code == 403
+    assert requests.get(url + "channel/pins/v1", params={
+        "token": users[0]["token"], "channel_id": channel_id + 1
+    }).status_code == 400
+
+
+def test_dm_pins(users):
+    dm_id = requests.post(url + "dm/create/v1", json={
+        "token": users[0]["token"], "u_ids": [users[1]["auth_user_id"]]
+    }).json()["dm_id"]
+
+    message_id = requests.post(url + "message/senddm/v1", json={
+        "token": users[1]["token"], "dm_id": dm_id, "message": "hello"
+    }).json()["message_id"]
+    requests.post(url + "message/pin/v1", json={"token": users[1]["token"], "message_id": message_id})
+
+    response = requests.get(url + "dm/pins/v1", params={"token": users[0]["token"], "dm_id": dm_id})
+    assert response.status_code == 200
+    assert [message["message_id"] for message in response.json()["messages"]] == [message_id]
+
+    assert requests.get(url + "dm/pins/v1", params={
+        "token": users[0]["token"], "dm_id": dm_id + 1
+    }).status_code == 400
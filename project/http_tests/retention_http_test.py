@@ -0,0 +1,64 @@
+import pytest
+import requests
+
+from src.config import url
+
+@pytest.fixture
+def users():
+    requests.delete(url + "clear/v1")
+
+    users = []
+    for idx in range(2):
+        users.append(requests.post(url + "auth/register/v2", json={
+            "email": f"validemail{idx}@gmail.com", "password": "123abc!@", "name_first": "Hayden", "name_last": "Everest"
+        }).json())
+
+    return users
+
+
+def test_channel_retention_set(users):
+    channel_id = requests.post(url + "channels/create/v2", json={
+        "token": users[0]["token"], "name": "test", "is_public": True
+    }).json()["channel_id"]
+
+    response = requests.put(url + "channel/retention/set/v1", json={
+        "token": users[0]["token"], "channel_id": channel_id, "seconds": 3600
+    })
+    assert response.status_code == 200
+    assert response.json() == {}
+
+    assert requests.put(url + "channel/retention/set/v1", json={
+        "token": users[0]["token"], "channel_id": channel_id, "seconds": None
+    }).status_code == 200
+    assert requests.put(url + "channel/retention/set/v1", json={
+        "token": users[0]["token"], "channel_id": channel_id, "seconds": 0
+    }).status_code == 400
+    assert requests.put(url + "channel/retention/set/v1", json={
+        "token": users[1]["token"], "channel_id": channel_id, "seconds": 3600
+    }).status_code == 403
+
+
+def test_dm_retention_set(users):
+    dm_id = requests.post(url + "dm/create/v1", json={
+        "token": users[0]["token"], "u_ids": [users[1]["auth_user_id"]]
+    }).json()["dm_id"]
+
+    assert requests.put(url + "dm/retention/set/v1", json={
+        "token": users[0]["token"], "dm_id": dm_id, "seconds": 3600
+    }).status_code == 200
+    assert requests.put(url + "dm/retention/set/v1", json={
+        "token": users[0]["token"], "dm_id": dm_id + 1, "seconds": 3600
+    }).status_code == 400
+    assert requests.put(url + "dm/retention/set/v1", json={
+        "token": users[1]["token"], "dm_id": dm_id, "seconds": 3600
+    }).status_code == 403
+
+
+def test_retention_sweep(users):
+    response = requests.post(url + "admin/retention/sweep/v1", json={"token": users[0]["token"]})
+    assert response.status_code == 200
+    assert response.json() == {"messages_removed": 0, "notifications_removed": 0, "reset_codes_removed": 0}
+
+    assert requests.post(url + "admin/retention/sweep/v1", json={
+        "token": users[1]["token"]
+    }).status_code == 403
@@ -0,0 +1,45 @@
+import pytest
+import requests
+import time
+
+from src.config import url
+
+@pytest.fixture
+def user():
+    requests.delete(url + "clear/v1")
+
+    u1 = requests.post(url + "/auth/register/v2", json={
+        "email": "validemail@gmail.com", "password": "123abc!@", "name_first": "Hayden", "name_last": "Everest" 
+    })
+
+    return u1.json()
+
+@pytest.fixture
+def channel(user):
+    return requests.post(url + "channels/create/v2", json={
+        "token": user['token'], "name": "test", "is_public": True
+    }).json()["channel_id"]
+
+
+def test_scheduler_status(user, channel):
+    assert requests.get(url + "scheduler/status/v1", params={"token": user["token"]}).json() == {
+        "queue_depth": 0, "next_due": None
+    }
+
+    send_time = int(time.time()) + 2
+    requests.post(url + "message/sendlater/v1", json={
+        "token": user["token"], "channel_id": channel, "message": "later", "time_sent": send_time
+    })
+    requests.post(url + "standup/start/v1", json={
+        "token": user["token"], "channel_id": channel, "length": 1
+    })
+
+    status = requests.get(url + "scheduler/status/v1", params={"token": user["token"]}).json()
+    assert status["queue_depth"] == 2
+    assert status["next_due"] <= send_time
+
+def test_scheduler_status_invalid_token(user):
+    assert requests.get(url + "scheduler/status/v1", params={
+        "token": "invalid token"}).status_code == 403
+
+    requests.delete(url + "clear/v1")
@@ -0,0 +1,66 @@
+import pytest
+import requests
+
+from src.config import url
+
+@pytest.fixture
+def users():
+    requests.delete(url + "clear/v1")
+
+    users = []
+    for idx in range(3):
+        users.append(requests.post(url + "auth/register/v2", json={
+            "email": f"validemail{idx}@gmail.com", "password": "123abc!@", "name_first": "Hayden", "name_last": "Everest"
+        }).json())
+
+    return users
+
+
+def test_user_and_users_stats(users):
+    channel_id = requests.post(url + "channels/create/v2", json={
+        "token": users[0]["token"], "name": "test", "is_public": True
+    }).json()["channel_id"]
+    message_id = requests.post(url + "message/send/v2", json={
+        "token": users[0]["token"], "channel_id": channel_id, "message": "hello"
+    }).json()["message_id"]
+    requests.post(url + "message/react/v1", json={
+        "token": users[0]["token"], "message_id": message_id, "react_id": 1
+    })
+
+    response = requests.get(url + "user/stats/v1", params={"token": users[0]["token"]})
+    assert response.status_code == 200
+    assert response.json()["user_stats"] == {
+        "channels_joined": 1, "dms_joined": 0, "messages_sent": 1,
+        "reacts_given": 1, "reacts_received": 1, "involvement_rate": 1,
+    }
+
+    response = requests.get(url + "users/stats/v1", params={"token": users[1]["token"]})
+    assert response.status_code == 200
+    assert response.json()["dreams_stats"] == {"channels_exist": 1, "dms_exist": 0, "messages_exist": 1}
+
+    assert requests.get(url + "user/stats/v1", params={"token": "invalid"}).status_code == 403
+
+
+def test_channel_and_dm_stats(users):
+    channel_id = requests.post(url + "channels/create/v2", json={
+        "token": users[0]["token"], "name": "test", "is_public": True
+    }).json()["channel_id"]
+    dm_id = requests.post(url + "dm/create/v1", json={
+        "token": users[0]["token"], "u_ids": [users[1]["auth_user_id"]]
+    }).json()["dm_id"]
+    requests.post(url + "message/senddm/v1", json={"token": users[1]["token"], "dm_id": dm_id, "message": "hi"})
+
+    response = requests.get(url + "channel/stats/v1", params={"token": users[0]["token"], "channel_id": channel_id})
+    assert response.status_code == 200
+    assert response.json()["channel_stats"] == {"messages_sent": 0, "messages_exist": 0, "members": 1}
+
+    response = requests.get(url + "dm/stats/v1", params={"token": users[1]["token"], "dm_id": dm_id})
+    assert response.status_code == 200
+    assert response.json()["dm_stats"] == {"messages_sent": 1, "messages_exist": 1, "members": 2}
+
+    assert requests.get(url + "channel/stats/v1", params={
+        "token": users[2]["token"], "channel_id": channel_id
+    }).status_code == 403
+    assert requests.get(url + "dm/stats/v1", params={
+        "token": users[0]["token"], "dm_id": dm_id + 1
+    }).status_code == 400
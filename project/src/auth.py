@@ -1,12 +1,14 @@
-import re
+import time
 import hashlib
-import jwt
 from uuid import uuid4
 import os
 import smtplib
 from email.mime.text import MIMEText
 from .error import InputError, AccessError
-from .data import users, sessions, reset_codes
+from .data import users, reset_codes
+from .store import add_user, get_user, get_user_by_email, allocate_handle, EMAIL_PATTERN
+from .locks import locks_registry, store_mutation, registry_lock
+from .ids import next_id
 import src.other
 
 EMAIL_ADDRESS = "wed11b.echo@gmail.com"
@@ -31,9 +33,7 @@ def auth_login_v1(email, password):
         Returns the user's auth_user_id in a dictionary
     '''
 
-    # Regular expression for validating an Email
-    regex = '^[a-zA-Z0-9]+[\\._]?[a-zA-Z0-9]+[@]\\w+[.]\\w{2,3}$'
-    if not re.search(regex, email):
+    if not EMAIL_PATTERN.search(email):
         raise InputError(description="Invalid Email")
 
     u_id = False
@@ -49,6 +49,7 @@ def auth_login_v1(email, password):
     }
 
 
+@locks_registry
 def auth_register_v1(email, password, name_first, name_last):
     '''
     Given a user's first and last name, email address, and password, create a new
@@ -78,9 +79,7 @@ def auth_register_v1(email, password, name_first, name_last):
         Returns a new auth_user_id assigned to the registered user in a dictionary
     '''
 
-    # Regular expression for validating an Email
-    regex = '^[a-zA-Z0-9]+[\\._]?[a-zA-Z0-9]+[@]\\w+[.]\\w{2,3}$'
-    if not re.search(regex, email):
+    if not EMAIL_PATTERN.search(email):
         raise InputError(description="Invalid Email")
 
     if len(password) < 6:
@@ -105,27 +104,8 @@ def auth_register_v1(email, password, name_first, name_last):
     if len(handle) > 20:
         handle = handle[:20]
 
-    flag = False
-    for user in users:
-        if user['handle_str'] == handle:
-            flag = True
-
-    count = 0
-    p_handle = handle
-    while flag == True:
-        flag = False
-        if len(p_handle) >= 20:
-            length = 20 - len(str(count))
-            handle = p_handle[:length]
-        p_handle = handle + str(count)
-
-        for user in users:
-            if user['handle_str'] == p_handle:
-                flag = True
-                count = count + 1
-
-    handle = p_handle
-    u_id = len(users) + 1
+    handle = allocate_handle(handle)
+    u_id = next_id("users")
 
     if u_id == 1:
         permission_id = 1
@@ -142,24 +122,25 @@ def auth_register_v1(email, password, name_first, name_last):
         'permission_id': permission_id,
     }
 
-    users.append(new_user)
+    add_user(new_user)
 
     return {
         'auth_user_id': u_id,
     }
 
 
-def auth_register_v2(email, password, name_first, name_last):
+def create_user(email, password, name_first, name_last):
     '''
-Given a user's first and last name, email address, and password, 
-creates a new account for them and returns a new `token` for that session.
+    Validates a new user's details, generates their handle and adds them to Dreams.
+    Shared by auth_register_v2 and register_users, which persist the new user and
+    decide whether to start a session.
 
     Arguments:
         email :: [str] - The user's email address.
         password :: [str] - The user's password.
         name_first :: [str] - The user's first name
         name_last :: [str] - The user's last name
-    
+
     Exceptions:
         InputError - Occurs when:
             - Email entered is not a valid email
@@ -167,14 +148,18 @@ creates a new account for them and returns a new `token` for that session.
             - Password entered is less than 6 characters long
             - name_first is not between 1 and 50 characters inclusively in length
             - name_last is not between 1 and 50 characters inclusively in length
-    
+            - email, password, name_first or name_last is not a string
+
     Return Value:
-        Returns a new session token and a new auth_user_id assigned to the registered user in a dictionary 
+        new_user :: [dict] - the user that was added
     '''
 
-    # Regular expression for validating an Email
-    regex = '^[a-zA-Z0-9]+[\\._]?[a-zA-Z0-9]+[@]\\w+[.]\\w{2,3}$'
-    if not re.search(regex, email):
+    # Rows registered in bulk come straight from JSON, so could hold anything
+    for field, value in [("email", email), ("password", password), ("name_first", name_first), ("name_last", name_last)]:
+        if not isinstance(value, str):
+            raise InputError(description=f"{field} must be a string")
+
+    if not EMAIL_PATTERN.search(email):
         raise InputError(description="Invalid Email")
 
     if len(password) < 6:
@@ -186,10 +171,8 @@ creates a new account for them and returns a new `token` for that session.
     if name_first == "Removed" and name_last == "user":
         raise InputError(description="Name cannot be Removed user")
 
-    for user in users:
-        if user['email'].lower() == email.lower() and not \
-        (user["name_first"] == "Removed" and user["name_last"] == "user"):
-            raise InputError(description="Email address already in use")
+    if get_user_by_email(email) is not None:
+        raise InputError(description="Email address already in use")
 
     l_first = name_first.lower()
     l_first = l_first.replace(' ', '')
@@ -202,27 +185,8 @@ creates a new account for them and returns a new `token` for that session.
     if len(handle) > 20:
         handle = handle[:20]
 
-    flag = False
-    for user in users:
-        if user['handle_str'] == handle:
-            flag = True
-
-    count = 0
-    p_handle = handle
-    while flag == True:
-        flag = False
-        if len(p_handle) >= 20:
-            length = 20 - len(str(count))
-            handle = p_handle[:length]
-        p_handle = handle + str(count)
-
-        for user in users:
-            if user['handle_str'] == p_handle:
-                flag = True
-                count = count + 1
-
-    handle = p_handle
-    u_id = len(users) + 1
+    handle = allocate_handle(handle)
+    u_id = next_id("users")
 
     if u_id == 1:
         permission_id = 1
@@ -246,22 +210,44 @@ creates a new account for them and returns a new `token` for that session.
         'salt': salt
     }
 
-    users.append(new_user)
+    add_user(new_user)
 
-    # Generates a token for the user
-    secret = src.other.get_secret()
-    session_id = uuid4().hex
-    token = jwt.encode({"session_id": session_id}, secret, algorithm="HS256")
-
-    # Adds the session id to the list of logged in users
-    session_details = {
-        "session_id": session_id,
-        "u_id": u_id
-    }
-    sessions.append(session_details)
+    return new_user
+
+
+@locks_registry
+def auth_register_v2(email, password, name_first, name_last):
+    '''
+Given a user's first and last name, email address, and password, 
+creates a new account for them and returns a new `token` for that session.
+
+    Arguments:
+        email :: [str] - The user's email address.
+        password :: [str] - The user's password.
+        name_first :: [str] - The user's first name
+        name_last :: [str] - The user's last name
+    
+    Exceptions:
+        InputError - Occurs when:
+            - Email entered is not a valid email
+            - Email address is already being used by another user
+            - Password entered is less than 6 characters long
+            - name_first is not between 1 and 50 characters inclusively in length
+            - name_last is not between 1 and 50 characters inclusively in length
+            - email, password, name_first or name_last is not a string
+    
+    Return Value:
+        Returns a new session token and a new auth_user_id assigned to the registered user in a dictionary 
+    '''
+
+    new_user = create_user(email, password, name_first, name_last)
+    u_id = new_user['u_id']
 
     # Write temp data to json file for persistence
-    src.other.update_data_write()
+    src.other.update_data_append({"op": "user_add", "user": new_user})
+
+    # Generates a token for the user
+    token = src.other.start_session(u_id)
 
     return {
         "token": token,
@@ -269,6 +255,89 @@ creates a new account for them and returns a new `token` for that session.
     }
 
 
+@locks_registry
+def register_users(rows):
+    '''
+    Registers many users in a single pass. Each row is checked on its own, so a row
+    with invalid details is reported and skipped without stopping the rest. No
+    sessions are started, and the data store is persisted once at the end rather
+    than once per user.
+
+    Arguments:
+        rows :: [iterable] - dictionaries containing email, password, name_first and
+            name_last, one per user
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        (dict) containing:
+            - users (list of dictionaries containing the row number, counting from 0,
+              and the auth_user_id of each user registered)
+            - errors (list of dictionaries containing the row number and a description
+              of why each row which was skipped could not be registered)
+    '''
+
+    registered = []
+    errors = []
+
+    for row_number, row in enumerate(rows):
+        try:
+            new_user = create_user(row["email"], row["password"], row["name_first"], row["name_last"])
+        except InputError as error:
+            errors.append({"row": row_number, "error": error.description})
+            continue
+        except KeyError as error:
+            errors.append({"row": row_number, "error": f"Missing {error.args[0]}"})
+            continue
+        except TypeError:
+            errors.append({"row": row_number, "error": "Row is not a valid user"})
+            continue
+
+        registered.append({"row": row_number, "auth_user_id": new_user["u_id"]})
+
+    if registered:
+        src.other.update_data_write()
+
+    return {
+        "users": registered,
+        "errors": errors,
+    }
+
+
+def auth_register_batch_v1(token, users):
+    '''
+    Given a list of users' details, registers each of them (see register_users).
+    Only Dreams owners can register users in bulk.
+
+    Arguments:
+        token :: [str] - session token of the Dreams owner
+        users :: [list] - dictionaries containing email, password, name_first and
+            name_last, one per user
+
+    Exceptions:
+        InputError - Occurs when:
+            - users is not a list
+        AccessError - Occurs when:
+            - token is invalid
+            - the authorised user is not a Dreams owner
+
+    Return Value:
+        (dict) containing users and errors, see register_users
+    '''
+
+    auth_user_id = src.other.check_session_id(token)
+
+    if get_user(auth_user_id)["permission_id"] != 1:
+        raise AccessError(description="The authorised user is not an owner")
+
+    if not isinstance(users, list):
+        raise InputError(description="users must be a list")
+
+    return register_users(users)
+
+
+@locks_registry
 def auth_login_v2(email, password):
     '''
     Given a registered user's email and password and returns their 'auth_user_id' value
@@ -287,50 +356,24 @@ def auth_login_v2(email, password):
         Returns the user's auth_user_id and a new session token in a dictionary
     '''
 
-    # Regular expression for validating an Email
-    regex = '^[a-zA-Z0-9]+[\\._]?[a-zA-Z0-9]+[@]\\w+[.]\\w{2,3}$'
-    if not re.search(regex, email):
+    if not EMAIL_PATTERN.search(email):
         raise InputError(description="Invalid Email")
 
-    email = email.lower()
-    salt = False
-    for user in users:
-        if user['email'].lower() == email:
-            salt = user['salt']
-            name_first = user['name_first']
-            name_last = user['name_last']
-
-    if salt == False:
+    # Removed users are not in the email index, so they can not log in
+    user = get_user_by_email(email)
+    if user is None:
         raise InputError(description="Invalid details")
 
-    password = password + salt
+    password = password + user['salt']
     password_hash = hashlib.sha256(password.encode()).hexdigest()
 
-    u_id = False
-    for user in users:
-        if user['email'].lower() == email and user['password_hash'] == password_hash:
-            u_id = user['u_id']
-
-    if u_id == False:
+    if user['password_hash'] != password_hash:
         raise InputError(description="Invalid details")
 
-    if name_first == "Removed" and name_last == "user":
-        raise InputError(description="Invalid details")
+    u_id = user['u_id']
 
     # Generates a token for the user
-    secret = src.other.get_secret()
-    session_id = uuid4().hex
-    token = jwt.encode({"session_id": session_id}, secret, algorithm="HS256")
-
-    # Adds the session id to the list of logged in users
-    session_details = {
-        "session_id": session_id,
-        "u_id": u_id
-    }
-    sessions.append(session_details)
-
-    # Write temp data to json file for persistence
-    src.other.update_data_write()
+    token = src.other.start_session(u_id)
 
     return {
         "token": token,
@@ -338,6 +381,7 @@ def auth_login_v2(email, password):
     }
 
 
+@locks_registry
 def auth_logout_v1(token):
     '''
     Given an active token, invalidates the token to log the user out. If a valid token is given, 
@@ -354,31 +398,9 @@ def auth_logout_v1(token):
         Returns True if user is successfully logged out, else returns False
     '''
 
-    secret = src.other.get_secret()
+    # Raises AccessError if the token is invalid or already logged out
+    src.other.end_session(token)
 
-    # Raises AccessError if the decoding fails due to signature error
-    try:
-        decoded = jwt.decode(token, secret, algorithms=['HS256'])
-    except Exception:
-        raise AccessError(description="Invalid token") from Exception
-
-    session_id = decoded["session_id"]
-    logged_in = False
-    new_session_list = []
-    for user in sessions:
-        if user["session_id"] != session_id:
-            new_session_list.append(user)
-        else:
-            logged_in = True
-
-    if logged_in == False:
-        raise AccessError(description="Not logged in")
-
-    # This rebuilds the sessions list without the logged out user
-    sessions.clear()
-    sessions.extend(new_session_list)
-
-    src.other.update_data_write()
     return {
         "is_success": True
     }
@@ -399,14 +421,12 @@ def auth_passwordreset_request_v1(email):
         {}
     '''
 
-    u_id = False
-    for user in users:
-        if user["email"] == email:
-            u_id = user["u_id"]
-    
-    if u_id == False:
+    user = get_user_by_email(email)
+    if user is None:
         return {}
 
+    u_id = user["u_id"]
+
     code = (uuid4().hex)[:16]
     # Salts and Hashes the password
     salt = hashlib.sha256(os.urandom(60)).hexdigest()
@@ -425,15 +445,19 @@ def auth_passwordreset_request_v1(email):
     mail.sendmail(EMAIL_ADDRESS, email, msg.as_string())
     mail.close()
 
-    reset_codes.append({
-        "u_id": u_id,
-        "code": code_hash,
-        "salt": salt
-    })
-    src.other.update_data_write()
+    # The registry is only locked once the email has been sent
+    with store_mutation(registry_lock):
+        reset_codes.append({
+            "u_id": u_id,
+            "code": code_hash,
+            "salt": salt,
+            "time_created": int(time.time())
+        })
+        src.other.update_data_write()
     return {
     }
 
+@locks_registry
 def auth_passwordreset_reset_v1(reset_code, new_password):
     '''
     Given a reset code for a user, set that user's new password to the password provided
@@ -468,10 +492,9 @@ def auth_passwordreset_reset_v1(reset_code, new_password):
     password = new_password + salt
     password_hash = hashlib.sha256(password.encode()).hexdigest()
 
-    for user in users:
-        if user["u_id"] == u_id:
-            user["password_hash"] = password_hash
-            user["salt"] = salt
+    user = get_user(u_id)
+    user["password_hash"] = password_hash
+    user["salt"] = salt
     src.other.update_data_write()
     return {
     }
\ No newline at end of file
@@ -0,0 +1,204 @@
+import sys
+import time
+import random
+import itertools
+import tracemalloc
+
+from src.data import message_words
+from src.records import MessageRecord
+from src.store import index_message_text, search_index_state
+
+USAGE = "Usage: python3 -m src.benchmark_messages [COUNT]\n" \
+    "Compares the memory used by COUNT messages (default 100000) stored as dicts and as records,\n" \
+    "and measures the memory the search index uses for them"
+
+# Number of distinct words the texts of the search index benchmark are made from
+VOCABULARY_SIZE = 5000
+
+EPOCH = 1609459200
+
+
+def dict_message(message_id, u_id, text, time_created):
+    '''
+    Builds a message as a dict
+
+    Arguments:
+        message_id :: [int] - id of the message
+        u_id :: [int] - id of the sender
+        text :: [str] - the message
+        time_created :: [int] - unix timestamp the message was sent
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        message :: [dict] - the message
+    '''
+
+    return {
+        "message_id": message_id,
+        "u_id": u_id,
+        "message": text,
+        "time_created": time_created,
+        "reacts": {},
+        "is_pinned": False
+    }
+
+
+def record_message(message_id, u_id, text, time_created):
+    '''
+    Builds a message as a record
+
+    Arguments:
+        message_id :: [int] - id of the message
+        u_id :: [int] - id of the sender
+        text :: [str] - the message
+        time_created :: [int] - unix timestamp the message was sent
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        message :: [MessageRecord] - the message
+    '''
+
+    return MessageRecord(message_id, u_id, text, time_created, {}, False)
+
+
+def measure(make_message, texts):
+    '''
+    Measures the memory used by a channel's list of messages in one layout. The text
+    of each message is made beforehand as it costs the same in every layout.
+
+    Arguments:
+        make_message :: [function] - builds a message in the layout being measured
+        texts :: [list] - the text of each message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        (tuple) of the number of bytes allocated and the seconds taken to build the messages
+    '''
+
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    messages = [
+        make_message((idx + 1) << 12, idx % 100 + 1, text, EPOCH + idx)
+        for idx, text in enumerate(texts)
+    ]
+
+    seconds = time.perf_counter() - start
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Kept alive until here so nothing is freed before it is measured
+    del messages
+
+    return allocated, seconds
+
+
+def sample_texts(count, length=200):
+    '''
+    Makes the text of count messages, each about length characters of words picked
+    from a vocabulary, common words being picked far more often than rare ones as in
+    real messages. The same texts are made every time.
+
+    Arguments:
+        count :: [int] - number of texts
+        length :: [int] - number of characters in each text
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        texts :: [list] - the texts
+    '''
+
+    picker = random.Random(1531)
+    vocabulary = [f"w{idx}" for idx in range(VOCABULARY_SIZE)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(VOCABULARY_SIZE)))
+
+    texts = []
+    for _ in range(count):
+        # Every word is at least 2 characters and a space long
+        text = " ".join(picker.choices(vocabulary, cum_weights=cum_weights, k=length // 3))
+        texts.append(text[:length])
+
+    return texts
+
+
+def measure_search_index(texts):
+    '''
+    Measures the memory the search index uses for messages with the given texts. The
+    search index must be empty, and is emptied again afterwards.
+
+    Arguments:
+        texts :: [list] - the text of each message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        allocated :: [int] - number of bytes the search index allocated
+    '''
+
+    messages = [
+        MessageRecord((idx + 1) << 12, 1, text, EPOCH + idx, {}, False)
+        for idx, text in enumerate(texts)
+    ]
+
+    tracemalloc.start()
+    for message in messages:
+        index_message_text(message)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    message_words.clear()
+    search_index_state["entries"] = 0
+
+    return allocated
+
+
+def run_benchmark(count):
+    '''
+    Measures both layouts
+
+    Arguments:
+        count :: [int] - number of messages to store
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        results :: [dict] - layout name -> (bytes allocated, seconds taken)
+    '''
+
+    texts = [f"message number {idx}" for idx in range(count)]
+
+    return {
+        "dict": measure(dict_message, texts),
+        "record": measure(record_message, texts),
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 or (len(sys.argv) == 2 and not sys.argv[1].isdigit()):
+        print(USAGE, file=sys.stderr)
+        sys.exit(2)
+
+    count = int(sys.argv[1]) if len(sys.argv) == 2 else 100000
+
+    results = run_benchmark(count)
+
+    print(f"{count} messages, excluding their text")
+    for layout, (allocated, seconds) in results.items():
+        print(f"{layout:>8}: {allocated / 2 ** 20:8.1f} MiB  "
+              f"{allocated / count:6.1f} bytes/message  {seconds:6.3f}s to build")
+
+    texts = sample_texts(count)
+    allocated = measure_search_index(texts)
+    text_bytes = sum(len(text) for text in texts)
+    print(f"search index for {count} messages of 200 characters: {allocated / 2 ** 20:8.1f} MiB  "
+          f"{allocated / count:6.1f} bytes/message  {allocated / text_bytes:4.1f}x the text")
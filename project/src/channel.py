@@ -1,8 +1,13 @@
-from src.data import users, channels
 from src.error import InputError, AccessError
-from src.other import update_data_write, check_session_id, notifications_added
+from src.other import update_data_write, check_session_id, check_message_range, notifications_added
+from src.store import get_user, get_channel, is_member, is_owner, is_removed, message_position, \
+    add_member, remove_member, add_owner, remove_owner, member_profiles, messages_between, \
+    message_details, live_count, newer_count, messages_page, pinned_in
+from src.locks import locks_channel, reads_channel
+from src.retention import check_retention_seconds
 
 
+@locks_channel
 def channel_invite_v1(auth_user_id, channel_id, u_id):
     '''
     Invites a user (with user id u_id) to join a channel with
@@ -33,54 +38,34 @@ def channel_invite_v1(auth_user_id, channel_id, u_id):
         raise InputError(description='channel_id has to be an integer')
 
     # Find the details of the user
-    user_found = False
-    for user in users:
-        if user['u_id'] == u_id:
-            if not (user['name_first'] == "Removed" and user['name_last'] == "user"):
-                user_found = True
-                userdata = {
-                    'u_id': u_id,
-                    'email': user['email'],
-                    'name_first': user['name_first'],
-                    'name_last': user['name_last'],
-                    'handle_str': user['handle_str'],
-                }
+    user = get_user(u_id)
 
     # Not a valid user
-    if user_found == False:
+    if user is None or is_removed(user):
         raise InputError(description=f"{u_id} is not a valid user ID")
 
-    auth_user_found = False
-    invalid_channel = True
-    for channel in channels:
-        for member in channel['all_members']:
-            if member['u_id'] == auth_user_id:
-                auth_user_found = True
-        if channel['id'] == channel_id:
-            invalid_channel = False
-    
+    channel = get_channel(channel_id)
+
     # Not a valid channel
-    if invalid_channel == True:
+    if channel is None:
         raise InputError(description="Channel id is invalid")
 
     # Authorised user is not already a member of the channel
-    if auth_user_found == False:
+    if is_member(channel, auth_user_id) == False:
         raise AccessError(description=f"{auth_user_id} is not a member of this channel")
 
-    for channel in channels:
-        if channel['id'] == channel_id:
-            # Function does nothing if the user is already a member of the channel
-            for member in channel['all_members']:
-                if member['u_id'] == u_id:
-                    return {
-                    }
+    # Function does nothing if the user is already a member of the channel
+    if is_member(channel, u_id) == True:
+        return {
+        }
 
-            channel['all_members'].append(userdata)
+    add_member(channel, u_id)
 
     notifications_added(channel_id, auth_user_id, [u_id], True)
     return {}
 
 
+@reads_channel
 def channel_details_v1(auth_user_id, channel_id):
     """
     Given a Channel with ID channel_id that the authorised user, with ID auth_user_id 
@@ -111,51 +96,30 @@ def channel_details_v1(auth_user_id, channel_id):
     if not type(auth_user_id) == int:
         raise AccessError(description='auth_user_id has to be an integer')
 
-    valid_user_id = False
-
-    for user in users:
-        if user['u_id'] == auth_user_id:
-            valid_user_id = True
-    
-    if valid_user_id == False:
+    if get_user(auth_user_id) is None:
         raise AccessError(description='auth_user_id does not belong to any user')
 
     if not type(channel_id) == int:
         raise InputError(description='channel_id has to be an integer')
     
-    valid_channel_id = False
-    channel_name = ''
-    list_all_members = []
-    list_owner_members = []
-
-    for channel in channels:
-        if channel['id'] == channel_id:
-            valid_channel_id = True
-            channel_name = channel['name']
-            list_owner_members = channel['owner_members']
-            list_all_members = channel['all_members']
-            is_public = channel['is_public']
-
-    if valid_channel_id == False:
-        raise InputError(description='channel_id does not refer to any channel')    
+    channel = get_channel(channel_id)
 
-    is_member = False
-    for member in list_all_members:
-        if member['u_id'] == auth_user_id:
-            is_member = True
+    if channel is None:
+        raise InputError(description='channel_id does not refer to any channel')    
 
-    if is_member == False:
+    if is_member(channel, auth_user_id) == False:
         raise AccessError(description='Authorised user is not a member of channel')
 
     return {
-        'name': channel_name,
-        'is_public': is_public,
-        'owner_members': list_owner_members,
-        'all_members': list_all_members
+        'name': channel['name'],
+        'is_public': channel['is_public'],
+        'owner_members': member_profiles(channel['owner_members']),
+        'all_members': member_profiles(channel['all_members'])
     }
 
 
-def channel_messages_v1(auth_user_id, channel_id, start):
+@reads_channel
+def channel_messages_v1(auth_user_id, channel_id, start, before=None):
     '''
     Given a Channel with ID channel_id that the authorised user is part of, return up to 50 messages 
     between index "start" and "start + 50". Message with index 0 is the most recent message in the channel. 
@@ -167,10 +131,14 @@ def channel_messages_v1(auth_user_id, channel_id, start):
         auth_user_id :: [int] - the user id of user who is calling the function
         channel_id :: [int] - the id of the channel whose messages are to be provided
         start :: [int] - the starting index to return the messages from
+        before :: [int] - optional message_id, if given the page starts at the message
+            sent just before it and start is ignored
     Exceptions:
         InputError - occurs when:
             - Channel ID is not a valid channel
+            - Start is negative
             - Start is greater than the total number of messages in the channel
+            - before does not refer to a message in the channel
         AccessError - occurs when:
             - Authorised user is not a member of channel with channel_id
             - auth_user_id is not valid    
@@ -185,65 +153,39 @@ def channel_messages_v1(auth_user_id, channel_id, start):
     if not type(auth_user_id) == int:
         raise AccessError(description="auth_user_id has to be an integer")
 
-    valid_id = False
-
-    for user in users:
-        if user['u_id'] == auth_user_id:
-            valid_id = True
-
-    if valid_id == False:
+    if get_user(auth_user_id) is None:
         raise AccessError(description="auth_user_id does not belong to any user")
     
-    this_channel = False
-    auth_user_in_channel = False
-    end = start + 50
     total_messages = 0
     messages = []
     
-    for channel in channels:
-        if channel['id'] == channel_id:
-            this_channel = channel
+    this_channel = get_channel(channel_id)
 
-    if this_channel == False:
+    if this_channel is None:
         raise InputError(description='channel_id does not refer to any existing channel')
 
-
-    for auth_user in this_channel['all_members']:
-        if auth_user_id == auth_user['u_id']:
-            auth_user_in_channel = True
+    auth_user_in_channel = is_member(this_channel, auth_user_id)
     
-    total_messages = len(this_channel['messages'])
-    if start > total_messages:
-        raise InputError(description="Start is greater than total number of messages")
+    total_messages = live_count(this_channel)
 
-    r_messages_list = this_channel['messages'].copy()
-    r_messages_list.reverse()
-
-    counter = start
-    while counter < total_messages and counter < end:
-        is_this_user_reacted = False
-        if auth_user_id in r_messages_list[counter]["reacts"]:
-            is_this_user_reacted = True
-        reacts = [
-            {
-                "react_id": 1,
-                "u_ids": r_messages_list[counter]["reacts"],
-                "is_this_user_reacted": is_this_user_reacted
-            }
-        ]
-
-        append_this = {
-            "message_id": r_messages_list[counter]["message_id"],
-            "u_id": r_messages_list[counter]["u_id"],
-            "message": r_messages_list[counter]["message"],
-            "time_created": r_messages_list[counter]["time_created"],
-            "reacts": reacts,
-            "is_pinned": r_messages_list[counter]["is_pinned"]
-        }
+    # A cursor replaces start with the index of the message just after it
+    if before is not None:
+        position = message_position(this_channel, before)
+        if position is None:
+            raise InputError(description="before does not refer to a message in this channel")
+        start = newer_count(this_channel, position)
 
-        messages.append(append_this)
-        counter = counter + 1
+    if start < 0:
+        raise InputError(description="Start cannot be negative")
 
+    if start > total_messages:
+        raise InputError(description="Start is greater than total number of messages")
+
+    # Message with index 0 is the most recent message, so a page is read backwards
+    # from the newest message without copying or reversing the list
+    end = start + 50
+    for message in messages_page(this_channel, start, 50):
+        messages.append(message_details(message, auth_user_id))
 
     if end >= total_messages:
         end = -1
@@ -260,6 +202,7 @@ def channel_messages_v1(auth_user_id, channel_id, start):
     }
 
 
+@locks_channel
 def channel_leave_v1(token, channel_id):
     """
     Given a channel ID, the user removed as a member of this channel. 
@@ -285,38 +228,23 @@ def channel_leave_v1(token, channel_id):
     except Exception:
         raise AccessError(description="Invalid token") from Exception
 
-    valid_channel = False
-    for channel in channels:
-        if channel['id'] == channel_id:
-            valid_channel = True
-            list_owners = channel['owner_members']
-            list_members = channel['all_members']
-
-    if valid_channel == False:
+    channel = get_channel(channel_id)
+    if channel is None:
         raise InputError(description=f"{channel_id} is not a valid channel")
 
-    valid_member = False
-    for idx, member in enumerate(list_members):
-        if member['u_id'] == auth_user_id:
-            valid_member = True
-            member_at_index = idx
-
-    if valid_member == False:
+    if is_member(channel, auth_user_id) == False:
         raise AccessError(description="The authorised user is not a member of the channel")
 
-    # remove the member from the list of all members
-    del list_members[member_at_index]
-
-    # remove the member from the list of owners, if they are an owner of the channel
-    for idx, owner in enumerate(list_owners):
-        if owner['u_id'] == auth_user_id:
-            del list_owners[idx]
+    # remove the member from the list of all members, and from the list of owners
+    # if they are an owner of the channel
+    remove_member(channel, auth_user_id)
 
     update_data_write()
     
     return {}
 
 
+@locks_channel
 def channel_join_v1(auth_user_id, channel_id):
     '''
     Given a channel_id of a channel that the authorised user can join, adds them to that channel
@@ -337,46 +265,25 @@ def channel_join_v1(auth_user_id, channel_id):
     if not type(auth_user_id) == int:
         raise AccessError(description='auth_user_id has to be an integer')
 
-    valid_id = False
-
-    for user in users:
-        if user['u_id'] == auth_user_id:
-            valid_id = True
+    userdata = get_user(auth_user_id)
     
-    if valid_id == False:
+    if userdata is None:
         raise AccessError(description='auth_user_id does not belong to any user')
 
-    for user in users:
-        if user['u_id'] == auth_user_id:
-            userdata = user
-
-    new_user = {
-        'u_id': userdata['u_id'],
-        'email': userdata['email'],
-        'name_first': userdata['name_first'],
-        'name_last': userdata['name_last'],
-        'handle_str': userdata['handle_str'],
-    }
-
-    flag = False
-    for channel in channels:
-        if channel['id'] == channel_id:
-            # Function does nothing if the user is already a member of the channel
-            for member in channel['all_members']:
-                if member['u_id'] == new_user['u_id']:
-                    return {
-                    }
+    channel = get_channel(channel_id)
+    if channel is None:
+        raise InputError(description="Channel ID is not a valid channel")
 
-            if channel['is_public'] == False and userdata['permission_id'] != 1:
-                raise AccessError(description="Channel is private")
+    # Function does nothing if the user is already a member of the channel
+    if is_member(channel, auth_user_id) == True:
+        return {
+        }
 
-            # Adds the new member to the channel 
-            channel['all_members'].append(new_user)
-            flag = True
-            break
+    if channel['is_public'] == False and userdata['permission_id'] != 1:
+        raise AccessError(description="Channel is private")
 
-    if flag == False:
-        raise InputError(description="Channel ID is not a valid channel")
+    # Adds the new member to the channel 
+    add_member(channel, auth_user_id)
 
     return {
     }
@@ -442,7 +349,7 @@ def channel_details_v2(token, channel_id):
     return details
 
 
-def channel_messages_v2(token, channel_id, start):
+def channel_messages_v2(token, channel_id, start, before=None):
     '''
     Given a Channel with ID channel_id that the authorised user is part of, return up to 50 messages 
     between index "start" and "start + 50". Message with index 0 is the most recent message in the channel. 
@@ -454,10 +361,14 @@ def channel_messages_v2(token, channel_id, start):
         token :: [str] - session token for the logged in user calling the function
         channel_id :: [int] - the id of the channel whose messages are to be provided
         start :: [int] - the starting index to return the messages from
+        before :: [int] - optional message_id, if given the page starts at the message
+            sent just before it and start is ignored
     Exceptions:
         InputError - occurs when:
             - Channel ID is not a valid channel
+            - Start is negative
             - Start is greater than the total number of messages in the channel
+            - before does not refer to a message in the channel
         AccessError - occurs when:
             - Authorised user is not a member of channel with channel_id
             - Token is not valid    
@@ -471,11 +382,146 @@ def channel_messages_v2(token, channel_id, start):
 
     u_id = check_session_id(token)
 
-    return_value = channel_messages_v1(u_id, channel_id, start)
+    return_value = channel_messages_v1(u_id, channel_id, start, before)
 
     return return_value
 
 
+@reads_channel
+def channel_messages_range_v1(token, channel_id, time_start, time_end, start=0):
+    '''
+    Given a Channel with ID channel_id that the authorised user is part of, return up to 50 of
+    the messages created between time_start and time_end (inclusive), skipping the "start"
+    most recent of them. Returns "end" in the same way as channel_messages_v2, -1 when
+    there are no more messages in the range to load.
+
+    Arguments:
+        token :: [str] - session token for the logged in user calling the function
+        channel_id :: [int] - the id of the channel whose messages are to be provided
+        time_start :: [int] - unix timestamp of the start of the range
+        time_end :: [int] - unix timestamp of the end of the range
+        start :: [int] - the starting index to return the messages from
+    Exceptions:
+        InputError - occurs when:
+            - channel_id is not a valid channel
+            - time_start, time_end or start is missing or not a whole number
+            - time_start is after time_end
+            - Start is negative, or greater than the number of messages in the range
+        AccessError - occurs when:
+            - Authorised user is not a member of the channel
+            - Token is not valid
+
+    Return Value:
+        (dict) containing:
+            - List of messages
+            - Start index
+            - Ending index
+    '''
+
+    auth_user_id = check_session_id(token)
+
+    this_channel = get_channel(channel_id)
+    if this_channel is None:
+        raise InputError(description='channel_id does not refer to any existing channel')
+
+    if is_member(this_channel, auth_user_id) == False:
+        raise AccessError(description='Authorised user is not a member of this channel')
+
+    check_message_range(time_start, time_end, start)
+
+    page, total_messages = messages_between(this_channel, True, time_start, time_end, start, 50)
+
+    if start > total_messages:
+        raise InputError(description="Start is greater than total number of messages")
+
+    end = start + 50
+    if end >= total_messages:
+        end = -1
+
+    return {
+        'messages': [message_details(message, auth_user_id) for message in page],
+        'start': start,
+        'end': end,
+    }
+
+
+@reads_channel
+def channel_pins_v1(token, channel_id):
+    '''
+    Given a Channel with ID channel_id that the authorised user is part of, return every
+    pinned message in the channel, most recent first. Found through the pin index, so
+    the channel's other messages are never looked at.
+
+    Arguments:
+        token :: [str] - session token for the logged in user calling the function
+        channel_id :: [int] - the id of the channel whose pinned messages are to be provided
+    Exceptions:
+        InputError - occurs when:
+            - channel_id is not a valid channel
+        AccessError - occurs when:
+            - Authorised user is not a member of the channel
+            - Token is not valid
+
+    Return Value:
+        (dict) containing:
+            - List of messages
+    '''
+
+    auth_user_id = check_session_id(token)
+
+    this_channel = get_channel(channel_id)
+    if this_channel is None:
+        raise InputError(description='channel_id does not refer to any existing channel')
+
+    if is_member(this_channel, auth_user_id) == False:
+        raise AccessError(description='Authorised user is not a member of this channel')
+
+    return {
+        'messages': [message_details(message, auth_user_id) for message in pinned_in(this_channel, True)],
+    }
+
+
+@reads_channel
+def channel_stats_v1(token, channel_id):
+    '''
+    Given a Channel with ID channel_id that the authorised user is part of, provides how
+    many messages have been sent to it, how many of them are left and how many members
+    it has. The number sent is kept up to date as messages are sent, so no message is
+    looked at here.
+
+    Arguments:
+        token :: [str] - session token for the logged in user calling the function
+        channel_id :: [int] - the id of the channel
+    Exceptions:
+        InputError - occurs when:
+            - channel_id is not a valid channel
+        AccessError - occurs when:
+            - Authorised user is not a member of the channel
+            - Token is not valid
+
+    Return Value:
+        (dict) containing channel_stats, a dict of messages_sent, messages_exist and members
+    '''
+
+    auth_user_id = check_session_id(token)
+
+    this_channel = get_channel(channel_id)
+    if this_channel is None:
+        raise InputError(description='channel_id does not refer to any existing channel')
+
+    if is_member(this_channel, auth_user_id) == False:
+        raise AccessError(description='Authorised user is not a member of this channel')
+
+    return {
+        'channel_stats': {
+            'messages_sent': this_channel['activity']['messages_sent'],
+            'messages_exist': live_count(this_channel),
+            'members': len(this_channel['all_members']),
+        }
+    }
+
+
+@locks_channel
 def channel_addowner_v1(token, channel_id, u_id):
     """
     Make user with user id u_id an owner of the channel channel_id
@@ -503,52 +549,36 @@ def channel_addowner_v1(token, channel_id, u_id):
     except Exception:
         raise AccessError(description = "Invalid token") from Exception
 
-    valid_channel_id = False
-    for channel in channels:
-        if channel['id'] == channel_id:
-            valid_channel_id = True
-            list_owners = channel['owner_members']
-            list_members = channel['all_members']
-
-    if valid_channel_id == False:
+    channel = get_channel(channel_id)
+    if channel is None:
         raise InputError(description = "The channel_id is not valid")
 
-    auth_is_owner = False
     # Checks if the authorised user is a Dreams owner
-    for user in users:
-        if user['u_id'] == auth_user_id:
-            if user['permission_id'] == 1:
-                auth_is_owner = True
+    auth_is_owner = get_user(auth_user_id)['permission_id'] == 1
 
-    for owner in list_owners:
-        if owner['u_id'] == u_id:
-            raise InputError(description = "The user with user id u_id is "
-                                           "already an owner of this channel")
+    if is_owner(channel, u_id) == True:
+        raise InputError(description = "The user with user id u_id is "
+                                       "already an owner of this channel")
 
-        if owner['u_id'] == auth_user_id:
-            auth_is_owner = True
+    if is_owner(channel, auth_user_id) == True:
+        auth_is_owner = True
 
     if auth_is_owner == False:
         raise AccessError(description = "The authorised user is not an owner" 
                                         " of Dreams or of this channel")
 
-    user_is_member = False
-    for member in list_members:
-        if member['u_id'] == u_id:
-            user_is_member = True
-            user_details = member
-
-    if user_is_member == False:
+    if is_member(channel, u_id) == False:
         raise InputError(description = "The user with user id u_id is"
                                        " not a member of this channel")
 
-    list_owners.append(user_details)
+    add_owner(channel, u_id)
 
     update_data_write()
 
     return {}
 
 
+@locks_channel
 def channel_removeowner_v1(token, channel_id, u_id):
     """
     Remove user with user id u_id an owner of the channel channel_id
@@ -576,30 +606,17 @@ def channel_removeowner_v1(token, channel_id, u_id):
     except Exception:
         raise AccessError(description = "Invalid token") from Exception
 
-    valid_channel_id = False
-    for channel in channels:
-        if channel['id'] == channel_id:
-            valid_channel_id = True
-            list_owners = channel['owner_members']
-
-    if valid_channel_id == False:
+    channel = get_channel(channel_id)
+    if channel is None:
         raise InputError(description = "The channel_id is not valid")
 
-    auth_is_owner = False
     # Checks if the authorised user is a Dreams owner
-    for user in users:
-        if user['u_id'] == auth_user_id:
-            if user['permission_id'] == 1:
-                auth_is_owner = True
+    auth_is_owner = get_user(auth_user_id)['permission_id'] == 1
 
-    is_channel_owner = False
-    for idx, owner in enumerate(list_owners):
-        if owner['u_id'] == u_id:
-            is_channel_owner = True
-            matching_index = idx
+    is_channel_owner = is_owner(channel, u_id)
 
-        if owner['u_id'] == auth_user_id:
-            auth_is_owner = True
+    if is_owner(channel, auth_user_id) == True:
+        auth_is_owner = True
 
     if auth_is_owner == False:
         raise AccessError(description = "The authorised user is not an owner"
@@ -609,10 +626,10 @@ def channel_removeowner_v1(token, channel_id, u_id):
         raise InputError(description = "The user with user id u_id is not an"
                                        " owner of the channel")
     
-    if len(list_owners) == 1:
+    if len(channel['owner_members']) == 1:
         raise InputError(description = "The user is currently the only owner")
 
-    list_owners.pop(matching_index)
+    remove_owner(channel, u_id)
 
     update_data_write()
 
@@ -649,3 +666,45 @@ def channel_invite_v2(token, channel_id, u_id):
     update_data_write()
 
     return {}
+
+
+@locks_channel
+def channel_retention_set_v1(token, channel_id, seconds):
+    '''
+    Sets how long the messages of a channel are kept for. Older messages are removed
+    by the retention sweeper (see src.retention), overriding the global rule.
+
+    Arguments:
+        token (str) - session token for the logged in user calling the function
+        channel_id (int) - ID of the channel whose retention is being set
+        seconds (int) - how long messages are kept for, None to follow the global rule
+
+    Exceptions:
+        InputError - Occurs when:
+            - channel_id is not a valid channel
+            - seconds is neither None nor a positive whole number
+        AccessError - Occurs when:
+            - The token is not a valid id
+            - The authorised user is not an owner of Dreams or an owner of the channel
+
+    Return Value:
+        {}
+    '''
+
+    auth_user_id = check_session_id(token)
+
+    channel = get_channel(channel_id)
+    if channel is None:
+        raise InputError(description="The channel_id is not valid")
+
+    if is_owner(channel, auth_user_id) == False and get_user(auth_user_id)['permission_id'] != 1:
+        raise AccessError(description="The authorised user is not an owner"
+                                      " of Dreams or of this channel")
+
+    check_retention_seconds(seconds)
+
+    channel["retention_seconds"] = seconds
+
+    update_data_write()
+
+    return {}
@@ -1,6 +1,9 @@
-from src.data import users, channels
+from src.data import channels
 from src.error import InputError, AccessError
 from src.other import update_data_write, check_session_id
+from src.store import get_user, get_channel, add_channel, member_channel_ids
+from src.locks import locks_registry
+from src.ids import next_id
 
 
 def channels_list_v1(auth_user_id):
@@ -24,21 +27,14 @@ def channels_list_v1(auth_user_id):
     if not type(auth_user_id) == int:
         raise AccessError(description='auth_user_id has to be an integer')
 
-    valid_id = False
-
-    for user in users:
-        if user['u_id'] == auth_user_id:
-            valid_id = True
-
-    if valid_id == False:
+    if get_user(auth_user_id) is None:
         raise AccessError(description='auth_user_id does not belong to any user')
 
     list_of_channels = []
 
-    for channel in channels:
-        for member in channel['all_members']:
-            if member['u_id'] == auth_user_id:
-                list_of_channels.append({'channel_id': channel['id'], 'name': channel['name']})
+    for channel_id in member_channel_ids(auth_user_id):
+        channel = get_channel(channel_id)
+        list_of_channels.append({'channel_id': channel['id'], 'name': channel['name']})
 
     return {'channels': list_of_channels}
 
@@ -63,13 +59,7 @@ def channels_listall_v1(auth_user_id):
     if not type(auth_user_id) == int:
         raise AccessError(description='auth_user_id has to be an integer')
 
-    valid_id = False
-
-    for user in users:
-        if user['u_id'] == auth_user_id:
-            valid_id = True
-
-    if valid_id == False:
+    if get_user(auth_user_id) is None:
         raise AccessError(description='auth_user_id does not belong to any user')
 
     list_of_channels = []
@@ -80,6 +70,7 @@ def channels_listall_v1(auth_user_id):
     return {'channels': list_of_channels}
 
 
+@locks_registry
 def channels_create_v1(auth_user_id, name, is_public):
     '''
     Creates a new channel with that name that is either
@@ -102,56 +93,30 @@ def channels_create_v1(auth_user_id, name, is_public):
     if not type(auth_user_id) == int:
         raise AccessError(description='auth_user_id has to be an integer')
 
-    user_found = False
-    for user in users:
-        if user['u_id'] == auth_user_id:
-            user_found = True
+    user = get_user(auth_user_id)
 
     # Not a valid user
-    if user_found is False:
+    if user is None:
         raise AccessError(description=f"{auth_user_id} is not a valid user ID")
 
     if len(name) > 20:
         raise InputError(description="The channel name is too long")
 
-    for user in users:
-        if user['u_id'] == auth_user_id:
-            name_first = user['name_first']
-            name_last = user['name_last']
-            email = user['email']
-            handle = user['handle_str']
-
-    channel_id = len(channels) + 1
-    channels.append(
+    channel_id = next_id("channels")
+    add_channel(
         {
             'id': channel_id, 
             'name': name,
             'is_public': is_public,
-            'owner_members': [
-                {
-                    'u_id': auth_user_id,
-                    'email': email,
-                    'name_first': name_first,
-                    'name_last': name_last,
-                    'handle_str': handle,
-                },
-            ],
-            'all_members': [ 
-                {
-                    'u_id': auth_user_id,
-                    'email': email,
-                    'name_first': name_first,
-                    'name_last': name_last,
-                    'handle_str': handle,
-                },
-            ],
+            'owner_members': [auth_user_id],
+            'all_members': [auth_user_id],
             'messages': [
             ],
             'standup': [
                 {
                     'is_active': False,
                     'time_finish': None,
-                    'message': ""
+                    'log_id': None
                 }
             ]
         },
@@ -1,3 +1,63 @@
 port = 8080
 
-url = f"http://localhost:{port}/"
\ No newline at end of file
+url = f"http://localhost:{port}/"
+
+# Number of recently used tokens whose decoded session_id is cached by check_session_id
+token_cache_size = 1024
+
+# Number of most recent notifications kept for each user, older ones are dropped
+notification_inbox_size = 20
+
+# How mutations are persisted to ./src/data.json:
+#   "snapshot" - the whole data store is rewritten on every mutation
+#   "journal"  - frequent mutations append an operation record to ./src/data.journal,
+#                which is folded into a fresh snapshot in the background
+#   "group"    - mutations only mark the data store as dirty, and a background writer
+#                coalesces them into a single write per durability window
+persistence_mode = "journal"
+
+# Durability window for "group" mode. The writer flushes persistence_flush_interval_ms
+# after the first unpersisted mutation, or sooner once persistence_flush_mutations
+# mutations have built up. Mutations inside the window are lost on a crash.
+persistence_flush_interval_ms = 100
+persistence_flush_mutations = 100
+
+# Identifies this process in the message_ids it generates (0 to 15). Give each server
+# process sharing a data store a different value so their message_ids never collide
+id_node = 0
+
+# Each channel and dm keeps at least its hot_message_count most recent messages in memory.
+# Once segment_size more have built up, the oldest segment_size are sealed into a
+# compressed segment file in ./src/segments, and read back through a cache holding the
+# segment_cache_size most recently used segments.
+hot_message_count = 1000
+segment_size = 500
+segment_cache_size = 16
+
+# The react_ids the frontend can show. Every message lists each of them in its reacts.
+react_ids = [1]
+
+# Removed messages are left in place as tombstones. Once a channel or dm holds
+# tombstone_compact_threshold of them its messages are rewritten without them, in the
+# background along with the next snapshot.
+tombstone_compact_threshold = 1000
+
+# Removed messages are left in the postings of the search index too, which are rewritten
+# without them along with the next snapshot once they make up this share of its entries.
+search_index_stale_ratio = 0.5
+
+# Retention rules enforced by the sweeper in src.retention. Messages older than
+# message_retention_seconds are removed from every channel and dm without a rule of its
+# own, and notifications and password reset codes older than their limits are dropped.
+# None keeps them forever.
+message_retention_seconds = None
+notification_retention_seconds = None
+reset_code_retention_seconds = None
+
+# Seconds between retention sweeps, and the most messages removed from a channel or dm
+# while holding its lock
+retention_sweep_interval = 3600
+retention_chunk_size = 500
+
+# Number of journal records after which the journal is compacted into data.json
+journal_compact_threshold = 1000
@@ -2,6 +2,7 @@
 # Changes (in the structure example below): 
 #   removed the separate passwords list and added 'password' as another key in the users list of dictionaries
 #   added 4 more keys to the channels list of dictionaries to include other data which requires storage
+#   owner_members and all_members only store u_ids, profiles are looked up from users when needed
 
 '''
 users = [
@@ -30,24 +31,8 @@ channels = [
             'id': 1,
             'name' : 'channel1',
             'is_public': True,
-            'owner_members': [
-                {
-                'u_id': 29385,
-                'email': 'xyz2@gmail.com',
-                'name_first': 'user2_firstname',
-                'name_last': 'user2_lastname',
-                'handle_str': 'user2_firstnameuser2_lastname',
-                },
-            ],
-            'all_members': [
-                {
-                'u_id': 29385,
-                'email': 'xyz2@gmail.com',
-                'name_first': 'user2_firstname',
-                'name_last': 'user2_lastname',
-                'handle_str': 'user2_firstnameuser2_lastname',
-                },
-            ],
+            'owner_members': [29385],
+            'all_members': [29385],
             'messages': [
                 {
                     'message_id': 123,
@@ -76,14 +61,125 @@ dms = [
 
 ]
 
-notifications = [
+# u_id -> deque of that user's most recent notifications, oldest first
+notifications = {
+
+}
+
+# session_id -> u_id of the logged in user
+sessions = {
+
+}
+
+reset_codes = [
 
 ]
 
-sessions = [
+# Heap of (due, job_id, job) for every scheduled message and standup waiting to be run,
+# see src/scheduler.py
+scheduled_jobs = [
 
 ]
 
-reset_codes = [
+# channel_id -> time_finish, log_id and the (u_id, handle_str, text) parts sent so far,
+# for every channel with an active standup. Not saved in data.json, each standup's parts
+# are kept in its own log instead, see src/standup_log.py
+active_standups = {
+
+}
+
+# Next id given to a new user, channel or dm, see src/ids.py
+id_counters = {
+    "users": 1,
+    "channels": 1,
+    "dms": 1,
+    "segments": 1,
+}
+
+# Indexes over the lists above, kept up to date by the functions in src/store.py
+
+users_by_id = {
+
+}
+
+# Lowercased email -> user, only contains users that have not been removed
+users_by_email = {
+
+}
+
+users_by_handle = {
+
+}
+
+# Generated handle (before a number is appended) -> smallest number that might still give
+# a free handle, see allocate_handle in src/store.py
+handle_counters = {
+
+}
+
+channels_by_id = {
+
+}
+
+dms_by_id = {
+
+}
+
+# u_id -> set of ids of the channels the user is a member of
+channels_by_member = {
+
+}
+
+# u_id -> set of ids of the dms the user is a member of
+dms_by_member = {
+
+}
+
+# u_id -> set of ids of the channels the user is an owner of
+channels_by_owner = {
+
+}
+
+# u_id -> set of ids of the dms the user is an owner of
+dms_by_owner = {
+
+}
+
+# message_id -> (channel or dm, is_channel, index of the message in its messages list)
+messages_by_id = {
+
+}
+
+# (is_channel, channel or dm id) -> (time_created, message_id) of each of its messages,
+# sorted by time_created so messages sent between two times can be found by bisection
+message_times = {
+
+}
+
+# (is_channel, channel or dm id) -> the entries of message_times belonging to removed
+# messages, which are left in message_times until the channel or dm is compacted
+removed_message_times = {
+
+}
+
+# (is_channel, channel or dm id) -> (time_created, message_id) of its pinned messages,
+# sorted so the pins can be listed in time order without looking at every message
+pinned_messages = {
+
+}
+
+# Every word of a message's text -> sorted array of message_ids whose text contains it.
+# Removed messages are left in until src.store.compact_search_index
+message_words = {
+
+}
+
+# message_id -> set of message_ids of the messages sharing it
+message_shares = {
+
+}
+
+# u_id -> set of that user's session_ids
+sessions_by_user = {
 
-]
\ No newline at end of file
+}
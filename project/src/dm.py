@@ -1,10 +1,16 @@
 import uuid
 
-from src.data import users, dms
 from src.error import InputError, AccessError
-from src.other import update_data_write, check_session_id, notifications_added
+from src.other import update_data_write, check_session_id, check_message_range, notifications_added
+from src.store import get_user, get_dm, add_dm, remove_dm, is_member, is_owner, is_removed, \
+    message_position, add_member, remove_member, member_profiles, member_dm_ids, messages_between, \
+    message_details, live_count, newer_count, messages_page, pinned_in
+from src.locks import locks_dm, locks_registry, reads_dm
+from src.retention import check_retention_seconds
+from src.ids import next_id
 
 
+@locks_registry
 def dm_create_v1(token, u_ids):
     '''
     Creates a new DM with name that generated based on the user(s) in the DM
@@ -23,59 +29,30 @@ def dm_create_v1(token, u_ids):
 
     auth_user_id = check_session_id(token)
 
-    for user in users:
-        if user['u_id'] == auth_user_id:
-            dm_creator_data = {
-                'u_id': auth_user_id,
-                'email': user['email'],
-                'name_first': user['name_first'],
-                'name_last': user['name_last'],
-                'handle_str': user['handle_str'],
-            }
-
     dm_name = []
-    dm_name.append(dm_creator_data['handle_str'])
+    dm_name.append(get_user(auth_user_id)['handle_str'])
 
-    list_members = [dm_creator_data]
+    list_members = [auth_user_id]
 
-    u_id_found = False
     for u_id in u_ids:
-        for user in users:
-            # the user is counted as invalid if they have been removed from Dreams
-            if user['u_id'] == u_id and not (user["name_first"] == "Removed" and
-                                             user["name_last"] == "user"):
-                u_id_found = True
-
-                dm_name.append(user['handle_str'])
-                list_members.append(
-                    {
-                        'u_id': u_id,
-                        'email': user['email'],
-                        'name_first': user['name_first'],
-                        'name_last': user['name_last'],
-                        'handle_str': user['handle_str'],
-                    }
-                )
-
-        if u_id_found is False:
+        user = get_user(u_id)
+        # the user is counted as invalid if they have been removed from Dreams
+        if user is None or is_removed(user):
             raise InputError(description="u_id does not refer to a valid user")
 
-    last_dm_id = 0
-
-    # if the list of dms is not empty
-    if dms:
-        last_dm = dms[-1]
-        last_dm_id = last_dm["id"]
+        dm_name.append(user['handle_str'])
+        if u_id not in list_members:
+            list_members.append(u_id)
 
-    dm_id = last_dm_id + 1
+    dm_id = next_id("dms")
     dm_name = sorted(dm_name)
     name = ", ".join(dm_name)
 
-    dms.append(
+    add_dm(
         {
         'id': dm_id,
         'name': name,
-        'owner_members': [dm_creator_data],
+        'owner_members': [auth_user_id],
         'all_members': list_members,
         'messages': [],
         },
@@ -109,16 +86,16 @@ def dm_list_v1(token):
 
     list_of_dms = []
 
-    for dm in dms:
-        for member in dm['all_members']:
-            if member['u_id'] == auth_user_id:
-                list_of_dms.append({'dm_id': dm['id'], 'name': dm['name']})
+    for dm_id in member_dm_ids(auth_user_id):
+        dm = get_dm(dm_id)
+        list_of_dms.append({'dm_id': dm['id'], 'name': dm['name']})
 
     return {
         "dms": list_of_dms
     }
 
 
+@locks_dm
 def dm_invite_v1(token, dm_id, u_id):
     '''
     Inviting a user to an existing DM
@@ -142,66 +119,36 @@ def dm_invite_v1(token, dm_id, u_id):
     if not isinstance(dm_id, int):
         raise InputError(description='dm_id has to be an integer')
 
-    user_found = False
-    for user in users:
-        # the user is counted as invalid if they have been removed from Dreams
-        if user['u_id'] == u_id and not (user["name_first"] == "Removed" and 
-                                         user["name_last"] == "user"):
-            user_found = True
+    user = get_user(u_id)
 
-    # Not a valid user
-    if user_found == False:
+    # Not a valid user, the user is counted as invalid if they have been removed from Dreams
+    if user is None or is_removed(user):
         raise InputError(description=f"{u_id} is not a valid user ID")
 
-    auth_user_found = False
-    invalid_dm = True
-    for dm in dms:
-        for member in dm['all_members']:
-            if member['u_id'] == auth_user_id:
-                auth_user_found = True
-        if dm['id'] == dm_id:
-            invalid_dm = False
+    dm = get_dm(dm_id)
     
     # Not a valid dm
-    if invalid_dm == True:
+    if dm is None:
         raise InputError(description="DM id is invalid")
 
     # Authorised user is not already a member of the dm
-    if auth_user_found == False:
+    if is_member(dm, auth_user_id) == False:
         raise AccessError(description="The authorised user is not a member of the DM")
 
-    # Find the details of the user
-    for user in users:
-        if user['u_id'] == u_id:
-            name_first = user['name_first']
-            name_last = user['name_last']
-            email = user['email']
-            handle = user['handle_str']
-
-    for dm in dms:
-        if dm['id'] == dm_id:
-            # Function does nothing if the user is already a member of the dm
-            for member in dm['all_members']:
-                if member['u_id'] == u_id:
-                    return {
-                    }
-
-            dm['all_members'].append(
-                {
-                'u_id': u_id,
-                'email': email,
-                'name_first': name_first,
-                'name_last': name_last,
-                'handle_str': handle,
-                },
-            )
+    # Function does nothing if the user is already a member of the dm
+    if is_member(dm, u_id) == True:
+        return {
+        }
+
+    add_member(dm, u_id)
     notifications_added(dm_id, auth_user_id, [u_id], False)
     
     update_data_write()
     return {
     }
 
-def dm_messages_v1(token, dm_id, start):
+@reads_dm
+def dm_messages_v1(token, dm_id, start, before=None):
     '''
     Given a DM with ID channel_id that the authorised user is part of, return up to 50 messages 
     between index "start" and "start + 50". Message with index 0 is the most recent message in the dm. 
@@ -213,10 +160,14 @@ def dm_messages_v1(token, dm_id, start):
         token :: [str] - session token for the logged in user calling the function
         dm_id :: [int] - the id of the dm whose messages are to be provided
         start :: [int] - the starting index to return the messages from
+        before :: [int] - optional message_id, if given the page starts at the message
+            sent just before it and start is ignored
     Exceptions:
         InputError - occurs when:
             - DM ID is not a valid dm
+            - Start is negative
             - Start is greater than the total number of messages in the dm
+            - before does not refer to a message in the dm
         AccessError - occurs when:
             - Authorised user is not a member of dm with dm_id
             - The token is not valid    
@@ -230,55 +181,36 @@ def dm_messages_v1(token, dm_id, start):
 
     auth_user_id = check_session_id(token)
 
-    this_dm = False
-    auth_user_in_channel = False
-    end = start + 50
     total_messages = 0
     messages = []
     
-    for dm in dms:
-        if dm['id'] == dm_id:
-            this_dm = dm
+    this_dm = get_dm(dm_id)
 
-    if this_dm == False:
+    if this_dm is None:
         raise InputError(description='dm_id does not refer to any existing dm')
 
-
-    for auth_user in this_dm['all_members']:
-        if auth_user_id == auth_user['u_id']:
-            auth_user_in_channel = True
+    auth_user_in_channel = is_member(this_dm, auth_user_id)
     
-    total_messages = len(this_dm['messages'])
+    total_messages = live_count(this_dm)
+
+    # A cursor replaces start with the index of the message just after it
+    if before is not None:
+        position = message_position(this_dm, before)
+        if position is None:
+            raise InputError(description="before does not refer to a message in this dm")
+        start = newer_count(this_dm, position)
+
+    if start < 0:
+        raise InputError(description="Start cannot be negative")
+
     if start > total_messages:
         raise InputError(description="Start is greater than total number of messages")
 
-    r_messages_list = this_dm['messages'].copy()
-    r_messages_list.reverse()
-
-    counter = start
-    while counter < total_messages and counter < end:
-        is_this_user_reacted = False
-        if auth_user_id in r_messages_list[counter]["reacts"]:
-            is_this_user_reacted = True
-        reacts = [
-            {
-                "react_id": 1,
-                "u_ids": r_messages_list[counter]["reacts"],
-                "is_this_user_reacted": is_this_user_reacted
-            }
-        ]
-
-        append_this = {
-            "message_id": r_messages_list[counter]["message_id"],
-            "u_id": r_messages_list[counter]["u_id"],
-            "message": r_messages_list[counter]["message"],
-            "time_created": r_messages_list[counter]["time_created"],
-            "reacts": reacts,
-            "is_pinned": r_messages_list[counter]["is_pinned"]
-        }
-
-        messages.append(append_this)
-        counter = counter + 1
+    # Message with index 0 is the most recent message, so a page is read backwards
+    # from the newest message without copying or reversing the list
+    end = start + 50
+    for message in messages_page(this_dm, start, 50):
+        messages.append(message_details(message, auth_user_id))
 
     if end >= total_messages:
         end = -1
@@ -293,6 +225,141 @@ def dm_messages_v1(token, dm_id, start):
     }
 
 
+@reads_dm
+def dm_messages_range_v1(token, dm_id, time_start, time_end, start=0):
+    '''
+    Given a DM with ID dm_id that the authorised user is part of, return up to 50 of
+    the messages created between time_start and time_end (inclusive), skipping the "start"
+    most recent of them. Returns "end" in the same way as dm_messages_v1, -1 when
+    there are no more messages in the range to load.
+
+    Arguments:
+        token :: [str] - session token for the logged in user calling the function
+        dm_id :: [int] - the id of the dm whose messages are to be provided
+        time_start :: [int] - unix timestamp of the start of the range
+        time_end :: [int] - unix timestamp of the end of the range
+        start :: [int] - the starting index to return the messages from
+    Exceptions:
+        InputError - occurs when:
+            - dm_id is not a valid dm
+            - time_start, time_end or start is missing or not a whole number
+            - time_start is after time_end
+            - Start is negative, or greater than the number of messages in the range
+        AccessError - occurs when:
+            - Authorised user is not a member of the dm
+            - Token is not valid
+
+    Return Value:
+        (dict) containing:
+            - List of messages
+            - Start index
+            - Ending index
+    '''
+
+    auth_user_id = check_session_id(token)
+
+    this_dm = get_dm(dm_id)
+    if this_dm is None:
+        raise InputError(description='dm_id does not refer to any existing dm')
+
+    if is_member(this_dm, auth_user_id) == False:
+        raise AccessError(description='Authorised user is not a member of this dm')
+
+    check_message_range(time_start, time_end, start)
+
+    page, total_messages = messages_between(this_dm, False, time_start, time_end, start, 50)
+
+    if start > total_messages:
+        raise InputError(description="Start is greater than total number of messages")
+
+    end = start + 50
+    if end >= total_messages:
+        end = -1
+
+    return {
+        'messages': [message_details(message, auth_user_id) for message in page],
+        'start': start,
+        'end': end,
+    }
+
+
+@reads_dm
+def dm_pins_v1(token, dm_id):
+    '''
+    Given a DM with ID dm_id that the authorised user is part of, return every pinned
+    message in the DM, most recent first. Found through the pin index, so the DM's
+    other messages are never looked at.
+
+    Arguments:
+        token :: [str] - session token for the logged in user calling the function
+        dm_id :: [int] - the id of the dm whose pinned messages are to be provided
+    Exceptions:
+        InputError - occurs when:
+            - dm_id is not a valid dm
+        AccessError - occurs when:
+            - Authorised user is not a member of the dm
+            - Token is not valid
+
+    Return Value:
+        (dict) containing:
+            - List of messages
+    '''
+
+    auth_user_id = check_session_id(token)
+
+    this_dm = get_dm(dm_id)
+    if this_dm is None:
+        raise InputError(description='dm_id does not refer to any existing dm')
+
+    if is_member(this_dm, auth_user_id) == False:
+        raise AccessError(description='Authorised user is not a member of this dm')
+
+    return {
+        'messages': [message_details(message, auth_user_id) for message in pinned_in(this_dm, False)],
+    }
+
+
+@reads_dm
+def dm_stats_v1(token, dm_id):
+    '''
+    Given a DM with ID dm_id that the authorised user is part of, provides how many
+    messages have been sent to it, how many of them are left and how many members it
+    has. The number sent is kept up to date as messages are sent, so no message is
+    looked at here.
+
+    Arguments:
+        token :: [str] - session token for the logged in user calling the function
+        dm_id :: [int] - the id of the dm
+    Exceptions:
+        InputError - occurs when:
+            - dm_id is not a valid dm
+        AccessError - occurs when:
+            - Authorised user is not a member of the dm
+            - Token is not valid
+
+    Return Value:
+        (dict) containing dm_stats, a dict of messages_sent, messages_exist and members
+    '''
+
+    auth_user_id = check_session_id(token)
+
+    this_dm = get_dm(dm_id)
+    if this_dm is None:
+        raise InputError(description='dm_id does not refer to any existing dm')
+
+    if is_member(this_dm, auth_user_id) == False:
+        raise AccessError(description='Authorised user is not a member of this dm')
+
+    return {
+        'dm_stats': {
+            'messages_sent': this_dm['activity']['messages_sent'],
+            'messages_exist': live_count(this_dm),
+            'members': len(this_dm['all_members']),
+        }
+    }
+
+
+@reads_dm
 def dm_details_v1(token, dm_id):
     """
     Given a DM with ID dm_id that the authorised user is part of, 
@@ -318,30 +385,21 @@ def dm_details_v1(token, dm_id):
 
     auth_user_id = check_session_id(token)
 
-    valid_dm = False
-    for dm in dms:
-        if dm["id"] == dm_id:
-            valid_dm = True
-            dm_members = dm["all_members"]
-            dm_name = dm["name"]
-
-    if valid_dm == False:
+    dm = get_dm(dm_id)
+    if dm is None:
         raise InputError(description="dm_id is not a valid DM")
 
-    is_member = False
-    for member in dm_members:
-        if member['u_id'] == auth_user_id:
-            is_member = True
-
-    if is_member == False:
+    if is_member(dm, auth_user_id) == False:
         raise AccessError(description="Authorised user is not a member of DM with dm_id")
 
     return {
-        "name": dm_name,
-        "members": dm_members
+        "name": dm["name"],
+        "members": member_profiles(dm["all_members"])
     }
 
 
+@locks_registry
+@locks_dm
 def dm_remove_v1(token, dm_id):
     """
     Remove an existing DM from Dreams. This can only be done by the original 
@@ -364,37 +422,24 @@ def dm_remove_v1(token, dm_id):
 
     auth_user_id = check_session_id(token)
 
-    valid_dm = False
-    for idx, dm in enumerate(dms):
-        if dm["id"] == dm_id:
-            valid_dm = True
-            dm_num = idx
-            dm_owners = dm["owner_members"]
-
-    if valid_dm == False:
+    dm = get_dm(dm_id)
+    if dm is None:
         raise InputError(description="dm_id is not a valid DM")
 
-    dm_owner = False
-    for owner in dm_owners:
-        if owner["u_id"] == auth_user_id:
-            dm_owner = True
-
-    global_owner = False
-    for user in users:
-        if user["u_id"] == auth_user_id:
-            if user["permission_id"] == 1:
-                global_owner = True
+    dm_owner = is_owner(dm, auth_user_id)
+    global_owner = get_user(auth_user_id)["permission_id"] == 1
 
     if dm_owner == False and global_owner == False:
         raise AccessError(description="Authorised user is not the creator of DM with dm_id")
 
-    del dms[dm_num]
+    remove_dm(dm_id)
 
     update_data_write()
     
     return {}
 
 
+@locks_dm
 def dm_leave_v1(token, dm_id):
     """
     Given a DM ID, the authorised user is removed as a member of this DM
@@ -416,35 +461,56 @@ def dm_leave_v1(token, dm_id):
 
     auth_user_id = check_session_id(token)
 
-    valid_dm = False
-    for dm in dms:
-        if dm["id"] == dm_id:
-            valid_dm = True
-            dm_owners = dm["owner_members"]
-            dm_members = dm["all_members"]
-
-    if valid_dm == False:
+    dm = get_dm(dm_id)
+    if dm is None:
         raise InputError(description="dm_id is not a valid DM")
 
-    is_member = False
-    for idx, member in enumerate(dm_members):
-        if member['u_id'] == auth_user_id:
-            is_member = True
-            member_num = idx
-
-    if is_member == False:
+    if is_member(dm, auth_user_id) == False:
         raise AccessError(description="Authorised user is not a member of DM with dm_id")
 
-    dm_owner = False
-    for idx, owner in enumerate(dm_owners):
-        if owner["u_id"] == auth_user_id:
-            dm_owner = True
-            owner_num = idx
+    # The user is also removed as an owner if they are one
+    remove_member(dm, auth_user_id)
+
+    update_data_write()
+
+    return {}
+
+
+@locks_dm
+def dm_retention_set_v1(token, dm_id, seconds):
+    """
+    Sets how long the messages of a DM are kept for. Older messages are removed by the
+    retention sweeper (see src.retention), overriding the global rule.
+
+    Arguments:
+        token (str) - session token for the logged in user calling the function
+        dm_id (int) - ID of the DM whose retention is being set
+        seconds (int) - how long messages are kept for, None to follow the global rule
+
+    Exceptions:
+        InputError - Occurs when:
+            - dm_id is not a valid DM
+            - seconds is neither None nor a positive whole number
+        AccessError - Occurs when:
+            - The token is not a valid id
+            - The authorised user is not the creator of the DM or a global owner
+
+    Return Value:
+        {}
+    """
+
+    auth_user_id = check_session_id(token)
+
+    dm = get_dm(dm_id)
+    if dm is None:
+        raise InputError(description="dm_id is not a valid DM")
+
+    if is_owner(dm, auth_user_id) == False and get_user(auth_user_id)["permission_id"] != 1:
+        raise AccessError(description="Authorised user is not the creator of DM with dm_id")
 
-    del dm_members[member_num]
+    check_retention_seconds(seconds)
 
-    if dm_owner == True:
-        del dm_owners[owner_num]
+    dm["retention_seconds"] = seconds
 
     update_data_write()
 
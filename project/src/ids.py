@@ -0,0 +1,130 @@
+import time
+import threading
+
+from src import config
+from src.data import users, channels, dms, id_counters
+
+# Message ids are made of, from the most significant bit:
+#   - milliseconds since ID_EPOCH_MS (41 bits, enough until 2090)
+#   - config.id_node, the process that made the id (NODE_BITS)
+#   - a sequence number for ids made in the same millisecond (SEQUENCE_BITS)
+# 53 bits in total, so ids stay exact as JavaScript numbers on the frontend.
+ID_EPOCH_MS = 1609459200000   # 2021-01-01 00:00:00 UTC
+NODE_BITS = 4
+SEQUENCE_BITS = 8
+
+# Guards snowflake_state and id_counters
+id_lock = threading.Lock()
+
+snowflake_state = {
+    "last_ms": 0,
+    "sequence": 0,
+}
+
+
+def new_message_id():
+    '''
+    Generates a message_id. Ids are unique, including between processes with different
+    config.id_node values, and always increase, so sorting messages by id sorts them by
+    when their id was made.
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        message_id :: [int] - the new message_id
+    '''
+
+    with id_lock:
+        now_ms = int(time.time() * 1000) - ID_EPOCH_MS
+
+        # If the clock goes backwards ids carry on from the last one made
+        if now_ms > snowflake_state["last_ms"]:
+            snowflake_state["last_ms"] = now_ms
+            snowflake_state["sequence"] = 0
+        else:
+            snowflake_state["sequence"] += 1
+            if snowflake_state["sequence"] >> SEQUENCE_BITS:
+                # Every sequence number for this millisecond is used, borrow the next one
+                snowflake_state["last_ms"] += 1
+                snowflake_state["sequence"] = 0
+
+        node = config.id_node & ((1 << NODE_BITS) - 1)
+
+        return (snowflake_state["last_ms"] << (NODE_BITS + SEQUENCE_BITS)) \
+            | (node << SEQUENCE_BITS) | snowflake_state["sequence"]
+
+
+def new_notification_id():
+    '''
+    Generates a notification_id, made the same way as a message_id so that ids are
+    unique without a counter having to be saved
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        notification_id :: [int] - the new notification_id
+    '''
+
+    return new_message_id()
+
+
+def next_id(kind):
+    '''
+    Generates the id of a new user, channel, dm or message segment. Ids count up from
+    1 and are never given out twice, even after the dm holding an id is removed.
+
+    Arguments:
+        kind :: [str] - "users", "channels", "dms" or "segments"
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        id :: [int] - the new id
+    '''
+
+    with id_lock:
+        new_id = id_counters[kind]
+        id_counters[kind] += 1
+
+    return new_id
+
+
+def load_id_counters(saved):
+    '''
+    Sets the next user, channel, dm and segment ids after the data store is replaced. Each
+    counter starts after both the saved counter and the largest id in use, as users
+    added since the last snapshot are only in the journal.
+
+    Arguments:
+        saved :: [dict] - the counters saved in data.json, empty if there are none
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    in_use = {
+        "users": [user["u_id"] for user in users],
+        "channels": [channel["id"] for channel in channels],
+        "dms": [dm["id"] for dm in dms],
+        "segments": [
+            segment["segment_id"]
+            for container in channels + dms
+            for segment in container.get("segments", [])
+        ],
+    }
+
+    with id_lock:
+        for kind, ids in in_use.items():
+            id_counters[kind] = max([saved.get(kind, 1)] + [used_id + 1 for used_id in ids])
@@ -0,0 +1,82 @@
+import os
+import sys
+import csv
+import json
+
+from src.auth import register_users
+from src.other import update_data_read, update_data_flush
+
+USAGE = "Usage: python3 -m src.import_users FILE\n" \
+    "FILE is a .csv file with the columns email, password, name_first and name_last,\n" \
+    "or a file with one JSON object containing those keys per line (NDJSON)"
+
+
+def read_rows(FILE, path):
+    '''
+    Reads the users to import one at a time, so the whole file is never held in memory
+
+    Arguments:
+        FILE :: [file] - the open file
+        path :: [str] - path of the file, a .csv file is read as CSV and anything else
+            as NDJSON
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        rows :: [iterable] - a dictionary per user. A line which is not valid JSON gives
+        None, which register_users reports as an invalid row
+    '''
+
+    if path.lower().endswith(".csv"):
+        yield from csv.DictReader(FILE)
+        return
+
+    for line in FILE:
+        if line.strip() == "":
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def import_users(path):
+    '''
+    Registers every user in a file straight into the data store, without going
+    through the server. Must only be run while the server is stopped.
+
+    Arguments:
+        path :: [str] - path of the CSV or NDJSON file
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        (dict) containing users and errors, see src.auth.register_users
+    '''
+
+    if os.path.exists("./src/data.json"):
+        update_data_read()
+
+    with open(path, "r", newline="") as FILE:
+        result = register_users(read_rows(FILE, path))
+
+    # Written straight away as the group commit writer does not outlive this process
+    update_data_flush()
+
+    return result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(USAGE, file=sys.stderr)
+        sys.exit(2)
+
+    result = import_users(sys.argv[1])
+
+    for error in result["errors"]:
+        print(f"row {error['row'] + 1}: {error['error']}", file=sys.stderr)
+    print(f"Registered {len(result['users'])} users, skipped {len(result['errors'])}")
+
+    sys.exit(1 if result["errors"] else 0)
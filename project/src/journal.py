@@ -0,0 +1,362 @@
+import json
+import bisect
+import threading
+
+from src.records import record_fields, react_sets
+
+JOURNAL_PATH = "./src/data.journal"
+
+# Guards the journal file so that records appended while a snapshot is being
+# written are not lost when the journal is truncated
+journal_lock = threading.RLock()
+
+# Each snapshot starts a new generation, and every record is stamped with the
+# generation it was appended in. Records older than the snapshot they are replayed
+# into are already captured by it, as when a crash leaves the journal behind after
+# data.json was replaced but before the journal was truncated.
+journal_state = {
+    "length": 0,
+    "compacting": False,
+    "generation": 0,
+}
+
+
+def journal_append(record):
+    '''
+    Appends a single operation record to the journal
+
+    Arguments:
+        record :: [dict] - the operation record, containing at least the key "op"
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        length :: [int] - number of records currently in the journal
+    '''
+
+    with journal_lock:
+        line = json.dumps(
+            dict(record, generation=journal_state["generation"]),
+            separators=(",", ":"), default=record_fields
+        )
+        with open(JOURNAL_PATH, "a") as FILE:
+            FILE.write(line + "\n")
+        journal_state["length"] += 1
+        length = journal_state["length"]
+
+    return length
+
+
+def journal_truncate(generation):
+    '''
+    Empties the journal. Must only be called once a snapshot containing every
+    journalled record has been written.
+
+    Arguments:
+        generation :: [int] - the generation saved with that snapshot, which records
+            appended from now on are stamped with
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with journal_lock:
+        with open(JOURNAL_PATH, "w"):
+            pass
+        journal_state["length"] = 0
+        journal_state["generation"] = generation
+
+
+def journal_replay(data):
+    '''
+    Applies every record in the journal, in order, to data loaded from the snapshot.
+    A partially written final record (e.g. after a crash) is ignored, as are records
+    from a generation before the snapshot's.
+
+    Arguments:
+        data :: [dict] - the snapshot loaded from data.json
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        length :: [int] - number of records replayed
+    '''
+
+    # Snapshots and records written before generations were kept are generation 0
+    generation = data.get("journal_generation", 0)
+
+    try:
+        with open(JOURNAL_PATH, "r") as FILE:
+            lines = FILE.readlines()
+    except FileNotFoundError:
+        lines = []
+
+    locations = message_locations(data)
+    notification_ids = {
+        notification["notification_id"] for notification in data["notifications"]
+        if "notification_id" in notification
+    }
+
+    length = 0
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            break
+        if record.get("generation", 0) < generation:
+            continue
+        apply_record(data, record, locations, notification_ids)
+        length += 1
+
+    with journal_lock:
+        journal_state["length"] = length
+        journal_state["generation"] = generation
+
+    return length
+
+
+def message_locations(data):
+    '''
+    Maps every message_id in the snapshot to the list of messages holding it. Sealed
+    messages map to None, as records never change them (see update_data_append).
+
+    Arguments:
+        data :: [dict] - the snapshot loaded from data.json
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        locations :: [dict] - message_id -> list of messages
+    '''
+
+    locations = {}
+    for container in data["channels"] + data["dms"]:
+        for message in container["messages"]:
+            locations[message["message_id"]] = container["messages"]
+        for segment in container.get("segments", []):
+            for message_id in segment["message_ids"]:
+                locations[message_id] = None
+
+    return locations
+
+
+def find_container(data, record):
+    '''
+    Finds the channel or dm a record refers to
+
+    Arguments:
+        data :: [dict] - the snapshot loaded from data.json
+        record :: [dict] - record containing either a "channel_id" or a "dm_id"
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        container :: [dict] - the channel or dm, or None if it no longer exists
+    '''
+
+    if "channel_id" in record:
+        containers = data["channels"]
+        container_id = record["channel_id"]
+    else:
+        containers = data["dms"]
+        container_id = record["dm_id"]
+
+    for container in containers:
+        if container["id"] == container_id:
+            return container
+
+    return None
+
+
+def find_user(data, u_id):
+    '''
+    Finds a user in the snapshot
+
+    Arguments:
+        data :: [dict] - the snapshot loaded from data.json
+        u_id :: [int] - id of the user
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        user :: [dict] - the user, or None if there is no such user
+    '''
+
+    for user in data["users"]:
+        if user["u_id"] == u_id:
+            return user
+
+    return None
+
+
+def count_activity(owner, counter, change=1):
+    '''
+    Adds to an activity counter of a user, channel or dm in the snapshot. Users,
+    channels and dms saved before counters were kept are left to
+    src.store.count_activity, which counts everything they hold once loaded.
+
+    Arguments:
+        owner :: [dict] - the user, channel or dm, None if it no longer exists
+        counter :: [str] - name of the counter
+        change :: [int] - amount to add, negative to take away
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    if owner is not None and "activity" in owner:
+        owner["activity"][counter] += change
+
+
+def remove_job(data, job_id):
+    '''
+    Removes a scheduled job from the snapshot
+
+    Arguments:
+        data :: [dict] - the snapshot loaded from data.json
+        job_id :: [int] - id of the job, which may already have been removed
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    jobs = data.setdefault("scheduled_jobs", [])
+    for idx, job in enumerate(jobs):
+        if job["job_id"] == job_id:
+            del jobs[idx]
+            break
+
+
+def apply_record(data, record, locations, notification_ids):
+    '''
+    Applies a single journal record to the snapshot. Records from before the snapshot
+    are skipped by journal_replay, so removals given as positions are only applied to
+    the positions they were journalled against. Records adding something are also
+    idempotent, so one already captured by the snapshot can be replayed safely.
+
+    Arguments:
+        data :: [dict] - the snapshot loaded from data.json
+        record :: [dict] - the operation record
+        locations :: [dict] - message_id -> list of messages, kept up to date
+        notification_ids :: [set] - ids of the notifications in the snapshot, kept up
+            to date
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    op = record["op"]
+
+    if op == "user_add":
+        for user in data["users"]:
+            if user["u_id"] == record["user"]["u_id"]:
+                return
+        data["users"].append(record["user"])
+
+    elif op == "message_add":
+        # A scheduled message was sent, its job is done even if job_remove was never
+        # journalled
+        if "job_id" in record:
+            remove_job(data, record["job_id"])
+
+        message = record["message"]
+        container = find_container(data, record)
+        if container is None or message["message_id"] in locations:
+            return
+        container["messages"].append(message)
+        locations[message["message_id"]] = container["messages"]
+        count_activity(container, "messages_sent")
+        count_activity(find_user(data, message["u_id"]), "messages_sent")
+
+    elif op == "message_set":
+        messages = locations.get(record["message_id"])
+        if messages is None:
+            return
+        for message in messages:
+            if message["message_id"] == record["message_id"]:
+                message.update(record["fields"])
+
+    elif op in ["react_add", "react_remove"]:
+        messages = locations.get(record["message_id"])
+        if messages is None:
+            return
+        for message in messages:
+            if message["message_id"] == record["message_id"]:
+                reacts = react_sets(message["reacts"])
+                u_ids = reacts.setdefault(record["react_id"], set())
+                if op == "react_remove":
+                    if record["u_id"] in u_ids:
+                        u_ids.discard(record["u_id"])
+                        count_activity(find_user(data, record["u_id"]), "reacts_given", -1)
+                        count_activity(find_user(data, message["u_id"]), "reacts_received", -1)
+                elif record["u_id"] not in u_ids:
+                    u_ids.add(record["u_id"])
+                    count_activity(find_user(data, record["u_id"]), "reacts_given")
+                    count_activity(find_user(data, message["u_id"]), "reacts_received")
+                message["reacts"] = reacts
+
+    elif op == "messages_expire" or (op == "message_remove" and "position" in record):
+        container = find_container(data, record)
+        if container is None:
+            return
+        # Removed by the retention sweeper a chunk at a time, see src.retention
+        positions = record["positions"] if op == "messages_expire" else [record["position"]]
+        tombstones = container.setdefault("tombstones", [])
+        for position in positions:
+            idx = bisect.bisect_left(tombstones, position)
+            if idx == len(tombstones) or tombstones[idx] != position:
+                tombstones.insert(idx, position)
+
+    elif op == "message_remove":
+        # Written before removed messages were left in place as tombstones
+        messages = locations.pop(record["message_id"], None)
+        if messages is None:
+            return
+        for idx, message in enumerate(messages):
+            if message["message_id"] == record["message_id"]:
+                del messages[idx]
+                break
+
+    elif op == "notification_add":
+        # Notifications journalled before they had ids can not be told apart
+        notification_id = record["notification"].get("notification_id")
+        if notification_id is not None:
+            if notification_id in notification_ids:
+                return
+            notification_ids.add(notification_id)
+        data["notifications"].append(record["notification"])
+
+    elif op == "standup_append":
+        # Only written before standups kept their parts in a log of their own, the text
+        # is turned into a part by src.other.load_standups
+        container = find_container(data, record)
+        if container is not None:
+            standup = container["standup"][0]
+            standup["message"] = standup.get("message", "") + record["text"]
+
+    elif op == "job_add":
+        jobs = data.setdefault("scheduled_jobs", [])
+        for job in jobs:
+            if job["job_id"] == record["job"]["job_id"]:
+                return
+        jobs.append(record["job"])
+
+    elif op == "job_remove":
+        remove_job(data, record["job_id"])
@@ -0,0 +1,384 @@
+import functools
+import threading
+
+from contextlib import contextmanager
+
+from src.store import find_message, get_channel, get_dm
+
+# Locking rules, followed by every function that changes the data store:
+#   - Changes are made inside store_mutation, which lets snapshots of the data store
+#     wait until no change is half made.
+#   - registry_lock guards users, sessions, reset codes and the lists of channels and
+#     dms. It is always taken before any container lock.
+#   - Each channel and dm has its own lock guarding its members, messages and standup,
+#     so messages can be sent to different channels at the same time.
+#   - Reads of a channel or dm hold its lock inside store_read, so they never see a
+#     change half made nor messages being compacted or sealed by a snapshot. A read
+#     holds at most one channel or dm lock at a time.
+
+registry_lock = threading.RLock()
+
+# ("channel" or "dm", id) -> lock for that channel or dm
+container_locks = {}
+container_locks_lock = threading.Lock()
+
+# Guards the notification inboxes, which are changed by threads holding the locks of
+# different channels and dms
+notifications_lock = threading.Lock()
+
+# Number of threads changing the data store, and whether a snapshot is being taken.
+# A waiting snapshot stops new changes from starting so it is not starved.
+snapshot_condition = threading.Condition()
+snapshot_state = {
+    "mutating": 0,
+    "snapshotting": False,
+    "waiting": 0,
+}
+
+# Per thread: how many store_mutation blocks are open, and whether a snapshot was
+# requested inside one
+mutation_state = threading.local()
+
+
+def container_lock(is_channel, container_id):
+    '''
+    Finds the lock for a channel or dm, creating it if needed
+
+    Arguments:
+        is_channel :: [bool] - True for a channel, False for a dm
+        container_id :: [int] - id of the channel or dm
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        lock :: [RLock] - the lock for the channel or dm
+    '''
+
+    key = ("channel" if is_channel == True else "dm", container_id)
+
+    with container_locks_lock:
+        lock = container_locks.get(key)
+        if lock is None:
+            lock = threading.RLock()
+            container_locks[key] = lock
+
+    return lock
+
+
+@contextmanager
+def store_mutation(*locks):
+    '''
+    Marks the calling thread as changing the data store, then takes each of the given
+    locks in order. Snapshots requested inside the block are written once the
+    outermost block ends.
+
+    Arguments:
+        *locks :: [RLock] - locks to hold inside the block
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    depth = getattr(mutation_state, "depth", 0)
+
+    if depth == 0:
+        with snapshot_condition:
+            while snapshot_state["snapshotting"] == True or snapshot_state["waiting"] > 0:
+                snapshot_condition.wait()
+            snapshot_state["mutating"] += 1
+    mutation_state.depth = depth + 1
+
+    try:
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+    finally:
+        mutation_state.depth = depth
+
+        if depth == 0:
+            with snapshot_condition:
+                snapshot_state["mutating"] -= 1
+                snapshot_condition.notify_all()
+
+            if getattr(mutation_state, "snapshot_requested", False) == True:
+                mutation_state.snapshot_requested = False
+                # Imported here as src.other depends on this module
+                from src.other import write_snapshot
+                write_snapshot()
+
+
+@contextmanager
+def store_read(*locks):
+    '''
+    Marks the calling thread as reading the data store, then takes each of the given
+    locks in order. Snapshots wait for reads as they do for changes, as they compact
+    and seal the messages being read.
+
+    Arguments:
+        *locks :: [RLock] - locks to hold inside the block
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with store_mutation(*locks):
+        yield
+
+
+@contextmanager
+def consistent_snapshot():
+    '''
+    Waits until no thread is changing the data store, and stops any from starting
+    until the block ends, so the data store can be saved as a whole
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with snapshot_condition:
+        snapshot_state["waiting"] += 1
+        while snapshot_state["mutating"] > 0 or snapshot_state["snapshotting"] == True:
+            snapshot_condition.wait()
+        snapshot_state["waiting"] -= 1
+        snapshot_state["snapshotting"] = True
+
+    try:
+        yield
+    finally:
+        with snapshot_condition:
+            snapshot_state["snapshotting"] = False
+            snapshot_condition.notify_all()
+
+
+def defer_snapshot():
+    '''
+    Checks if the calling thread is inside store_mutation. If it is, the snapshot it
+    wants is taken when it leaves the block instead, as a snapshot cannot be taken
+    while the change is half made.
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [bool] - True if the snapshot has been deferred
+    '''
+
+    if getattr(mutation_state, "depth", 0) == 0:
+        return False
+
+    mutation_state.snapshot_requested = True
+    return True
+
+
+def argument(args, kwargs, index, name):
+    '''
+    Finds an argument passed to a wrapped function, whether it was passed by position
+    or by name
+
+    Arguments:
+        args :: [tuple] - positional arguments
+        kwargs :: [dict] - keyword arguments
+        index :: [int] - position of the argument
+        name :: [str] - name of the argument
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        the argument, or None if it was not passed
+    '''
+
+    if len(args) > index:
+        return args[index]
+
+    return kwargs.get(name)
+
+
+def locks_registry(function):
+    '''
+    Decorator for functions which change users, sessions or the lists of channels
+    and dms
+
+    Arguments:
+        function :: [function] - the function to wrap
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [function] - the wrapped function
+    '''
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with store_mutation(registry_lock):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def locks_channel(function):
+    '''
+    Decorator for functions which change a single channel, given by their second
+    argument (channel_id)
+
+    Arguments:
+        function :: [function] - the function to wrap
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [function] - the wrapped function
+    '''
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        channel_id = argument(args, kwargs, 1, "channel_id")
+        if get_channel(channel_id) is None:
+            # Nothing to lock, the function raises its usual error
+            with store_mutation():
+                return function(*args, **kwargs)
+
+        with store_mutation(container_lock(True, channel_id)):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def locks_dm(function):
+    '''
+    Decorator for functions which change a single dm, given by their second
+    argument (dm_id)
+
+    Arguments:
+        function :: [function] - the function to wrap
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [function] - the wrapped function
+    '''
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        dm_id = argument(args, kwargs, 1, "dm_id")
+        if get_dm(dm_id) is None:
+            with store_mutation():
+                return function(*args, **kwargs)
+
+        with store_mutation(container_lock(False, dm_id)):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def locks_message(function):
+    '''
+    Decorator for functions which change a single message, given by their second
+    argument (message_id). Holds the lock of the channel or dm containing the message.
+
+    Arguments:
+        function :: [function] - the function to wrap
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [function] - the wrapped function
+    '''
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        message_id = argument(args, kwargs, 1, "message_id")
+        while True:
+            location = find_message(message_id)
+            if location is None:
+                with store_mutation():
+                    return function(*args, **kwargs)
+
+            container, is_channel, _ = location
+            with store_mutation(container_lock(is_channel, container["id"])):
+                # The message may have been removed before the lock was taken
+                current = find_message(message_id)
+                if current is None or current[0] is container:
+                    return function(*args, **kwargs)
+
+    return wrapper
+
+
+def reads_channel(function):
+    '''
+    Decorator for functions which read a single channel, given by their second
+    argument (channel_id), so that it is not changed while it is read
+
+    Arguments:
+        function :: [function] - the function to wrap
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [function] - the wrapped function
+    '''
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        channel_id = argument(args, kwargs, 1, "channel_id")
+        if get_channel(channel_id) is None:
+            with store_read():
+                return function(*args, **kwargs)
+
+        with store_read(container_lock(True, channel_id)):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def reads_dm(function):
+    '''
+    Decorator for functions which read a single dm, given by their second argument
+    (dm_id), so that it is not changed while it is read
+
+    Arguments:
+        function :: [function] - the function to wrap
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [function] - the wrapped function
+    '''
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        dm_id = argument(args, kwargs, 1, "dm_id")
+        if get_dm(dm_id) is None:
+            with store_read():
+                return function(*args, **kwargs)
+
+        with store_read(container_lock(False, dm_id)):
+            return function(*args, **kwargs)
+
+    return wrapper
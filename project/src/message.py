@@ -1,11 +1,17 @@
 import src.other
-from src.data import channels, users, dms, notifications
+import src.scheduler
+from src import config
 from src.error import AccessError, InputError
+from src.store import get_user, get_channel, get_dm, is_member, is_owner, find_message, message_position, \
+    add_message, remove_message, set_message_text, has_reacted, add_react, remove_react, \
+    set_message_pinned
+from src.locks import locks_channel, locks_dm, locks_message, container_lock, store_mutation
+from src.ids import new_message_id
+from src.records import MessageRecord, SharedMessageRecord
 import datetime
-import uuid
-import threading
 import time
 
+@locks_message
 def message_remove_v1(token, message_id):
     '''
     Given a message_id for a message, this message is removed from the channel/DM
@@ -27,61 +33,36 @@ def message_remove_v1(token, message_id):
 
     u_id = src.other.check_session_id(token)
 
-    for user in users:
-        if user["u_id"] == u_id:
-            permission_id = user["permission_id"]
+    permission_id = get_user(u_id)["permission_id"]
 
-    message_found = False
-    for channel in channels:
-        if message_found == True:
-            break
-        is_channel_owner = False
-
-        for owner in channel["owner_members"]:
-            if owner["u_id"] == u_id:
-                is_channel_owner = True
-        index = 0
-        for msg in channel["messages"]:
-            if msg["message_id"] == message_id:
-                if msg["u_id"] != u_id and permission_id != 1 and is_channel_owner == False:
-                    raise AccessError(description="Unauthorised user")
-
-
-                del channel["messages"][index]
-                message_found = True
-                break
-            index = index + 1
-
-
-    for dm in dms:
-        if message_found == True:
-            break
-        is_channel_owner = False
-
-        for owner in dm["owner_members"]:
-            if owner["u_id"] == u_id:
-                is_channel_owner = True
-        index = 0
-        for msg in dm["messages"]:
+    location = find_message(message_id)
+    if location is None:
+        raise InputError(description="Message does not exist")
 
-            if msg["message_id"] == message_id:
-                if msg["u_id"] != u_id and permission_id != 1 and is_channel_owner == False:
-                    raise AccessError(description="Unauthorised user")
+    container, is_channel, msg = location
+    if msg["u_id"] != u_id and permission_id != 1 and is_owner(container, u_id) == False:
+        raise AccessError(description="Unauthorised user")
 
-            if msg["message_id"] == message_id:
-                del dm["messages"][index]
-                message_found = True
-                break
-            index = index + 1
+    position = message_position(container, message_id)
+    compact = remove_message(message_id)
 
+    # Replayed as a tombstone at the same position, see src.journal.apply_record
+    if is_channel == True:
+        src.other.update_data_append({
+            "op": "message_remove", "message_id": message_id, "channel_id": container["id"], "position": position
+        })
+    else:
+        src.other.update_data_append({
+            "op": "message_remove", "message_id": message_id, "dm_id": container["id"], "position": position
+        })
 
-    if message_found == False:
-        raise InputError(description="Message does not exist")
+    if compact == True:
+        src.other.request_compaction()
 
-    src.other.update_data_write()
     return {
     }
 
+@locks_message
 def message_edit_v2(token, message_id, message):
     '''
     Given a message, update its text with new text. If the new message is an empty string, the message is deleted.
@@ -108,64 +89,37 @@ def message_edit_v2(token, message_id, message):
     if len(message) > 1000:
         raise InputError(description="Message can not be more than 1000 characters in length")
 
-    for user in users:
-        if user["u_id"] == u_id:
-            permission_id = user["permission_id"]
-
-
-    message_found = False
-    for channel in channels:
-
-        is_channel_owner = False
-
-        for owner in channel["owner_members"]:
-            if owner["u_id"] == u_id:
-                is_channel_owner = True
-        channel_id = channel["id"]
-
-        for msg in channel["messages"]:
-            if msg["message_id"] == message_id:
-                if msg["u_id"] != u_id and permission_id != 1 and is_channel_owner == False:
-                    raise AccessError(description="Unauthorised user")
-                msg["message"] = message
-                message_found = True
-                src.other.check_message_tagging(u_id, message, channel_id, True, [])
-
-                break
-        if message_found == True:
-            break
+    permission_id = get_user(u_id)["permission_id"]
 
+    location = find_message(message_id)
+    if location is None:
+        raise InputError(description="Message does not exist")
 
-    for dm in dms:
-        is_channel_owner = False
+    container, is_channel, msg = location
+    if msg["u_id"] != u_id and permission_id != 1 and is_owner(container, u_id) == False:
+        raise AccessError(description="Unauthorised user")
 
-        for owner in dm["owner_members"]:
-            if owner["u_id"] == u_id:
-                is_channel_owner = True
-        dm_id = dm["id"]
+    # Editing a share replaces the shared message along with the comment
+    fields = {"message": message}
+    if msg.get("shared_message_id") is not None:
+        fields["shared_message_id"] = None
 
-        for msg in dm["messages"]:
-            if msg["message_id"] == message_id:
-                if msg["u_id"] != u_id and permission_id != 1 and is_channel_owner == False:
-                    raise AccessError(description="Unauthorised user")
-                msg["message"] = message
-                message_found = True
-                src.other.check_message_tagging(u_id, message, dm_id, False, [])
-                break
-        if message_found == True:
-            break
-
-    if message_found == False:
-        raise InputError(description="Message does not exist")
+    set_message_text(msg, message)
+    src.other.check_message_tagging(u_id, message, container["id"], is_channel, [])
 
     if message == "":
         message_remove_v1(token, message_id)
-    
+    else:
+        src.other.update_data_append({
+            "op": "message_set",
+            "message_id": message_id,
+            "fields": fields
+        })
 
-    src.other.update_data_write()
     return {
     }
 
+@locks_channel
 def message_send_v2(token, channel_id, message):
     '''
     Send a message from authorised_user to the channel specified by channel_id.
@@ -192,47 +146,33 @@ def message_send_v2(token, channel_id, message):
     if len(message) > 1000:
         raise InputError(description="Message can not be more than 1000 characters in length")
     
-    message_id = str(uuid.uuid1().int)
-    message_id = int(message_id[:16])
+    message_id = new_message_id()
 
 
     utc_time = datetime.datetime.now(datetime.timezone.utc)
     time_created = int(utc_time.replace(tzinfo=datetime.timezone.utc).timestamp())
     
 
-    message_dict = {
-        "message_id": message_id,
-        "u_id": u_id,
-        "message": message,
-        "time_created": time_created,
-        "reacts": [],
-        "is_pinned": False
-    }
+    message_dict = MessageRecord(message_id, u_id, message, time_created, {}, False)
 
-    valid_channel = False
-    user_in_channel = False
-    for channel in channels:
-        if channel["id"] == channel_id:
-            valid_channel = True
-            for user in channel["all_members"]:
-                if user["u_id"] == u_id:
-                    user_in_channel = True
-            if user_in_channel == False:
-                raise AccessError(description="User is not a member of the channel")
-
-            channel["messages"].append(message_dict)
-            break
-
-    if valid_channel == False:
+    channel = get_channel(channel_id)
+    if channel is None:
         raise InputError(description="Channel does not exist")
 
+    if is_member(channel, u_id) == False:
+        raise AccessError(description="User is not a member of the channel")
+
+    add_message(channel, True, message_dict)
+
+    src.other.update_data_append({"op": "message_add", "channel_id": channel_id, "message": message_dict})
+
     src.other.check_message_tagging(u_id, message, channel_id, True, [])
 
-    src.other.update_data_write()
     return {
         'message_id': message_id,
     }
 
+@locks_dm
 def message_senddm_v1(token, dm_id, message):
     '''
     Send a message from authorised_user to the DM specified by dm_id.
@@ -259,49 +199,38 @@ def message_senddm_v1(token, dm_id, message):
     if len(message) > 1000:
         raise InputError(description="Message can not be more than 1000 characters in length")
     
-    message_id = str(uuid.uuid1().int)
-    message_id = int(message_id[:16])
+    message_id = new_message_id()
 
 
     utc_time = datetime.datetime.now(datetime.timezone.utc)
     time_created = int(utc_time.replace(tzinfo=datetime.timezone.utc).timestamp())
 
-    message_dict = {
-        "message_id": message_id,
-        "u_id": u_id,
-        "message": message,
-        "time_created": time_created,
-        "reacts": [],
-        "is_pinned": False
-    }
+    message_dict = MessageRecord(message_id, u_id, message, time_created, {}, False)
 
-    valid_dm = False
-    user_in_dm = False
-    for dm in dms:
-        if dm["id"] == dm_id:
-            valid_dm = True
-            for user in dm["all_members"]:
-                if user["u_id"] == u_id:
-                    user_in_dm = True
-            if user_in_dm == False:
-                raise AccessError(description="User is not a member of the dm")
-            dm["messages"].append(message_dict)
-
-    if valid_dm == False:
+    dm = get_dm(dm_id)
+    if dm is None:
         raise InputError(description="dm with dm_id does not exist")
 
-    src.other.check_message_tagging(u_id, message, dm_id, False, [])
+    if is_member(dm, u_id) == False:
+        raise AccessError(description="User is not a member of the dm")
 
-    src.other.update_data_write()
+    add_message(dm, False, message_dict)
+
+    src.other.update_data_append({"op": "message_add", "dm_id": dm_id, "message": message_dict})
+
+    src.other.check_message_tagging(u_id, message, dm_id, False, [])
 
     return {
         'message_id': message_id,
     }
 
-
 def message_share_v1(token, og_message_id, message, channel_id, dm_id):
     '''
     Shares a message with message_id to a channel or dm specified by channel_id or dm_id.
+    The share only stores the new message and og_message_id, and shows the current text
+    of the shared message when read. Editing the shared message changes every share of
+    it, and once it is removed its shares show "[message removed]" in its place (see
+    src.store.message_text).
 
     Arguments:
         token :: [str] - session token of logged in user calling the function.
@@ -322,48 +251,75 @@ def message_share_v1(token, og_message_id, message, channel_id, dm_id):
         {shared_message_id} - message id of the new message
     '''
 
-    src.other.check_session_id(token)
-
-    shared_message = ""
-
-    message_found = False
-    for channel in channels:
-        for msg in channel["messages"]:
-            if msg["message_id"] == og_message_id:
-                shared_message = msg["message"]
-                message_found = True
-                break
-        if message_found == True:
-            break
-
+    u_id = src.other.check_session_id(token)
 
-    for dm in dms:
-        for msg in dm["messages"]:
-            if msg["message_id"] == og_message_id:
-                shared_message = msg["message"]
-                message_found = True
-        if message_found == True:
-            break
+    if len(message) > 1000:
+        raise InputError(description="Message can not be more than 1000 characters in length")
 
-    if message_found == False:
+    if find_message(og_message_id) is None:
         raise InputError(description="Message does not exist")
 
-    new_message = f"{message}:\n  \"\"\n  {shared_message}\n  \"\""
-
-    shared_message_id = -1
-
     if channel_id == -1:
-        shared_message_id = message_senddm_v1(token, dm_id, new_message)["message_id"]
+        shared_message_id = share_message(u_id, False, dm_id, og_message_id, message)
     else:
-        shared_message_id = message_send_v2(token, channel_id, new_message)["message_id"]
-
+        shared_message_id = share_message(u_id, True, channel_id, og_message_id, message)
 
-    src.other.update_data_write()
     return {
         "shared_message_id": shared_message_id
     }
 
+def share_message(u_id, is_channel, channel_or_dm_id, og_message_id, message):
+    '''
+    Adds a message sharing og_message_id to a channel or dm
 
+    Arguments:
+        u_id :: [int] - id of the user sharing the message
+        is_channel :: [bool] - True to share to a channel, False to share to a dm
+        channel_or_dm_id :: [int] - id of the channel or dm to share the message to
+        og_message_id :: [int] - message_id of the message to be shared
+        message :: [str] - the new message to be attached to the shared message
+
+    Exceptions:
+        InputError - Occurs when the channel or dm does not exist
+        AccessError - Occurs when the user is not a member of the channel or dm
+
+    Return Value:
+        message_id :: [int] - message id of the new message
+    '''
+
+    container = get_channel(channel_or_dm_id) if is_channel == True else get_dm(channel_or_dm_id)
+    if container is None:
+        raise InputError(description="Channel or dm does not exist")
+
+    with store_mutation(container_lock(is_channel, channel_or_dm_id)):
+        # The dm may have been removed before the lock was taken
+        container = get_channel(channel_or_dm_id) if is_channel == True else get_dm(channel_or_dm_id)
+        if container is None:
+            raise InputError(description="Channel or dm does not exist")
+
+        if is_member(container, u_id) == False:
+            raise AccessError(description="User is not a member of the channel or dm")
+
+        message_id = new_message_id()
+
+        utc_time = datetime.datetime.now(datetime.timezone.utc)
+        time_created = int(utc_time.replace(tzinfo=datetime.timezone.utc).timestamp())
+
+        message_dict = SharedMessageRecord(message_id, u_id, message, time_created, {}, False, og_message_id)
+
+        add_message(container, is_channel, message_dict)
+
+        if is_channel == True:
+            src.other.update_data_append({"op": "message_add", "channel_id": channel_or_dm_id, "message": message_dict})
+        else:
+            src.other.update_data_append({"op": "message_add", "dm_id": channel_or_dm_id, "message": message_dict})
+
+        # Only the new message can tag anyone, the shared message already has
+        src.other.check_message_tagging(u_id, message, channel_or_dm_id, is_channel, [])
+
+    return message_id
+
+@locks_message
 def message_react_v1(token, message_id, react_id):
     '''
     Given a message within a channel or DM the authorised user is part of, add a "react" to that particular message
@@ -388,76 +344,49 @@ def message_react_v1(token, message_id, react_id):
 
     u_id = src.other.check_session_id(token)
 
-    if react_id != 1:
+    if react_id not in config.react_ids:
         raise InputError(description="Invalid react_id")
 
-    user_handle = False
-    message_found = False
-    for channel in channels:
-        is_in_channel = False
-        for member in channel["all_members"]:
-            if member["u_id"] == u_id:
-                is_in_channel = True
-                user_handle = member["handle_str"]
-
-        for message in channel["messages"]:
-            if message["message_id"] == message_id:
-                if is_in_channel == False:
-                    raise AccessError(description="User is not a member of the channel containing the message")
-                if u_id in message["reacts"]:
-                    raise InputError(description="User has already reacted to this message")
-                message["reacts"].append(u_id)
-                target_user = message["u_id"]
-                message_found = True
-                channel_id = channel["id"]
-                dm_id = -1
-                name = channel["name"]
-        if message_found == True:
-            break
-
-    for dm in dms:
-        is_in_channel = False
-        for member in dm["all_members"]:
-            if member["u_id"] == u_id:
-                is_in_channel = True
-                user_handle = member["handle_str"]
-
-        for message in dm["messages"]:
-            if message["message_id"] == message_id:
-                if is_in_channel == False:
-                    raise AccessError(description="User is not a member of the channel containing the message")
-                if u_id in message["reacts"]:
-                    raise InputError(description="User has already reacted to this message")
-                message["reacts"].append(u_id)
-                target_user = message["u_id"]
-                message_found = True
-                channel_id = -1
-                dm_id = dm["id"]
-                name = dm["name"]
-
-        if message_found == True:
-            break
-    
-    if message_found == False:
+    location = find_message(message_id)
+    if location is None:
         raise InputError(description="Message does not exist")
 
+    container, is_channel, message = location
+    if is_member(container, u_id) == False:
+        raise AccessError(description="User is not a member of the channel containing the message")
+    if has_reacted(message, react_id, u_id) == True:
+        raise InputError(description="User has already reacted to this message")
+
+    add_react(message, react_id, u_id)
+
+    if is_channel == True:
+        channel_id = container["id"]
+        dm_id = -1
+    else:
+        channel_id = -1
+        dm_id = container["id"]
+
     notification = {
         "type": "reacted",
-        "sender_handle": user_handle,
-        "target_id": target_user,
+        "sender_handle": get_user(u_id)["handle_str"],
+        "target_id": message["u_id"],
         "channel_id": channel_id,
         "dm_id": dm_id,
-        "channel/dm_name": name,
+        "channel/dm_name": container["name"],
         "message": ""
 
     }
 
-    notifications.append(notification)
+    src.other.push_notification(notification)
 
-    src.other.update_data_write()
+    src.other.update_data_append({
+        "op": "react_add", "message_id": message_id, "react_id": react_id, "u_id": u_id
+    })
+    src.other.update_data_append({"op": "notification_add", "notification": notification})
     return {
     }
 
+@locks_message
 def message_unreact_v1(token, message_id, react_id):
     '''
     Given a message within a channel or DM the authorised user is part of, remove a "react" to that particular message
@@ -482,53 +411,28 @@ def message_unreact_v1(token, message_id, react_id):
 
     u_id = src.other.check_session_id(token)
 
-    if react_id != 1:
+    if react_id not in config.react_ids:
         raise InputError(description="Invalid react_id")
 
-    # Checks for and removes reacts in channel messages
-    message_found = False
-    for channel in channels:
-        is_in_channel = False
-        for member in channel["all_members"]:
-            if member["u_id"] == u_id:
-                is_in_channel = True
-
-        for message in channel["messages"]:
-            if message["message_id"] == message_id:
-                if is_in_channel == False:
-                    raise AccessError(description="User is not a member of the channel containing the message")
-                if u_id not in message["reacts"]:
-                    raise InputError(description="User does not have an active react for this message")
-                message["reacts"].remove(u_id)
-                message_found = True
-        if message_found == True:
-            break
-
-    # Checks for and removes reacts in dm messages
-    for dm in dms:
-        is_in_channel = False
-        for member in dm["all_members"]:
-            if member["u_id"] == u_id:
-                is_in_channel = True
-
-        for message in dm["messages"]:
-            if message["message_id"] == message_id:
-                if is_in_channel == False:
-                    raise AccessError(description="User is not a member of the channel containing the message")
-                if u_id not in message["reacts"]:
-                    raise InputError(description="User does not have an active react for this message")
-                message["reacts"].remove(u_id)
-                message_found = True
-        if message_found == True:
-            break
-
-    if message_found == False:
+    location = find_message(message_id)
+    if location is None:
         raise InputError(description="Message does not exist")
 
-    src.other.update_data_write()
+    container, is_channel, message = location
+    if is_member(container, u_id) == False:
+        raise AccessError(description="User is not a member of the channel containing the message")
+    if has_reacted(message, react_id, u_id) == False:
+        raise InputError(description="User does not have an active react for this message")
+
+    remove_react(message, react_id, u_id)
+
+    src.other.update_data_append({
+        "op": "react_remove", "message_id": message_id, "react_id": react_id, "u_id": u_id
+    })
     return {
     }
 
+@locks_channel
 def message_sendlater_v1(token, channel_id, message, time_sent):
     '''
     Send a message from authorised_user to the channel specified by channel_id automatically at a specified time in the future
@@ -551,6 +455,7 @@ def message_sendlater_v1(token, channel_id, message, time_sent):
     Return Value:
         {message_id} - message id of the sent message
     '''
+
     u_id = src.other.check_session_id(token)
 
     if len(message) > 1000:
@@ -562,34 +467,24 @@ def message_sendlater_v1(token, channel_id, message, time_sent):
     if send_in_secs < 0:
         raise InputError(description="The specified time is in the past")
 
-    valid_channel = False
-    valid_user = False
-    for channel in channels:
-        if channel_id == channel["id"]:
-            valid_channel = True
-            ch_messages = channel["messages"]
-            for member in channel["all_members"]:
-                if member["u_id"] == u_id:
-                    valid_user = True
-
-    if valid_channel == False:
+    channel = get_channel(channel_id)
+    if channel is None:
         raise InputError(description="channel with channel_id is not a valid channel")
 
-    if valid_user == False:
+    if is_member(channel, u_id) == False:
         raise AccessError(description="User is not a member of the channel with channel_id")
 
-    message_id = str(uuid.uuid1().int)
-    message_id = int(message_id[:16])
-    new_thread = threading.Timer(send_in_secs, message_sendlater_thread, args=[
-        u_id, channel_id, ch_messages, message, time_sent, message_id, True
-    ])
-    new_thread.start()
+    message_id = new_message_id()
+    src.scheduler.schedule_job("sendlater", send_in_secs, {
+        "u_id": u_id, "channel_or_dm_id": channel_id, "message": message,
+        "time_sent": time_sent, "message_id": message_id, "is_channel": True
+    })
 
     return{
         "message_id": message_id
     }
 
-
+@locks_dm
 def message_sendlaterdm_v1(token, dm_id, message, time_sent):
     '''
     Send a message from authorised_user to the dm specified by dm_id automatically at a specified time in the future
@@ -612,6 +507,7 @@ def message_sendlaterdm_v1(token, dm_id, message, time_sent):
     Return Value:
         {message_id} - message id of the sent message
     '''
+
     u_id = src.other.check_session_id(token)
 
     if len(message) > 1000:
@@ -623,55 +519,48 @@ def message_sendlaterdm_v1(token, dm_id, message, time_sent):
     if send_in_secs < 0:
         raise InputError(description="The specified time is in the past")
     
-    valid_dm = False
-    valid_user = False
-    for dm in dms:
-        if dm_id == dm["id"]:
-            valid_dm = True
-            d_messages = dm["messages"]
-            for member in dm["all_members"]:
-                if member["u_id"] == u_id:
-                    valid_user = True
-
-    if valid_dm == False:
+    dm = get_dm(dm_id)
+    if dm is None:
         raise InputError(description="dm with dm_id is not a valid dm")
 
-    if valid_user == False:
+    if is_member(dm, u_id) == False:
         raise AccessError(description="User is not a member of the dm with dm_id")
     
-    message_id = str(uuid.uuid1().int)
-    message_id = int(message_id[:16])
-    new_thread = threading.Timer(send_in_secs, message_sendlater_thread, args=[
-        u_id, dm_id, d_messages, message, time_sent, message_id, False
-    ])
-    new_thread.start()
+    message_id = new_message_id()
+    src.scheduler.schedule_job("sendlater", send_in_secs, {
+        "u_id": u_id, "channel_or_dm_id": dm_id, "message": message,
+        "time_sent": time_sent, "message_id": message_id, "is_channel": False
+    })
 
     return{
         "message_id": message_id
     }
 
+def message_sendlater_thread(u_id, channel_or_dm_id, message, time_sent, message_id, is_channel, job_id=None):
+    message_dict = MessageRecord(message_id, u_id, message, time_sent, {}, False)
 
-def message_sendlater_thread(u_id, channel_or_dm_id, list_of_messages, message, time_sent, message_id, is_channel):
-    message_dict = {
-        "message_id": message_id,
-        "u_id": u_id,
-        "message": message,
-        "time_created": time_sent,
-        "reacts": [],
-        "is_pinned": False
-    }
+    with container_lock(is_channel, channel_or_dm_id):
+        # The dm may have been removed while the message was waiting to be sent
+        container = get_channel(channel_or_dm_id) if is_channel == True else get_dm(channel_or_dm_id)
+        if container is None:
+            return
 
-    list_of_messages.append(message_dict)
+        add_message(container, is_channel, message_dict)
 
-    if is_channel == True:
-        src.other.check_message_tagging(u_id, message, channel_or_dm_id, True, [])
-
-    else:
-        src.other.check_message_tagging(u_id, message, channel_or_dm_id, False, [])
+        # The scheduled job is removed along with the message being added, so a restart
+        # never sends it twice (see src.journal.apply_record)
+        if is_channel == True:
+            record = {"op": "message_add", "channel_id": channel_or_dm_id, "message": message_dict}
+        else:
+            record = {"op": "message_add", "dm_id": channel_or_dm_id, "message": message_dict}
+        if job_id is not None:
+            record["job_id"] = job_id
+        src.other.update_data_append(record)
 
-    src.other.update_data_write()
+        src.other.check_message_tagging(u_id, message, channel_or_dm_id, is_channel, [])
 
 
+@locks_message
 def message_pin_v1(token, message_id):
     '''
     Given a message within a channel or DM, mark it as "pinned" to be given special display treatment by the frontend
@@ -695,59 +584,29 @@ def message_pin_v1(token, message_id):
 
     u_id = src.other.check_session_id(token)
 
-    message_found = False
-
-    for channel in channels:
-        is_channel_owner = False
-        is_in_channel = False
-        for member in channel["all_members"]:
-            if member["u_id"] == u_id:
-                is_in_channel = True
-        for member in channel["owner_members"]:
-            if member["u_id"] == u_id:
-                is_channel_owner = True
-                
-        for message in channel["messages"]:
-            if message["message_id"] == message_id:
-                if is_in_channel == False:
-                    raise AccessError(description="User is not a member of the channel containing the message")
-                if is_in_channel == True and is_channel_owner == False:
-                    raise AccessError(description="User is not an owner of the channel containing the message")
-                if message["is_pinned"] == True:
-                    raise InputError(description="This message has already been pinned")
-                message["is_pinned"] = True
-                message_found = True
-
-        if message_found == True:
-            break
-
-    for dm in dms:
-        is_in_channel = False
-        for member in dm["all_members"]:
-            if member["u_id"] == u_id:
-                is_in_channel = True
-
-        for message in dm["messages"]:
-            if message["message_id"] == message_id:
-                if is_in_channel == False:
-                    raise AccessError(description="User is not a member of the channel containing the message")
-                if message["is_pinned"] == True:
-                    raise InputError(description="This message has already been pinned")
-                message["is_pinned"] = True
-                message_found = True
-
-        if message_found == True:
-            break
-    
-    if message_found == False:
+    location = find_message(message_id)
+    if location is None:
         raise InputError(description="Message does not exist")
 
-    src.other.update_data_write()
-    return {
-    }
+    container, is_channel, message = location
+    if is_member(container, u_id) == False:
+        raise AccessError(description="User is not a member of the channel containing the message")
+    if is_channel == True and is_owner(container, u_id) == False:
+        raise AccessError(description="User is not an owner of the channel containing the message")
+    if message["is_pinned"] == True:
+        raise InputError(description="This message has already been pinned")
 
+    set_message_pinned(message, True)
 
+    src.other.update_data_append({
+        "op": "message_set",
+        "message_id": message_id,
+        "fields": {"is_pinned": True}
+    })
+    return {
+    }
 
+@locks_message
 def message_unpin_v1(token, message_id):
     '''
     Given a message within a channel or DM, remove it's mark as unpinned
@@ -770,52 +629,25 @@ def message_unpin_v1(token, message_id):
     '''
 
     u_id = src.other.check_session_id(token)
-    message_found = False
-
-    for channel in channels:
-        is_channel_owner = False
-        is_in_channel = False
-        for member in channel["all_members"]:
-            if member["u_id"] == u_id:
-                is_in_channel = True
-        for member in channel["owner_members"]:
-            if member["u_id"] == u_id:
-                is_channel_owner = True
-                
-        for message in channel["messages"]:
-            if message["message_id"] == message_id:
-                if is_in_channel == False:
-                    raise AccessError(description="User is not a member of the channel containing the message")
-                if is_in_channel == True and is_channel_owner == False:
-                    raise AccessError(description="User is not an owner of the channel containing the message")
-                if message["is_pinned"] == False:
-                    raise InputError(description="This message is not pinned")
-                message["is_pinned"] = False
-                message_found = True
-
-        if message_found == True:
-            break
-
-    for dm in dms:
-        is_in_channel = False
-        for member in dm["all_members"]:
-            if member["u_id"] == u_id:
-                is_in_channel = True
-
-        for message in dm["messages"]:
-            if message["message_id"] == message_id:
-                if is_in_channel == False:
-                    raise AccessError(description="User is not a member of the channel containing the message")
-                if message["is_pinned"] == False:
-                    raise InputError(description="This message is not pinned")
-                message["is_pinned"] = False
-                message_found = True
-
-        if message_found == True:
-            break
-    if message_found == False:
+
+    location = find_message(message_id)
+    if location is None:
         raise InputError(description="Message does not exist")
 
-    src.other.update_data_write()
+    container, is_channel, message = location
+    if is_member(container, u_id) == False:
+        raise AccessError(description="User is not a member of the channel containing the message")
+    if is_channel == True and is_owner(container, u_id) == False:
+        raise AccessError(description="User is not an owner of the channel containing the message")
+    if message["is_pinned"] == False:
+        raise InputError(description="This message is not pinned")
+
+    set_message_pinned(message, False)
+
+    src.other.update_data_append({
+        "op": "message_set",
+        "message_id": message_id,
+        "fields": {"is_pinned": False}
+    })
     return {
-    }
\ No newline at end of file
+    }
@@ -1,13 +1,49 @@
+import os
+import re
 import json
 import jwt
 import time
 import uuid
+import atexit
 import threading
 
-from .data import users, channels, dms, notifications, sessions, reset_codes
-from .error import InputError, AccessError
-
+from collections import OrderedDict, deque
 
+from .data import users, channels, dms, notifications, sessions, sessions_by_user, reset_codes, \
+    id_counters, active_standups
+from .error import InputError, AccessError
+from .store import rebuild_indexes, get_user, get_channel, get_dm, is_member, add_message, \
+    search_messages, find_message, get_user_by_handle, member_channel_ids, member_dm_ids, \
+    seal_segments, compact_tombstones, compact_search_index, segment_ids_in_use, message_details, \
+    MAX_HANDLE_LENGTH
+from .segments import changed_segments, delete_retired_segments, remove_unused_segments
+from . import config
+from .scheduler import schedule_job, load_jobs, pending_jobs
+from .locks import registry_lock, notifications_lock, consistent_snapshot, defer_snapshot, \
+    locks_registry, locks_channel, store_read, container_lock
+from .ids import new_message_id, new_notification_id, load_id_counters
+from .journal import journal_lock, journal_state, journal_append, journal_truncate, journal_replay
+from .records import message_record, record_fields
+from .standup_log import standup_log_append, standup_log_read, retire_standup_log, \
+    delete_retired_standup_logs, remove_unused_standup_logs
+
+# Matches every '@' along with the characters after it that could be part of a handle.
+# The lookahead lets tags overlap, e.g. "@a@b"
+TAG_PATTERN = re.compile(r"@(?=(.{1,%d}))" % MAX_HANDLE_LENGTH, re.DOTALL)
+
+# Token -> session_id for recently used tokens, bounded by config.token_cache_size
+token_cache = OrderedDict()
+token_cache_lock = threading.Lock()
+
+# Shared with the group commit writer thread, "dirty" counts mutations not yet persisted
+group_commit_condition = threading.Condition()
+group_commit_state = {
+    "dirty": 0,
+    "writer": None,
+}
+
+
+@locks_registry
 def clear_v1():
     '''
     Resets the internal data of the application to it's initial state
@@ -27,9 +63,18 @@ def clear_v1():
     dms.clear()
     notifications.clear()
     sessions.clear()
+    sessions_by_user.clear()
+    with token_cache_lock:
+        token_cache.clear()
     reset_codes.clear()
+    load_jobs([])
+    load_id_counters({})
 
-    update_data_write()
+    rebuild_indexes()
+
+    update_data_flush()
+    remove_unused_segments(segment_ids_in_use())
+    load_standups()
 
     return {}
 
@@ -52,7 +97,7 @@ def search_v2(token, query_str):
     Returns:
         (dict) containing a list of dictionaries, where each dictionary
         contains the corresponding message's message_id, u_id of user who sent the 
-        message, message, time_created
+        message, message, time_created, reacts and is_pinned
     '''
 
     auth_user_id = check_session_id(token)
@@ -60,31 +105,40 @@ def search_v2(token, query_str):
     if len(query_str) > 1000:
         raise InputError(description="Query string cannot be more than 1000 characters")
 
-    # this is going to be a list of all messages from channels and dms that the authorised 
-    # user is part of
-    list_all_messages = []
-    
-    for channel in channels:
-        for member in channel['all_members']:
-            if member['u_id'] == auth_user_id:
-                list_all_messages.extend(channel['messages'])
+    # Snapshots, which compact and seal messages, wait until the search is done
+    with store_read():
+        # this is going to be a list of all channels and dms that the authorised user is part of
+        containers = []
+
+        for channel_id in member_channel_ids(auth_user_id):
+            containers.append(get_channel(channel_id))
+
+        for dm_id in member_dm_ids(auth_user_id):
+            # The dm may have been removed since its id was found
+            dm = get_dm(dm_id)
+            if dm is not None:
+                containers.append(dm)
 
-    for dm in dms:
-        for member in dm['all_members']:
-            if member['u_id'] == auth_user_id:
-                list_all_messages.extend(dm['messages'])
+        matching_messages = search_messages(query_str, containers)
 
-    matching_messages = []
-    for message in list_all_messages:
-        if query_str in message['message']:
-            matching_messages.append(message)
+        # Each match is read holding the lock of its channel or dm, one at a time
+        messages = []
+        for message in matching_messages:
+            location = find_message(message["message_id"])
+            if location is None:
+                continue
+            with container_lock(location[1], location[0]["id"]):
+                # Removed since it was matched
+                if find_message(message["message_id"]) is not None:
+                    messages.append(message_details(message, auth_user_id))
 
-    return {'messages': matching_messages}
+    return {'messages': messages}
 
 
 def notifications_get_v1(token):
     '''
-    Return the user's most recent 20 notifications
+    Return the user's most recent notifications (up to config.notification_inbox_size,
+    20 by default), newest first
 
     Arguments:
         token :: [str] - auth token
@@ -100,18 +154,16 @@ def notifications_get_v1(token):
 
     '''
 
-    temp_notification_list = []
     notification_list = []
 
     u_id = check_session_id(token)
 
-    for notification in reversed(notifications):
-        if notification["target_id"] == u_id:
-            temp_notification_list.append(notification)
-        if len(temp_notification_list) >= 20:
-            break
-    
-    for notification in temp_notification_list:
+    # Copied, as other threads add to the inbox while it is read
+    with notifications_lock:
+        inbox = list(notifications.get(u_id, ()))
+
+    # Notifications are stored as their parts and only turned into a message when read
+    for notification in reversed(inbox):
         notification_message = ""
         channel_name = notification["channel/dm_name"]
         message = notification["message"]
@@ -151,6 +203,72 @@ def check_session_id(token):
         u_id :: [int]
     '''
 
+    session_id = decode_token(token)
+
+    # Checks if the user is logged in
+    u_id = sessions.get(session_id)
+    if u_id is None:
+        with token_cache_lock:
+            token_cache.pop(token, None)
+        raise AccessError(description="Not logged in")
+
+    return u_id
+
+
+def check_message_range(time_start, time_end, start):
+    '''
+    Checks the range given to channel_messages_range_v1 or dm_messages_range_v1. Query
+    strings which are missing or not whole numbers reach here as None.
+
+    Arguments:
+        time_start :: [int] - unix timestamp of the start of the range
+        time_end :: [int] - unix timestamp of the end of the range
+        start :: [int] - the starting index to return the messages from
+
+    Exceptions:
+        InputError - Occurs when:
+            - time_start, time_end or start is not a whole number
+            - start is negative
+            - time_start is after time_end
+
+    Return Value:
+        None
+    '''
+
+    for name, value in [("time_start", time_start), ("time_end", time_end), ("start", start)]:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise InputError(description=f"{name} must be a whole number")
+
+    if start < 0:
+        raise InputError(description="Start can not be negative")
+
+    if time_start > time_end:
+        raise InputError(description="time_start is after time_end")
+
+
+def decode_token(token):
+    '''
+    Returns the session_id stored in a token. Recently used tokens are kept in a
+    bounded LRU cache so the signature is only verified the first time a token is seen.
+
+    Arguments:
+        token :: [str] - auth token
+
+    Exceptions:
+        AccessError - Occurs when:
+            - Token is invalid
+
+    Return Value:
+        session_id :: [str]
+    '''
+
+    if isinstance(token, str):
+        with token_cache_lock:
+            session_id = token_cache.get(token)
+            if session_id is not None:
+                token_cache.move_to_end(token)
+                return session_id
+
     secret = get_secret()
 
     # Raises AccessError if the decoding fails due to signature error
@@ -159,21 +277,116 @@ def check_session_id(token):
     except Exception:
         raise AccessError(description="Invalid token") from Exception
 
-
     session_id = decoded["session_id"]
+    cache_token(token, session_id)
 
-    # Checks if the user is logged in
-    logged_in = False
-    for item in sessions:
-        if item["session_id"] == session_id:
-            u_id = item["u_id"]
-            logged_in = True
+    return session_id
 
-    if logged_in == False:
-        raise AccessError(description="Not logged in")
 
+def cache_token(token, session_id):
+    '''
+    Adds a token to the LRU token cache, evicting the least recently used tokens
+    once the cache is full
 
-    return u_id
+    Arguments:
+        token :: [str] - auth token
+        session_id :: [str] - the session_id stored in the token
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with token_cache_lock:
+        token_cache[token] = session_id
+        token_cache.move_to_end(token)
+        while len(token_cache) > config.token_cache_size:
+            token_cache.popitem(last=False)
+
+
+def start_session(u_id):
+    '''
+    Logs a user in, creating a new session for them
+
+    Arguments:
+        u_id :: [int] - the user's id
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        token :: [str] - token for the new session
+    '''
+
+    secret = get_secret()
+    session_id = uuid.uuid4().hex
+    token = jwt.encode({"session_id": session_id}, secret, algorithm="HS256")
+
+    # Adds the session id to the logged in users
+    with registry_lock:
+        sessions[session_id] = u_id
+        sessions_by_user.setdefault(u_id, set()).add(session_id)
+
+    # The token was just signed here so there is no need to verify it on first use
+    cache_token(token, session_id)
+
+    return token
+
+
+def end_session(token):
+    '''
+    Logs out the session belonging to a token
+
+    Arguments:
+        token :: [str] - auth token
+
+    Exceptions:
+        AccessError - Occurs when:
+            - Token is invalid
+            - The session has already been logged out
+
+    Return Value:
+        None
+    '''
+
+    session_id = decode_token(token)
+
+    with registry_lock:
+        u_id = sessions.pop(session_id, None)
+        with token_cache_lock:
+            token_cache.pop(token, None)
+
+        if u_id is None:
+            raise AccessError(description="Not logged in")
+
+        sessions_by_user[u_id].discard(session_id)
+
+
+def end_user_sessions(u_id):
+    '''
+    Logs out every session of a user
+
+    Arguments:
+        u_id :: [int] - the user's id
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with registry_lock:
+        session_ids = sessions_by_user.pop(u_id, set())
+        for session_id in session_ids:
+            sessions.pop(session_id, None)
+
+    with token_cache_lock:
+        for token, session_id in list(token_cache.items()):
+            if session_id in session_ids:
+                del token_cache[token]
 
 
 def get_secret():
@@ -195,6 +408,7 @@ def get_secret():
     return secret
 
 
+@locks_registry
 def update_data_read():
     '''
     Updates the temporary data store with persistent data.
@@ -211,7 +425,10 @@ def update_data_read():
 
     with open("./src/data.json", "r") as FILE:
         data = json.load(FILE)
-    
+
+    # Brings the snapshot up to date with every mutation made since it was written
+    journal_replay(data)
+
     channels.clear()
     channels.extend(data["channels"])
 
@@ -222,14 +439,68 @@ def update_data_read():
     dms.extend(data["dms"])
     
     notifications.clear()
-    notifications.extend(data["notifications"])
+    for notification in data["notifications"]:
+        push_notification(notification)
 
     reset_codes.clear()
     reset_codes.extend(data["reset_codes"])
+    # Codes saved before they had a time are kept for a full retention period from now
+    for code in reset_codes:
+        code.setdefault("time_created", int(time.time()))
+
+    rebuild_indexes()
+    load_id_counters(data.get("id_counters", {}))
+    remove_unused_segments(segment_ids_in_use())
+    load_standups()
+
+    # Scheduled messages and standups which fell due while the server was down run straight away
+    load_jobs(data.get("scheduled_jobs", []))
+
+def load_standups():
+    '''
+    Rebuilds the index of active standups after the data store is replaced, reading
+    the parts of each active standup back from its log
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    active_standups.clear()
+
+    for channel in channels:
+        standup = channel["standup"][0]
+        # Text buffered before standups kept their parts in a log of their own
+        buffered = standup.pop("message", "")
+
+        if standup["is_active"] == False:
+            standup["log_id"] = None
+            continue
+
+        if standup.get("log_id") is None:
+            standup["log_id"] = new_message_id()
+            if buffered != "":
+                standup_log_append(standup["log_id"], None, None, buffered.rstrip("\n"))
+
+        active_standups[channel["id"]] = {
+            "time_finish": standup["time_finish"],
+            "log_id": standup["log_id"],
+            "parts": standup_log_read(standup["log_id"]),
+        }
+
+    remove_unused_standup_logs({active["log_id"] for active in active_standups.values()})
+
 
 def update_data_write():
     '''
-    Writes the temporary data to data.json for persistence
+    Writes the temporary data to data.json for persistence. In group mode the data
+    store is only marked as dirty, and the group commit writer persists it within
+    config.persistence_flush_interval_ms.
 
     Arguments:
         None
@@ -241,25 +512,285 @@ def update_data_write():
         None
     '''
 
-    data = {
-    "users": users,
+    if config.persistence_mode == "group":
+        mark_data_dirty()
+        return
 
-    "channels": channels,
+    write_snapshot()
 
-    "dms": dms,
 
-    "notifications": notifications,
+def update_data_append(record):
+    '''
+    Persists a single mutation. In journal mode the mutation is appended to the journal
+    as a compact operation record, and once the journal grows past
+    config.journal_compact_threshold records it is folded into a fresh snapshot in the
+    background. Otherwise it is persisted by update_data_write.
 
-    "reset_codes": reset_codes
-    }
+    Arguments:
+        record :: [dict] - operation record, containing the key "op" and the details
+            needed to replay it (see src.journal.apply_record)
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    # The journal can not be replayed into sealed segments, so changes to them are
+    # only persisted by a snapshot
+    if config.persistence_mode != "journal" or changed_segments:
+        update_data_write()
+        return
+
+    length = journal_append(record)
+
+    if length >= config.journal_compact_threshold:
+        compact_in_background()
+
+
+def request_compaction():
+    '''
+    Asks for the removed messages of a channel or dm to be compacted away, which is
+    done by the next snapshot. In journal mode the snapshot is written straight away
+    in the background, otherwise one is already due for the removal itself.
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    if config.persistence_mode == "journal":
+        compact_in_background()
+
+
+def compact_in_background():
+    '''
+    Starts folding the journal into a fresh snapshot on a background thread, unless
+    that is already happening
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with journal_lock:
+        if journal_state["compacting"] == True:
+            return
+        journal_state["compacting"] = True
+
+    compactor = threading.Thread(target=compact_journal, daemon=True)
+    compactor.start()
+
+
+def update_data_flush():
+    '''
+    Immediately writes the temporary data to data.json, including any mutations still
+    waiting for the group commit writer.
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with group_commit_condition:
+        group_commit_state["dirty"] = 0
+
+    write_snapshot()
+
+
+def write_snapshot():
+    '''
+    Atomically replaces data.json with the current temporary data. As the snapshot
+    contains every mutation, the journal is emptied afterwards. When called part way
+    through a change (inside src.locks.store_mutation) the snapshot is taken once the
+    change is complete.
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    if defer_snapshot() == True:
+        return
+
+    # No thread is part way through a change while the snapshot is taken, and none
+    # can append to the journal before it has been truncated
+    with consistent_snapshot():
+        compact_tombstones()
+        compact_search_index()
+        seal_segments()
+
+        data = {
+        "users": users,
+
+        "channels": channels,
+
+        "dms": dms,
+
+        # Only notifications still in an inbox are saved, so this stays bounded
+        "notifications": [
+            notification
+            for inbox in list(notifications.values())
+            for notification in list(inbox)
+        ],
+
+        "reset_codes": reset_codes,
+
+        "scheduled_jobs": pending_jobs(),
+
+        "id_counters": id_counters
+        }
+
+        with journal_lock:
+            # Records still in the journal if the process stops before it is truncated
+            # are from an older generation, so are not replayed into this snapshot
+            generation = journal_state["generation"] + 1
+            data["journal_generation"] = generation
+
+            # Write to a temporary file first so a crash never leaves a half written data.json
+            with open("./src/data.json.tmp", "w") as FILE:
+                json.dump(data, FILE, default=record_fields)
+            os.replace("./src/data.json.tmp", "./src/data.json")
+            journal_truncate(generation)
 
-    with open("./src/data.json", "w") as FILE:
-        json.dump(data, FILE)
+        # Only deleted once data.json no longer refers to them
+        delete_retired_segments()
+        delete_retired_standup_logs()
+
+
+def compact_journal():
+    '''
+    Folds the journal into a fresh snapshot
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    try:
+        write_snapshot()
+    finally:
+        with journal_lock:
+            journal_state["compacting"] = False
+
+
+def mark_data_dirty():
+    '''
+    Records that the temporary data has changed, starting the group commit writer if
+    it is not already running
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with group_commit_condition:
+        group_commit_state["dirty"] += 1
+
+        if group_commit_state["writer"] is None:
+            writer = threading.Thread(target=group_commit_writer, daemon=True)
+            group_commit_state["writer"] = writer
+            writer.start()
+            # Persist whatever is still pending when the server shuts down
+            atexit.register(flush_dirty_data)
+
+        group_commit_condition.notify()
+
+
+def flush_dirty_data():
+    '''
+    Writes the temporary data to data.json if there are unpersisted mutations
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with group_commit_condition:
+        dirty = group_commit_state["dirty"]
+
+    if dirty > 0:
+        update_data_flush()
+
+
+def group_commit_writer():
+    '''
+    Background writer for group mode. Waits for the data store to become dirty, then
+    coalesces every mutation made within config.persistence_flush_interval_ms (or
+    until config.persistence_flush_mutations mutations have built up) into a single
+    snapshot write.
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    while True:
+        with group_commit_condition:
+            while group_commit_state["dirty"] == 0:
+                group_commit_condition.wait()
+
+            deadline = time.time() + config.persistence_flush_interval_ms / 1000
+            while group_commit_state["dirty"] < config.persistence_flush_mutations:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                group_commit_condition.wait(remaining)
+
+            # Already persisted by an explicit flush during the window
+            if group_commit_state["dirty"] == 0:
+                continue
+            group_commit_state["dirty"] = 0
+
+        write_snapshot()
 
 
 def check_message_tagging(auth_user_id, message, channel_or_dm_id, is_channel, already_tagged):
     '''
-    Checks a message for tags and adds it to the notifications list if it finds a valid tag.
+    Checks a message for tags and notifies each tagged user if it finds a valid tag.
+    A user is tagged when '@' followed by their handle appears anywhere in the message
+    and they are a member of the channel or dm.
 
     Arguments:
         auth_user_id :: [int] - u_id for the user sending the message
@@ -274,79 +805,110 @@ def check_message_tagging(auth_user_id, message, channel_or_dm_id, is_channel, a
     Return Value:
         None
     '''
-    
-    index = message.find('@')
-    if index == -1:
-        return
 
-    tagged_user_handle = False
-    for user in users:
-        if message.find('@' + user["handle_str"]) != -1 and user["u_id"] not in already_tagged:
-            tagged_user_handle = user["handle_str"]
-    if tagged_user_handle == False:
-        return
-
-
-    target_id = False
-    channel_or_dm_name = False
-    sender_handle = False
-
-    if is_channel == True:
-        for channel in channels:
-            if channel["id"] == channel_or_dm_id:
-                this_channel = channel
-                channel_or_dm_name = channel["name"]
-
-        for member in this_channel["all_members"]:
-            if member["handle_str"] == tagged_user_handle:
-                target_id = member["u_id"]
-            if member["u_id"] == auth_user_id:
-                sender_handle = member["handle_str"]
-
-
-    if is_channel == False:
-        for dm in dms:
-            if dm["id"] == channel_or_dm_id:
-                this_dm = dm
-                channel_or_dm_name = dm["name"]
-
-        for member in this_dm["all_members"]:
-            if member["handle_str"] == tagged_user_handle:
-                target_id = member["u_id"]
-            if member["u_id"] == auth_user_id:
-                sender_handle = member["handle_str"]
-
-    if target_id == False or sender_handle == False or channel_or_dm_name == False:
+    tagged_users = find_tagged_users(message)
+    if not tagged_users:
         return
 
     if is_channel == True:
+        this_container = get_channel(channel_or_dm_id)
         dm_id = -1
         channel_id = channel_or_dm_id
     else:
+        this_container = get_dm(channel_or_dm_id)
         dm_id = channel_or_dm_id
         channel_id = -1
 
-    notif = {
-        "type": "tagged",
-        "sender_handle": sender_handle,
-        "target_id": target_id,
-        "channel_id": channel_id,
-        "dm_id": dm_id,
-        "channel/dm_name": channel_or_dm_name,
-        "message": message[:20]
+    if this_container is None or is_member(this_container, auth_user_id) == False:
+        return
+    sender_handle = get_user(auth_user_id)["handle_str"]
 
-    }
+    for user in tagged_users:
+        target_id = user["u_id"]
+        if target_id in already_tagged or is_member(this_container, target_id) == False:
+            continue
+
+        notif = {
+            "type": "tagged",
+            "sender_handle": sender_handle,
+            "target_id": target_id,
+            "channel_id": channel_id,
+            "dm_id": dm_id,
+            "channel/dm_name": this_container["name"],
+            "message": message[:20]
+        }
+
+        push_notification(notif)
+        update_data_append({"op": "notification_add", "notification": notif})
+
+        already_tagged.append(target_id)
+
+
+def find_tagged_users(message):
+    '''
+    Finds every user whose handle follows an '@' in a message, in the order they are
+    first tagged. The message is read once: for each '@' the characters after it are
+    looked up in the handle index, so the cost does not depend on the number of users.
+
+    Arguments:
+        message :: [str] - the message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        tagged_users :: [list] - the tagged users, each appearing once
+    '''
+
+    tagged_users = []
+    seen = set()
+
+    for match in TAG_PATTERN.finditer(message):
+        candidate = match.group(1)
+        # Handles may be prefixes of each other (e.g. "@mj" inside "@mjones"), and
+        # the original substring check tagged every one of them
+        for length in range(1, len(candidate) + 1):
+            user = get_user_by_handle(candidate[:length])
+            if user is not None and user["u_id"] not in seen:
+                seen.add(user["u_id"])
+                tagged_users.append(user)
+
+    return tagged_users
+
+
+def push_notification(notification):
+    '''
+    Adds a notification to the inbox of the user it is for. Each inbox only keeps the
+    user's config.notification_inbox_size most recent notifications. The notification
+    is stamped with the time it was added, unless it already has one, so the retention
+    sweeper can tell when it has expired. It is also given a notification_id, so that a
+    journal replayed into a snapshot already holding it does not add it twice.
 
-    notifications.append(notif)
+    Arguments:
+        notification :: [dict] - the notification, containing the key "target_id"
 
-    already_tagged.append(target_id)
+    Exceptions:
+        N/A
 
-    check_message_tagging(auth_user_id, message, channel_or_dm_id, is_channel, already_tagged)
+    Return Value:
+        None
+    '''
+
+    notification.setdefault("time_created", int(time.time()))
+    if "notification_id" not in notification:
+        notification["notification_id"] = new_notification_id()
+
+    with notifications_lock:
+        inbox = notifications.get(notification["target_id"])
+        if inbox is None or inbox.maxlen != config.notification_inbox_size:
+            inbox = deque(inbox or (), maxlen=config.notification_inbox_size)
+            notifications[notification["target_id"]] = inbox
+        inbox.append(notification)
 
 
 def notifications_added(channel_or_dm_id, auth_user_id, u_ids, is_channel):
     '''
-    Adds a notification to the notifications list when a user is added to a channel or dm
+    Notifies each user who is added to a channel or dm
 
     Arguments:
         auth_user_id :: [int] - u_id for the user adding the member
@@ -368,17 +930,12 @@ def notifications_added(channel_or_dm_id, auth_user_id, u_ids, is_channel):
         dm_id = channel_or_dm_id
         channel_id = -1
     
-    for user in users:
-        if user["u_id"] == auth_user_id:
-            sender_handle = user["handle_str"]
-    
-    for channel in channels:
-        if channel["id"] == channel_id:
-            channel_or_dm_name = channel["name"]
-    
-    for dm in dms:
-        if dm["id"] == dm_id:
-            channel_or_dm_name = dm["name"]
+    sender_handle = get_user(auth_user_id)["handle_str"]
+
+    if is_channel == True:
+        channel_or_dm_name = get_channel(channel_id)["name"]
+    else:
+        channel_or_dm_name = get_dm(dm_id)["name"]
 
     for u_id in u_ids:
         notif = {
@@ -390,9 +947,10 @@ def notifications_added(channel_or_dm_id, auth_user_id, u_ids, is_channel):
             "channel/dm_name": channel_or_dm_name,
             "message": ""
         }
-        notifications.append(notif)
+        push_notification(notif)
 
 
+@locks_channel
 def standup_start_v1(token, channel_id, length):
     '''
     For a given channel, start the standup period whereby for the next "length" seconds 
@@ -420,49 +978,41 @@ def standup_start_v1(token, channel_id, length):
 
     auth_user_id = check_session_id(token)
 
-    valid_channel = False
-    for channel in channels:
-        if channel["id"] == channel_id:
-            valid_channel = True
-            ch_messages = channel["messages"]
-            # mark a running standup in the channel
-            ch_standup = channel["standup"][0]
-            ch_members = channel["all_members"]
-
-    if valid_channel == False:
+    channel = get_channel(channel_id)
+    if channel is None:
         raise InputError(description="Invalid channel_id")
 
+    # mark a running standup in the channel
+    ch_standup = channel["standup"][0]
+
     if ch_standup["is_active"] == True:
         raise InputError(description="A standup is already active in this channel")
 
-    in_channel = False
-    for member in ch_members:
-        if member["u_id"] == auth_user_id:
-            in_channel = True
-
-    if in_channel == False:
+    if is_member(channel, auth_user_id) == False:
         raise AccessError(description="Only members can start a standup in this channel")
 
     ch_standup["is_active"] = True
-    message_id = str(uuid.uuid1().int)
-    message_id = int(message_id[:16])
+    message_id = new_message_id()
     current_time = int(time.time())
     time_finish = current_time + length
     ch_standup["time_finish"] = time_finish
+    # The standup's message_id doubles as the id of its log
+    ch_standup["log_id"] = message_id
+
+    active_standups[channel_id] = {"time_finish": time_finish, "log_id": message_id, "parts": []}
 
     new_message = {
         "message_id": message_id,
         "u_id": auth_user_id,
         "message": "",
         "time_created": time_finish,
-        "reacts": [],
+        "reacts": {},
         "is_pinned": False
     }
 
-    new_thread = threading.Timer(length, finish_standup, args=[
-        auth_user_id, channel_id, new_message, ch_messages, ch_standup
-    ])
-    new_thread.start()
+    schedule_job("standup", length, {
+        "auth_user_id": auth_user_id, "channel_id": channel_id, "message_details": new_message
+    })
 
     update_data_write()
 
@@ -491,21 +1041,21 @@ def standup_active_v1(token, channel_id):
     '''
     check_session_id(token)
 
-    valid_channel = False
-    for channel in channels:
-        if channel["id"] == channel_id:
-            valid_channel = True
-            standup_info = channel["standup"][0]
-
-    if valid_channel == False:
+    channel = get_channel(channel_id)
+    if channel is None:
         raise InputError(description="Invalid channel_id")
 
+    active = active_standups.get(channel_id)
+    if active is None:
+        return {"is_active": False, "time_finish": None}
+
     return {
-        "is_active": standup_info["is_active"],
-        "time_finish": standup_info["time_finish"]
+        "is_active": True,
+        "time_finish": active["time_finish"]
     }
 
 
+@locks_channel
 def standup_send_v1(token, channel_id, message):
     '''
     Send a message to get buffered in the standup queue, assuming a standup is 
@@ -531,40 +1081,33 @@ def standup_send_v1(token, channel_id, message):
     '''
     auth_user_id = check_session_id(token)
 
-    valid_channel = False
-    for channel in channels:
-        if channel["id"] == channel_id:
-            valid_channel = True
-            standup_info = channel["standup"][0]
-            channel_members = channel["all_members"]
-
-    if valid_channel == False:
+    channel = get_channel(channel_id)
+    if channel is None:
         raise InputError(description="Invalid channel_id")
 
+    active = active_standups.get(channel_id)
+
     if len(message) > 1000:
         raise InputError(description="Message cannot be more than 1000 characters")
 
-    if standup_info["is_active"] == False:
+    if active is None:
         raise InputError(description="A standup is not currently active in this channel")
 
-    in_channel = False
-    for member in channel_members:
-        if member["u_id"] == auth_user_id:
-            in_channel = True
-            handle = member["handle_str"]
-
-    if in_channel == False:
+    if is_member(channel, auth_user_id) == False:
         raise AccessError(description="Only members can send a message in this channel")
 
-    new_message = f"{handle}: {message}\n"
-    standup_info["message"] += new_message
-
-    update_data_write()
+    # Parts are joined once, by finish_standup. Only the standup's own log is written,
+    # not the data store. The handle is kept as it is now, so the part is shown as sent
+    # even if the handle changes before the standup finishes.
+    handle_str = get_user(auth_user_id)["handle_str"]
+    active["parts"].append((auth_user_id, handle_str, message))
+    standup_log_append(active["log_id"], auth_user_id, handle_str, message)
 
     return {}
 
 
-def finish_standup(auth_user_id, channel_id, message_details, messages, standup):
+@locks_channel
+def finish_standup(auth_user_id, channel_id, message_details):
     '''
     Append all the messages in the standup queue as a whole message in the channel's 
     list of messages and reset the channel's standup dictionary to its initial state
@@ -572,10 +1115,6 @@ def finish_standup(auth_user_id, channel_id, message_details, messages, standup)
     Arguments:
         auth_user_id (int) - u_id of the user who started the standup
         channel_id (int) - id of the channel where the standup was started
-        messages (list) - list of messages of the channel in which the standup was started
-        standup (dict) - contains key "active" whose value indicates if a standup is
-            running in that channel and key "message" whose value is a string (all the 
-            standup messages concatenated into one message)
         message_details (dict) - contains the details of the new message which is to be
             appended to the channel's list of messages (message_id, u_id, time_created etc.)
 
@@ -586,17 +1125,39 @@ def finish_standup(auth_user_id, channel_id, message_details, messages, standup)
         None
     '''
 
+    # The data store may have been cleared while the standup was running
+    channel = get_channel(channel_id)
+    if channel is None:
+        return
+
+    active = active_standups.get(channel_id)
+    if active is None or active["time_finish"] != message_details["time_created"]:
+        return
+
     # all the messages in the standup queue concatenated as a single message 
-    new_message = standup["message"].rstrip()
+    lines = []
+    for u_id, handle_str, text in active["parts"]:
+        if u_id is None:
+            lines.append(text)
+            continue
+        # Parts logged before handles were kept are shown with the current handle
+        if handle_str is None:
+            handle_str = get_user(u_id)["handle_str"]
+        lines.append(f"{handle_str}: {text}")
+    new_message = "\n".join(lines).rstrip()
     message_details["message"] = new_message
 
-    messages.append(message_details)
+    add_message(channel, True, message_record(message_details))
     # check if the message contains a user tagging another user
     check_message_tagging(auth_user_id, new_message, channel_id, True, [])
 
     # set the standup dictionary of the channel to its initial state
+    standup = channel["standup"][0]
     standup["is_active"] = False
     standup["time_finish"] = None
-    standup["message"] = ""
+    standup["log_id"] = None
+
+    del active_standups[channel_id]
+    retire_standup_log(active["log_id"])
 
     update_data_write()
@@ -0,0 +1,189 @@
+from collections.abc import MutableMapping
+
+MESSAGE_FIELDS = ("message_id", "u_id", "message", "time_created", "reacts", "is_pinned")
+MESSAGE_FIELD_SET = frozenset(MESSAGE_FIELDS)
+
+SHARED_MESSAGE_FIELDS = MESSAGE_FIELDS + ("shared_message_id",)
+SHARED_MESSAGE_FIELD_SET = frozenset(SHARED_MESSAGE_FIELDS)
+
+
+class MessageRecord(MutableMapping):
+    '''
+    A message, stored with __slots__ rather than as a dict. A dict per message costs
+    well over twice the memory of a slotted record once a channel holds millions of
+    messages. Records behave like the dicts they replace: message["u_id"], .get(),
+    .update(), iteration over the keys and == against a dict all work, but the set
+    of keys is fixed.
+
+    reacts maps each react_id to the set of u_ids which reacted with it, so reacting,
+    unreacting and checking a react cost the same however many users have reacted.
+    '''
+
+    __slots__ = MESSAGE_FIELDS
+
+    fields = MESSAGE_FIELDS
+    field_set = MESSAGE_FIELD_SET
+
+    def __init__(self, message_id, u_id, message, time_created, reacts, is_pinned):
+        self.message_id = message_id
+        self.u_id = u_id
+        self.message = message
+        self.time_created = time_created
+        self.reacts = reacts
+        self.is_pinned = is_pinned
+
+    def __getitem__(self, key):
+        if key not in self.field_set:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.field_set:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        raise TypeError("Message fields can not be removed")
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def to_dict(self):
+        '''
+        Copies the message into a plain dict which json can serialise
+
+        Arguments:
+            None
+
+        Exceptions:
+            N/A
+
+        Return Value:
+            message :: [dict] - the message's fields
+        '''
+
+        return {
+            "message_id": self.message_id,
+            "u_id": self.u_id,
+            "message": self.message,
+            "time_created": self.time_created,
+            "reacts": {react_id: sorted(u_ids) for react_id, u_ids in self.reacts.items()},
+            "is_pinned": self.is_pinned,
+        }
+
+
+class SharedMessageRecord(MessageRecord):
+    '''
+    A message sharing another message. Only the comment added by the user sharing it
+    is stored in message, along with the message_id of the shared message, so sharing
+    a long message into many channels does not copy its text into each of them. The
+    text shown is put together when the message is read, see src.store.message_text.
+    Once its whole text has been replaced (see src.store.set_message_text) the
+    shared_message_id is None, and only message is shown.
+    '''
+
+    __slots__ = ("shared_message_id",)
+
+    fields = SHARED_MESSAGE_FIELDS
+    field_set = SHARED_MESSAGE_FIELD_SET
+
+    def __init__(self, message_id, u_id, message, time_created, reacts, is_pinned, shared_message_id):
+        super().__init__(message_id, u_id, message, time_created, reacts, is_pinned)
+        self.shared_message_id = shared_message_id
+
+    def to_dict(self):
+        '''
+        Copies the message into a plain dict which json can serialise
+
+        Arguments:
+            None
+
+        Exceptions:
+            N/A
+
+        Return Value:
+            message :: [dict] - the message's fields
+        '''
+
+        fields = super().to_dict()
+        fields["shared_message_id"] = self.shared_message_id
+        return fields
+
+
+def message_record(message):
+    '''
+    Converts a message loaded from data.json, the journal or a segment into a record
+
+    Arguments:
+        message :: [dict] - the message's fields, a MessageRecord is returned unchanged
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        message :: [MessageRecord] - the message
+    '''
+
+    if isinstance(message, MessageRecord):
+        return message
+
+    if "shared_message_id" in message:
+        return SharedMessageRecord(
+            message["message_id"], message["u_id"], message["message"],
+            message["time_created"], react_sets(message["reacts"]), message["is_pinned"],
+            message["shared_message_id"]
+        )
+
+    return MessageRecord(
+        message["message_id"], message["u_id"], message["message"],
+        message["time_created"], react_sets(message["reacts"]), message["is_pinned"]
+    )
+
+
+def react_sets(reacts):
+    '''
+    Converts the reacts of a message loaded from data.json, the journal or a segment
+    into a set of u_ids per react_id
+
+    Arguments:
+        reacts :: [dict] - react_id (an int, or a str once saved as json) -> u_ids. Data
+            saved before messages could have more than one react_id is a list of the
+            u_ids which reacted with react_id 1
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        reacts :: [dict] - react_id -> set of u_ids, without react_ids nobody reacted with
+    '''
+
+    if isinstance(reacts, list):
+        reacts = {1: reacts}
+
+    return {int(react_id): set(u_ids) for react_id, u_ids in reacts.items() if u_ids}
+
+
+def record_fields(value):
+    '''
+    Serialises records for json.dump and json.dumps (passed as default=)
+
+    Arguments:
+        value :: [object] - a value json can not serialise itself
+
+    Exceptions:
+        TypeError - Occurs when value is not a record
+
+    Return Value:
+        fields :: [dict] - the record's fields
+    '''
+
+    if isinstance(value, MessageRecord):
+        return value.to_dict()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,358 @@
+import bisect
+import threading
+import time
+import traceback
+
+import src.other
+from src import config
+from src.data import channels, dms, notifications, reset_codes, messages_by_id, message_times
+from src.error import InputError, AccessError
+from src.locks import store_mutation, container_lock, registry_lock, notifications_lock
+from src.store import get_user, get_channel, get_dm, message_position, remove_message
+
+# Guards retention_state and stops two sweeps from running at once
+retention_lock = threading.Lock()
+
+retention_state = {
+    "thread": None,
+    "last_report": None,
+}
+
+
+def check_retention_seconds(seconds):
+    '''
+    Checks a retention rule given for a channel or dm
+
+    Arguments:
+        seconds :: [int] - how long messages are kept for, None to follow
+            config.message_retention_seconds
+
+    Exceptions:
+        InputError - Occurs when seconds is neither None nor a positive whole number
+
+    Return Value:
+        None
+    '''
+
+    if seconds is None:
+        return
+
+    if isinstance(seconds, bool) or not isinstance(seconds, int) or seconds <= 0:
+        raise InputError(description="Retention must be a positive number of seconds")
+
+
+def retention_cutoff(container, now):
+    '''
+    Finds the time before which the messages of a channel or dm have expired. The
+    channel or dm's own rule is used if it has one, otherwise the global rule.
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        now :: [float] - unix timestamp of the sweep
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        cutoff :: [float] - unix timestamp, None if its messages are kept forever
+    '''
+
+    seconds = container.get("retention_seconds")
+    if seconds is None:
+        seconds = config.message_retention_seconds
+    if seconds is None:
+        return None
+
+    return now - seconds
+
+
+def expired_message_ids(container, is_channel, cutoff, limit, after):
+    '''
+    Finds the oldest messages of a channel or dm created before a cutoff, using
+    bisection on the time index rather than looking at every message
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        is_channel :: [bool] - True if container is a channel, False if it is a dm
+        cutoff :: [float] - unix timestamp, messages created before it have expired
+        limit :: [int] - most message_ids to return
+        after :: [tuple] - (time_created, message_id) entry of the time index the last
+            chunk stopped at, None to start from the oldest message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        (tuple) of up to limit ids of expired messages, oldest first, and the entry of
+        the time index to carry on after
+    '''
+
+    times = message_times.get((is_channel, container["id"]), [])
+    end = bisect.bisect_left(times, (cutoff,))
+
+    # Messages removed by earlier chunks stay in the time index until they are
+    # compacted, so each chunk carries on from where the last one stopped. An entry
+    # rather than an index is kept as compaction can happen between chunks.
+    idx = 0 if after is None else bisect.bisect_right(times, after)
+
+    message_ids = []
+    while idx < end and len(message_ids) < limit:
+        after = times[idx]
+        if after[1] in messages_by_id:
+            message_ids.append(after[1])
+        idx += 1
+
+    return message_ids, after
+
+
+def expire_messages(is_channel, container_id, cutoff, after):
+    '''
+    Removes a single chunk of at most config.retention_chunk_size expired messages from
+    a channel or dm, holding its lock only while that chunk is removed. Messages are
+    removed as tombstones, so their pins and search index entries go with them.
+
+    Arguments:
+        is_channel :: [bool] - True for a channel, False for a dm
+        container_id :: [int] - id of the channel or dm
+        cutoff :: [float] - unix timestamp, messages created before it have expired
+        after :: [tuple] - where the last chunk stopped, see expired_message_ids
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        (tuple) of the number of messages removed, whether the channel or dm should
+        be compacted, and where the next chunk should carry on from
+    '''
+
+    with store_mutation(container_lock(is_channel, container_id)):
+        container = get_channel(container_id) if is_channel == True else get_dm(container_id)
+        # The dm may have been removed since the sweep started
+        if container is None:
+            return 0, False, after
+
+        positions = []
+        compact = False
+        message_ids, after = expired_message_ids(container, is_channel, cutoff, config.retention_chunk_size, after)
+        for message_id in message_ids:
+            positions.append(message_position(container, message_id))
+            if remove_message(message_id) == True:
+                compact = True
+
+        if positions:
+            # Replayed as tombstones at the same positions, see src.journal.apply_record
+            if is_channel == True:
+                src.other.update_data_append({"op": "messages_expire", "channel_id": container_id, "positions": positions})
+            else:
+                src.other.update_data_append({"op": "messages_expire", "dm_id": container_id, "positions": positions})
+
+    return len(positions), compact, after
+
+
+def sweep_messages(now):
+    '''
+    Removes every expired message from every channel and dm, a chunk at a time
+
+    Arguments:
+        now :: [float] - unix timestamp of the sweep
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        removed :: [int] - number of messages removed
+    '''
+
+    removed = 0
+    compact = False
+
+    with registry_lock:
+        containers = [(True, channel) for channel in channels] + [(False, dm) for dm in dms]
+
+    for is_channel, container in containers:
+        cutoff = retention_cutoff(container, now)
+        if cutoff is None:
+            continue
+
+        after = None
+        while True:
+            count, due, after = expire_messages(is_channel, container["id"], cutoff, after)
+            removed += count
+            compact = compact or due
+            if count < config.retention_chunk_size:
+                break
+
+    if compact == True:
+        src.other.request_compaction()
+
+    return removed
+
+
+def sweep_notifications(now):
+    '''
+    Drops every notification older than config.notification_retention_seconds. Inboxes
+    are oldest first, so only the front of each is looked at.
+
+    Arguments:
+        now :: [float] - unix timestamp of the sweep
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        removed :: [int] - number of notifications dropped
+    '''
+
+    if config.notification_retention_seconds is None:
+        return 0
+
+    cutoff = now - config.notification_retention_seconds
+    removed = 0
+
+    with store_mutation(notifications_lock):
+        for u_id in list(notifications):
+            inbox = notifications[u_id]
+            while inbox and inbox[0]["time_created"] < cutoff:
+                inbox.popleft()
+                removed += 1
+            if not inbox:
+                del notifications[u_id]
+
+    return removed
+
+
+def sweep_reset_codes(now):
+    '''
+    Drops every password reset code older than config.reset_code_retention_seconds
+
+    Arguments:
+        now :: [float] - unix timestamp of the sweep
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        removed :: [int] - number of reset codes dropped
+    '''
+
+    if config.reset_code_retention_seconds is None:
+        return 0
+
+    cutoff = now - config.reset_code_retention_seconds
+
+    with store_mutation(registry_lock):
+        kept = [code for code in reset_codes if code["time_created"] >= cutoff]
+        removed = len(reset_codes) - len(kept)
+        reset_codes[:] = kept
+
+    return removed
+
+
+def sweep_retention():
+    '''
+    Enforces every retention rule once. Other requests carry on between chunks, as
+    each channel or dm is only locked while a chunk of its messages is removed.
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        (dict) containing:
+            - messages_removed
+            - notifications_removed
+            - reset_codes_removed
+    '''
+
+    with retention_lock:
+        now = time.time()
+
+        report = {
+            "messages_removed": sweep_messages(now),
+            "notifications_removed": sweep_notifications(now),
+            "reset_codes_removed": sweep_reset_codes(now),
+        }
+
+        # Dropped notifications and reset codes have no journal record, so they are only
+        # persisted by a snapshot
+        if report["notifications_removed"] > 0 or report["reset_codes_removed"] > 0:
+            src.other.update_data_write()
+
+        retention_state["last_report"] = report
+
+    return report
+
+
+def start_retention_sweeper():
+    '''
+    Starts the thread which sweeps every config.retention_sweep_interval seconds, if it
+    is not already running
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with retention_lock:
+        if retention_state["thread"] is not None:
+            return
+        retention_state["thread"] = threading.Thread(target=retention_sweeper_thread, daemon=True)
+        retention_state["thread"].start()
+
+
+def retention_sweeper_thread():
+    '''
+    Sweeps forever, every config.retention_sweep_interval seconds
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    while True:
+        time.sleep(config.retention_sweep_interval)
+        try:
+            sweep_retention()
+        except Exception:
+            # A failing sweep must not stop the next one
+            traceback.print_exc()
+
+
+def admin_retention_sweep_v1(token):
+    '''
+    Given a Dreams owner, enforces every retention rule straight away rather than
+    waiting for the next background sweep
+
+    Arguments:
+        token :: [str] - auth token
+
+    Exceptions:
+        AccessError - Occurs when:
+            - Token is invalid
+            - The authorised user is not an owner of Dreams
+
+    Return Value:
+        (dict) containing:
+            - messages_removed
+            - notifications_removed
+            - reset_codes_removed
+    '''
+
+    u_id = src.other.check_session_id(token)
+
+    if get_user(u_id)["permission_id"] != 1:
+        raise AccessError(description="The authorised user is not an owner of Dreams")
+
+    return sweep_retention()
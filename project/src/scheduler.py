@@ -0,0 +1,206 @@
+import heapq
+import threading
+import time
+import traceback
+
+import src.message
+import src.other
+from src.data import scheduled_jobs
+from src.locks import store_mutation
+
+# Guards scheduled_jobs and wakes the scheduler thread when a job is added
+scheduler_condition = threading.Condition()
+
+scheduler_state = {
+    "next_job_id": 1,
+    "thread": None,
+}
+
+
+def schedule_job(kind, delay, args):
+    '''
+    Schedules a job to run once after a delay. Every job is run by a single scheduler
+    thread, and pending jobs are persisted so they still run after a restart.
+
+    Arguments:
+        kind :: [str] - the type of job, either "sendlater" or "standup"
+        delay :: [float] - number of seconds from now that the job is due
+        args :: [dict] - keyword arguments passed to the job's handler
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        job :: [dict] - the scheduled job
+    '''
+
+    with scheduler_condition:
+        job = {
+            "job_id": scheduler_state["next_job_id"],
+            "kind": kind,
+            "due": time.time() + delay,
+            "args": args,
+        }
+        scheduler_state["next_job_id"] += 1
+
+        heapq.heappush(scheduled_jobs, (job["due"], job["job_id"], job))
+        scheduler_condition.notify()
+
+    src.other.update_data_append({"op": "job_add", "job": job})
+    start_scheduler()
+
+    return job
+
+
+def load_jobs(jobs):
+    '''
+    Replaces the pending jobs with jobs loaded from the data store
+
+    Arguments:
+        jobs :: [list] - the persisted jobs
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with scheduler_condition:
+        scheduled_jobs.clear()
+        for job in jobs:
+            scheduled_jobs.append((job["due"], job["job_id"], job))
+        heapq.heapify(scheduled_jobs)
+
+        next_job_id = 1
+        for job in jobs:
+            next_job_id = max(next_job_id, job["job_id"] + 1)
+        scheduler_state["next_job_id"] = next_job_id
+
+        scheduler_condition.notify()
+
+    if jobs:
+        start_scheduler()
+
+
+def pending_jobs():
+    '''
+    Lists every pending job, in the order they are due
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        jobs :: [list] - the pending jobs
+    '''
+
+    with scheduler_condition:
+        return [job for _, _, job in sorted(scheduled_jobs)]
+
+
+def start_scheduler():
+    '''
+    Starts the scheduler thread if it is not already running
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with scheduler_condition:
+        if scheduler_state["thread"] is not None:
+            return
+        scheduler_state["thread"] = threading.Thread(target=scheduler_thread, daemon=True)
+        scheduler_state["thread"].start()
+
+
+def scheduler_thread():
+    '''
+    Runs each job once it is due. Sleeps until the earliest job is due, or until a new
+    job is scheduled.
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    while True:
+        with scheduler_condition:
+            while not scheduled_jobs or scheduled_jobs[0][0] > time.time():
+                if scheduled_jobs:
+                    scheduler_condition.wait(scheduled_jobs[0][0] - time.time())
+                else:
+                    scheduler_condition.wait()
+            _, _, job = heapq.heappop(scheduled_jobs)
+
+        run_job(job)
+
+
+def run_job(job):
+    '''
+    Runs a single job and removes it from the persisted pending jobs
+
+    Arguments:
+        job :: [dict] - the job
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with store_mutation():
+        try:
+            if job["kind"] == "sendlater":
+                src.message.message_sendlater_thread(job_id=job["job_id"], **job["args"])
+            elif job["kind"] == "standup":
+                src.other.finish_standup(**job["args"])
+        except Exception:
+            # A failing job must not stop the scheduler or be retried forever
+            traceback.print_exc()
+
+        src.other.update_data_append({"op": "job_remove", "job_id": job["job_id"]})
+
+
+def scheduler_status_v1(token):
+    '''
+    Provides the number of scheduled messages and standups waiting to be run, and
+    when the next one is due
+
+    Arguments:
+        token :: [str] - auth token
+
+    Exceptions:
+        AccessError - Occurs when:
+            - Token is invalid
+
+    Return Value:
+        (dict) containing:
+            - queue_depth (number of pending jobs)
+            - next_due (unix timestamp the next job is due, None if there are no jobs)
+    '''
+
+    src.other.check_session_id(token)
+
+    with scheduler_condition:
+        queue_depth = len(scheduled_jobs)
+        next_due = scheduled_jobs[0][0] if scheduled_jobs else None
+
+    return {
+        "queue_depth": queue_depth,
+        "next_due": next_due,
+    }
@@ -0,0 +1,215 @@
+import os
+import gzip
+import json
+import threading
+
+from collections import OrderedDict
+
+from src import config
+from src.records import message_record, record_fields
+
+SEGMENT_DIR = "./src/segments"
+
+# segment_id -> messages of recently read segments, bounded by config.segment_cache_size
+segment_cache = OrderedDict()
+segment_cache_lock = threading.Lock()
+
+# segment_id -> copy of the messages of a sealed segment which has been changed since the
+# last snapshot. Never evicted, and written as a new segment by the next snapshot.
+changed_segments = {}
+
+# Ids of segments that have been replaced or removed, deleted once a snapshot which no
+# longer refers to them has been written
+retired_segments = []
+
+
+def segment_path(segment_id):
+    '''
+    Finds the file holding a segment
+
+    Arguments:
+        segment_id :: [int] - id of the segment
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        path :: [str] - path of the segment's file
+    '''
+
+    return os.path.join(SEGMENT_DIR, f"{segment_id}.json.gz")
+
+
+def write_segment(segment_id, messages):
+    '''
+    Writes a new segment to disk. Segments are never changed once written.
+
+    Arguments:
+        segment_id :: [int] - id of the new segment
+        messages :: [list] - the messages in the segment, oldest first
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    os.makedirs(SEGMENT_DIR, exist_ok=True)
+
+    path = segment_path(segment_id)
+    with gzip.open(path + ".tmp", "wt") as FILE:
+        json.dump(messages, FILE, separators=(",", ":"), default=record_fields)
+    os.replace(path + ".tmp", path)
+
+    cache_segment(segment_id, messages)
+
+
+def cache_segment(segment_id, messages):
+    '''
+    Adds a segment to the segment cache, evicting the least recently used segments
+    down to config.segment_cache_size
+
+    Arguments:
+        segment_id :: [int] - id of the segment
+        messages :: [list] - the messages in the segment
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with segment_cache_lock:
+        segment_cache[segment_id] = messages
+        segment_cache.move_to_end(segment_id)
+        while len(segment_cache) > config.segment_cache_size:
+            segment_cache.popitem(last=False)
+
+
+def read_segment(segment_id):
+    '''
+    Finds the messages in a segment, reading them from disk if the segment is not in
+    the segment cache
+
+    Arguments:
+        segment_id :: [int] - id of the segment
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        messages :: [list] - the messages in the segment, oldest first
+    '''
+
+    messages = changed_segments.get(segment_id)
+    if messages is not None:
+        return messages
+
+    with segment_cache_lock:
+        messages = segment_cache.get(segment_id)
+        if messages is not None:
+            segment_cache.move_to_end(segment_id)
+            return messages
+
+    with gzip.open(segment_path(segment_id), "rt") as FILE:
+        messages = [message_record(message) for message in json.load(FILE)]
+
+    cache_segment(segment_id, messages)
+
+    return messages
+
+
+def change_segment(segment_id):
+    '''
+    Finds the messages of a segment in order to change them. The segment stays in
+    memory until the next snapshot writes it out as a new segment.
+
+    Arguments:
+        segment_id :: [int] - id of the segment
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        messages :: [list] - the messages in the segment, oldest first
+    '''
+
+    messages = changed_segments.get(segment_id)
+    if messages is None:
+        messages = read_segment(segment_id)
+        changed_segments[segment_id] = messages
+
+    return messages
+
+
+def retire_segment(segment_id):
+    '''
+    Marks a segment as no longer used. Its file is deleted after the next snapshot.
+
+    Arguments:
+        segment_id :: [int] - id of the segment
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    changed_segments.pop(segment_id, None)
+    with segment_cache_lock:
+        segment_cache.pop(segment_id, None)
+    retired_segments.append(segment_id)
+
+
+def delete_retired_segments():
+    '''
+    Deletes the files of every retired segment. Must only be called once a snapshot
+    which no longer refers to them has been written.
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    while retired_segments:
+        try:
+            os.remove(segment_path(retired_segments.pop()))
+        except FileNotFoundError:
+            pass
+
+
+def remove_unused_segments(segment_ids):
+    '''
+    Deletes every segment file which the data store does not refer to, e.g. segments
+    written just before a crash or left behind by clear_v1
+
+    Arguments:
+        segment_ids :: [set] - ids of the segments the data store refers to
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    changed_segments.clear()
+    retired_segments.clear()
+    with segment_cache_lock:
+        segment_cache.clear()
+
+    if not os.path.isdir(SEGMENT_DIR):
+        return
+
+    for name in os.listdir(SEGMENT_DIR):
+        segment_id = name.split(".")[0]
+        if not segment_id.isdigit() or int(segment_id) not in segment_ids or name.endswith(".tmp"):
+            os.remove(os.path.join(SEGMENT_DIR, name))
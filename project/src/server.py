@@ -12,6 +12,8 @@ from src import other
 from src import message
 from src import dm
 from src import user
+from src import scheduler
+from src import retention
 
 
 def defaultHandler(err):
@@ -58,6 +60,13 @@ def auth_register():
     ))
 
 
+@APP.route("/auth/register/batch/v1", methods=["POST"])
+def auth_register_batch():
+    payload = request.get_json()
+
+    return dumps(auth.auth_register_batch_v1(payload["token"], payload["users"]))
+
+
 @APP.route("/auth/login/v2", methods=["POST"])
 def auth_login():
     payload = request.get_json()
@@ -130,8 +139,44 @@ def channel_messages():
     token = request.args.get("token")
     channel_id = request.args.get("channel_id", type=int)
     start = request.args.get("start", type=int)
+    before = request.args.get("before", type=int)
 
-    return dumps(channel.channel_messages_v2(token, channel_id, start))
+    return dumps(channel.channel_messages_v2(token, channel_id, start, before))
+
+
+@APP.route("/channel/messages/range/v1", methods=["GET"])
+def channel_messages_range():
+    token = request.args.get("token")
+    channel_id = request.args.get("channel_id", type=int)
+    time_start = request.args.get("time_start", type=int)
+    time_end = request.args.get("time_end", type=int)
+    # A start which is not a whole number reaches the range as None rather than 0
+    start = request.args.get("start", type=int) if "start" in request.args else 0
+
+    return dumps(channel.channel_messages_range_v1(token, channel_id, time_start, time_end, start))
+
+
+@APP.route("/channel/pins/v1", methods=["GET"])
+def channel_pins():
+    token = request.args.get("token")
+    channel_id = request.args.get("channel_id", type=int)
+
+    return dumps(channel.channel_pins_v1(token, channel_id))
+
+
+@APP.route("/channel/stats/v1", methods=["GET"])
+def channel_stats():
+    token = request.args.get("token")
+    channel_id = request.args.get("channel_id", type=int)
+
+    return dumps(channel.channel_stats_v1(token, channel_id))
+
+
+@APP.route("/channel/retention/set/v1", methods=["PUT"])
+def channel_retention_set():
+    payload = request.get_json()
+
+    return dumps(channel.channel_retention_set_v1(payload["token"], payload["channel_id"], payload["seconds"]))
 
 
 @APP.route("/channels/list/v2", methods=['GET'])
@@ -192,8 +237,44 @@ def dm_messages():
     token = request.args.get("token")
     dm_id = request.args.get("dm_id", type=int)
     start = request.args.get("start", type=int)
+    before = request.args.get("before", type=int)
+
+    return dumps(dm.dm_messages_v1(token, dm_id, start, before))
 
-    return dumps(dm.dm_messages_v1(token, dm_id, start))
+
+@APP.route("/dm/messages/range/v1", methods=["GET"])
+def dm_messages_range():
+    token = request.args.get("token")
+    dm_id = request.args.get("dm_id", type=int)
+    time_start = request.args.get("time_start", type=int)
+    time_end = request.args.get("time_end", type=int)
+    # A start which is not a whole number reaches the range as None rather than 0
+    start = request.args.get("start", type=int) if "start" in request.args else 0
+
+    return dumps(dm.dm_messages_range_v1(token, dm_id, time_start, time_end, start))
+
+
+@APP.route("/dm/pins/v1", methods=["GET"])
+def dm_pins():
+    token = request.args.get("token")
+    dm_id = request.args.get("dm_id", type=int)
+
+    return dumps(dm.dm_pins_v1(token, dm_id))
+
+
+@APP.route("/dm/stats/v1", methods=["GET"])
+def dm_stats():
+    token = request.args.get("token")
+    dm_id = request.args.get("dm_id", type=int)
+
+    return dumps(dm.dm_stats_v1(token, dm_id))
+
+
+@APP.route("/dm/retention/set/v1", methods=["PUT"])
+def dm_retention_set():
+    payload = request.get_json()
+
+    return dumps(dm.dm_retention_set_v1(payload["token"], payload["dm_id"], payload["seconds"]))
 
 
 @APP.route("/dm/details/v1", methods=['GET'])
@@ -279,6 +360,12 @@ def message_sendlaterdm():
     return dumps(message.message_sendlaterdm_v1(
         payload["token"], payload["dm_id"], payload["message"], payload["time_sent"]))
 
+@APP.route("/scheduler/status/v1", methods=["GET"])
+def scheduler_status():
+    token = request.args.get("token")
+
+    return dumps(scheduler.scheduler_status_v1(token))
+
 @APP.route("/users/all/v1", methods=['GET'])
 def list_all_users():
     token = request.args.get("token")
@@ -294,6 +381,20 @@ def user_profiles():
     return dumps(user.user_profile_v2(token, u_id))
 
 
+@APP.route("/user/stats/v1", methods=["GET"])
+def user_stats():
+    token = request.args.get("token")
+
+    return dumps(user.user_stats_v1(token))
+
+
+@APP.route("/users/stats/v1", methods=["GET"])
+def users_stats():
+    token = request.args.get("token")
+
+    return dumps(user.users_stats_v1(token))
+
+
 @APP.route("/user/profile/setname/v2", methods=["PUT"])
 def user_profile_setname():
     payload = request.get_json()
@@ -360,6 +461,13 @@ def change_user_permission():
     ))
 
 
+@APP.route("/admin/retention/sweep/v1", methods=["POST"])
+def retention_sweep():
+    payload = request.get_json()
+
+    return dumps(retention.admin_retention_sweep_v1(payload["token"]))
+
+
 @APP.route("/notifications/get/v1", methods=["GET"])
 def notifications_get():
     token = request.args.get("token")
@@ -391,4 +499,5 @@ def send_message_in_standup():
 
 if __name__ == "__main__":
     other.update_data_read()
-    APP.run(port=config.port) # Do not edit this port
+    retention.start_retention_sweeper()
+    APP.run(port=config.port, threaded=True) # Do not edit this port
@@ -0,0 +1,161 @@
+import os
+import json
+import threading
+
+STANDUP_LOG_DIR = "./src/standups"
+
+# Guards retired_standup_logs
+standup_log_lock = threading.Lock()
+
+# Ids of the logs of finished standups, deleted once a snapshot which no longer
+# refers to them has been written
+retired_standup_logs = []
+
+
+def standup_log_path(log_id):
+    '''
+    Finds the file holding a standup's log
+
+    Arguments:
+        log_id :: [int] - id of the standup's log
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        path :: [str] - path of the log's file
+    '''
+
+    return os.path.join(STANDUP_LOG_DIR, f"{log_id}.log")
+
+
+def standup_log_append(log_id, u_id, handle_str, text):
+    '''
+    Appends a single part of a standup to its log. Only the part is written, so a
+    send costs the same however big the standup or the data store is.
+
+    Arguments:
+        log_id :: [int] - id of the standup's log
+        u_id :: [int] - id of the user who sent the part, None for text buffered
+            before standups kept their parts separately
+        handle_str :: [str] - handle of the user when the part was sent, None along
+            with u_id
+        text :: [str] - the text of the part
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    os.makedirs(STANDUP_LOG_DIR, exist_ok=True)
+
+    with open(standup_log_path(log_id), "a") as FILE:
+        FILE.write(json.dumps([u_id, handle_str, text]) + "\n")
+
+
+def standup_log_read(log_id):
+    '''
+    Reads the parts of a standup back from its log. A line left half written by a
+    crash is ignored. Lines written before handles were kept have a handle of None.
+
+    Arguments:
+        log_id :: [int] - id of the standup's log
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        parts :: [list] - (u_id, handle_str, text) of each part, in the order they
+        were sent
+    '''
+
+    parts = []
+
+    try:
+        with open(standup_log_path(log_id), "r") as FILE:
+            for line in FILE:
+                try:
+                    part = json.loads(line)
+                except ValueError:
+                    continue
+                if len(part) == 2:
+                    part = [part[0], None, part[1]]
+                parts.append(tuple(part))
+    except FileNotFoundError:
+        pass
+
+    return parts
+
+
+def retire_standup_log(log_id):
+    '''
+    Marks the log of a finished standup as no longer used. Its file is deleted after
+    the next snapshot.
+
+    Arguments:
+        log_id :: [int] - id of the standup's log
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with standup_log_lock:
+        retired_standup_logs.append(log_id)
+
+
+def delete_retired_standup_logs():
+    '''
+    Deletes the files of every retired standup log. Must only be called once a
+    snapshot which no longer refers to them has been written.
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with standup_log_lock:
+        log_ids = list(retired_standup_logs)
+        retired_standup_logs.clear()
+
+    for log_id in log_ids:
+        try:
+            os.remove(standup_log_path(log_id))
+        except FileNotFoundError:
+            pass
+
+
+def remove_unused_standup_logs(log_ids):
+    '''
+    Deletes every standup log which the data store does not refer to, e.g. logs of
+    standups that finished just before a crash or were left behind by clear_v1
+
+    Arguments:
+        log_ids :: [set] - ids of the logs of the active standups
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with standup_log_lock:
+        retired_standup_logs.clear()
+
+    if not os.path.isdir(STANDUP_LOG_DIR):
+        return
+
+    for name in os.listdir(STANDUP_LOG_DIR):
+        log_id = name.split(".")[0]
+        if not log_id.isdigit() or int(log_id) not in log_ids:
+            os.remove(os.path.join(STANDUP_LOG_DIR, name))
@@ -0,0 +1,2168 @@
+import re
+import bisect
+import threading
+from array import array
+
+from src.data import users, channels, dms, users_by_id, users_by_email, users_by_handle, handle_counters, \
+    channels_by_id, dms_by_id, channels_by_member, dms_by_member, channels_by_owner, dms_by_owner, \
+    messages_by_id, message_times, removed_message_times, message_words, message_shares, pinned_messages
+from src import config
+from src.ids import next_id
+from src.records import message_record
+from src.segments import read_segment, change_segment, write_segment, retire_segment, changed_segments
+
+# Longest handle a user can have, see auth_register_v2 and user_profile_sethandle_v1
+MAX_HANDLE_LENGTH = 20
+
+# Guards the activity counters of users, channels and dms, which are changed by threads
+# holding the locks of different channels and dms
+activity_lock = threading.Lock()
+
+# Shown in place of the text of a shared message once it has been removed, see message_text
+REMOVED_SHARE_TEXT = "[message removed]"
+
+# A word of a message, see words
+WORD_PATTERN = re.compile(r"\w+")
+
+# Guards the membership indexes (channels_by_member, dms_by_member, channels_by_owner
+# and dms_by_owner), as a user's set of channels is changed by threads holding the
+# locks of different channels. Checking a single membership needs no lock, but the
+# sets are only iterated over holding it.
+membership_lock = threading.Lock()
+
+# Guards the search index (message_words, message_shares and search_index_state), which
+# is changed by threads holding the locks of different channels and dms
+index_lock = threading.Lock()
+
+# Number of message_ids held by the postings of message_words, and how many of them
+# belong to removed messages, see forget_message_text and compact_search_index
+search_index_state = {
+    "entries": 0,
+    "stale": 0,
+}
+
+# Valid email addresses, see auth_register_v2 and user_profile_setemail_v2
+EMAIL_PATTERN = re.compile('^[a-zA-Z0-9]+[\\._]?[a-zA-Z0-9]+[@]\\w+[.]\\w{2,3}$')
+
+
+def is_removed(user):
+    '''
+    Checks if a user has been removed from Dreams
+
+    Arguments:
+        user :: [dict] - the user
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [bool] - True if the user has been removed
+    '''
+
+    return user["name_first"] == "Removed" and user["name_last"] == "user"
+
+
+def rebuild_indexes():
+    '''
+    Rebuilds every index from the users, channels and dms lists. Called whenever the
+    lists are replaced wholesale (clear_v1, update_data_read).
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    users_by_id.clear()
+    users_by_email.clear()
+    users_by_handle.clear()
+    handle_counters.clear()
+    channels_by_id.clear()
+    dms_by_id.clear()
+    channels_by_member.clear()
+    dms_by_member.clear()
+    channels_by_owner.clear()
+    dms_by_owner.clear()
+    messages_by_id.clear()
+    message_times.clear()
+    removed_message_times.clear()
+    pinned_messages.clear()
+    message_words.clear()
+    message_shares.clear()
+    search_index_state["entries"] = 0
+    search_index_state["stale"] = 0
+
+    for user in users:
+        index_user(user)
+
+    for channel in channels:
+        normalise_members(channel)
+        channel.setdefault("segments", [])
+        channel.setdefault("tombstones", [])
+        channel.setdefault("retention_seconds", None)
+        normalise_segments(channel)
+        channel["messages"] = [message_record(message) for message in channel["messages"]]
+        channels_by_id[channel["id"]] = channel
+        index_members(channel, channels_by_member, channels_by_owner)
+        index_messages(channel, True, 0)
+        index_message_times(channel, True)
+        index_pins(channel, True)
+        # Sealed messages are searched through the index too, so every segment is read once
+        for message in iter_messages(channel):
+            index_message_text(message)
+
+    for dm in dms:
+        normalise_members(dm)
+        dm.setdefault("segments", [])
+        dm.setdefault("tombstones", [])
+        dm.setdefault("retention_seconds", None)
+        normalise_segments(dm)
+        dm["messages"] = [message_record(message) for message in dm["messages"]]
+        dms_by_id[dm["id"]] = dm
+        index_members(dm, dms_by_member, dms_by_owner)
+        index_messages(dm, False, 0)
+        index_message_times(dm, False)
+        index_pins(dm, False)
+        # Sealed messages are searched through the index too, so every segment is read once
+        for message in iter_messages(dm):
+            index_message_text(message)
+
+    count_activity()
+
+
+def count_activity():
+    '''
+    Gives activity counters to the users, channels and dms saved before they were
+    kept, counting the messages and reacts they still hold. Messages removed before
+    then are not counted. Nothing is read when every counter was saved.
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    missing_users = {user["u_id"]: user for user in users if "activity" not in user}
+    missing_containers = [container for container in channels + dms if "activity" not in container]
+
+    for user in missing_users.values():
+        user["activity"] = {"messages_sent": 0, "reacts_given": 0, "reacts_received": 0}
+    for container in missing_containers:
+        container["activity"] = {"messages_sent": 0}
+
+    counted = {id(container) for container in missing_containers}
+    scanned = channels + dms if missing_users else missing_containers
+
+    for container in scanned:
+        for message in iter_messages(container):
+            if id(container) in counted:
+                container["activity"]["messages_sent"] += 1
+
+            author = missing_users.get(message["u_id"])
+            if author is not None:
+                author["activity"]["messages_sent"] += 1
+
+            for u_ids in message["reacts"].values():
+                if author is not None:
+                    author["activity"]["reacts_received"] += len(u_ids)
+                for u_id in u_ids:
+                    reacter = missing_users.get(u_id)
+                    if reacter is not None:
+                        reacter["activity"]["reacts_given"] += 1
+
+
+def index_user(user):
+    '''
+    Adds a user to the user indexes
+
+    Arguments:
+        user :: [dict] - the user
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    users_by_id[user["u_id"]] = user
+    users_by_handle[user["handle_str"]] = user
+    if not is_removed(user):
+        users_by_email[user["email"].lower()] = user
+
+
+def index_members(container, by_member, by_owner):
+    '''
+    Adds every member and owner of a channel or dm to the membership indexes
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        by_member :: [dict] - channels_by_member or dms_by_member
+        by_owner :: [dict] - channels_by_owner or dms_by_owner
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with membership_lock:
+        for u_id in container["all_members"]:
+            by_member.setdefault(u_id, set()).add(container["id"])
+        for u_id in container["owner_members"]:
+            by_owner.setdefault(u_id, set()).add(container["id"])
+
+
+def member_index(container):
+    '''
+    Finds the membership index a channel or dm belongs in
+
+    Arguments:
+        container :: [dict] - the channel or dm
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        by_member :: [dict] - channels_by_member for a channel, dms_by_member for a dm
+    '''
+
+    if channels_by_id.get(container["id"]) is container:
+        return channels_by_member
+    return dms_by_member
+
+
+def owner_index(container):
+    '''
+    Finds the ownership index a channel or dm belongs in
+
+    Arguments:
+        container :: [dict] - the channel or dm
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        by_owner :: [dict] - channels_by_owner for a channel, dms_by_owner for a dm
+    '''
+
+    if channels_by_id.get(container["id"]) is container:
+        return channels_by_owner
+    return dms_by_owner
+
+
+def index_messages(container, is_channel, start):
+    '''
+    (Re)indexes the messages of a channel or dm from position start onwards. Sealed
+    messages are indexed from their segment's message_ids, without reading the segment.
+    Removed messages are not indexed.
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        is_channel :: [bool] - True if container is a channel, False if it is a dm
+        start :: [int] - the first position to index
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    tombstones = set(container["tombstones"])
+
+    for segment in container["segments"]:
+        message_ids = segment["message_ids"]
+        for offset in range(max(start - segment["start"], 0), len(message_ids)):
+            if segment["start"] + offset not in tombstones:
+                messages_by_id[message_ids[offset]] = (container, is_channel, segment["start"] + offset)
+
+    cold = cold_count(container)
+    messages = container["messages"]
+    for position in range(max(start - cold, 0), len(messages)):
+        if cold + position not in tombstones:
+            messages_by_id[messages[position]["message_id"]] = (container, is_channel, cold + position)
+
+
+def index_message_times(container, is_channel):
+    '''
+    (Re)builds the time index of a channel or dm from its messages
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        is_channel :: [bool] - True if container is a channel, False if it is a dm
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    tombstones = set(container["tombstones"])
+
+    times = [(message["time_created"], message["message_id"]) for message in live_hot_messages(container)]
+    for segment in container["segments"]:
+        times.extend(
+            entry for offset, entry in enumerate(zip(segment["times"], segment["message_ids"]))
+            if segment["start"] + offset not in tombstones
+        )
+
+    message_times[(is_channel, container["id"])] = sorted(times)
+
+
+def index_pins(container, is_channel):
+    '''
+    (Re)builds the pin index of a channel or dm. Pinned sealed messages are found from
+    their segment's pinned message_ids, without reading the segment.
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        is_channel :: [bool] - True if container is a channel, False if it is a dm
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    pins = [
+        (message["time_created"], message["message_id"])
+        for message in live_hot_messages(container) if message["is_pinned"] == True
+    ]
+    for segment in container["segments"]:
+        if segment["pinned"]:
+            times = dict(zip(segment["message_ids"], segment["times"]))
+            pins.extend((times[message_id], message_id) for message_id in segment["pinned"])
+
+    pinned_messages[(is_channel, container["id"])] = sorted(pins)
+
+
+def add_user(user):
+    '''
+    Adds a new user to Dreams
+
+    Arguments:
+        user :: [dict] - the new user
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    user.setdefault("activity", {"messages_sent": 0, "reacts_given": 0, "reacts_received": 0})
+    users.append(user)
+    index_user(user)
+
+
+def get_user(u_id):
+    '''
+    Finds a user by their u_id
+
+    Arguments:
+        u_id :: [int] - the user's id
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        user :: [dict] - the user, or None if there is no such user
+    '''
+
+    try:
+        return users_by_id.get(u_id)
+    except TypeError:
+        # u_id is not a valid id (e.g. a list or dict was passed in)
+        return None
+
+
+def get_user_by_email(email):
+    '''
+    Finds the user (who has not been removed) using an email, ignoring case
+
+    Arguments:
+        email :: [str] - the email address
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        user :: [dict] - the user, or None if no active user has this email
+    '''
+
+    return users_by_email.get(email.lower())
+
+
+def get_user_by_handle(handle_str):
+    '''
+    Finds the user with a handle
+
+    Arguments:
+        handle_str :: [str] - the handle
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        user :: [dict] - the user, or None if no user has this handle
+    '''
+
+    return users_by_handle.get(handle_str)
+
+
+def set_user_email(user, email):
+    '''
+    Changes a user's email, keeping the email index up to date
+
+    Arguments:
+        user :: [dict] - the user
+        email :: [str] - the new email address
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    if users_by_email.get(user["email"].lower()) is user:
+        del users_by_email[user["email"].lower()]
+    user["email"] = email
+    if not is_removed(user):
+        users_by_email[email.lower()] = user
+
+
+def set_user_handle(user, handle_str):
+    '''
+    Changes a user's handle, keeping the handle index up to date
+
+    Arguments:
+        user :: [dict] - the user
+        handle_str :: [str] - the new handle
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    if users_by_handle.get(user["handle_str"]) is user:
+        del users_by_handle[user["handle_str"]]
+        # The old handle is free again, so a smaller number may now give a free handle
+        handle_counters.clear()
+    user["handle_str"] = handle_str
+    users_by_handle[handle_str] = user
+
+
+def allocate_handle(handle):
+    '''
+    Finds the handle for a new user. If the generated handle is taken, the smallest
+    number (starting at 0) that forms a free handle is appended, cutting the handle
+    short so it stays within MAX_HANDLE_LENGTH characters. The number tried last is
+    remembered so registering many users with the same name does not retry every
+    number that is already taken.
+
+    Arguments:
+        handle :: [str] - the generated handle, at most MAX_HANDLE_LENGTH characters
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        handle_str :: [str] - a handle that no user has
+    '''
+
+    if handle not in users_by_handle:
+        return handle
+
+    count = handle_counters.get(handle, 0)
+    while True:
+        number = str(count)
+        candidate = handle[:MAX_HANDLE_LENGTH - len(number)] + number
+        if candidate not in users_by_handle:
+            break
+        count += 1
+
+    # Every smaller number gives a taken handle, and handles are only freed by
+    # set_user_handle, which resets the counters
+    handle_counters[handle] = count
+
+    return candidate
+
+
+def remove_user(user):
+    '''
+    Marks a user as removed from Dreams. Their email becomes available to new users
+    but their handle stays reserved.
+
+    Arguments:
+        user :: [dict] - the user
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    if users_by_email.get(user["email"].lower()) is user:
+        del users_by_email[user["email"].lower()]
+    user["name_first"] = "Removed"
+    user["name_last"] = "user"
+
+
+def add_channel(channel):
+    '''
+    Adds a new channel
+
+    Arguments:
+        channel :: [dict] - the new channel
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    channel.setdefault("segments", [])
+    channel.setdefault("tombstones", [])
+    channel.setdefault("retention_seconds", None)
+    channel.setdefault("activity", {"messages_sent": 0})
+    channels.append(channel)
+    channels_by_id[channel["id"]] = channel
+    index_members(channel, channels_by_member, channels_by_owner)
+    index_messages(channel, True, 0)
+    index_message_times(channel, True)
+
+
+def get_channel(channel_id):
+    '''
+    Finds a channel by its id
+
+    Arguments:
+        channel_id :: [int] - the channel's id
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        channel :: [dict] - the channel, or None if there is no such channel
+    '''
+
+    try:
+        return channels_by_id.get(channel_id)
+    except TypeError:
+        # channel_id is not a valid id (e.g. a list or dict was passed in)
+        return None
+
+
+def add_dm(dm):
+    '''
+    Adds a new dm
+
+    Arguments:
+        dm :: [dict] - the new dm
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    dm.setdefault("segments", [])
+    dm.setdefault("tombstones", [])
+    dm.setdefault("retention_seconds", None)
+    dm.setdefault("activity", {"messages_sent": 0})
+    dms.append(dm)
+    dms_by_id[dm["id"]] = dm
+    index_members(dm, dms_by_member, dms_by_owner)
+    index_messages(dm, False, 0)
+    index_message_times(dm, False)
+
+
+def member_channel_ids(u_id):
+    '''
+    Finds every channel a user is a member of
+
+    Arguments:
+        u_id :: [int] - the user's id
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        channel_ids :: [list] - ids of the user's channels, in the order they were created
+    '''
+
+    with membership_lock:
+        channel_ids = list(channels_by_member.get(u_id, ()))
+
+    return sorted(channel_ids)
+
+
+def member_dm_ids(u_id):
+    '''
+    Finds every dm a user is a member of
+
+    Arguments:
+        u_id :: [int] - the user's id
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        dm_ids :: [list] - ids of the user's dms, in the order they were created
+    '''
+
+    with membership_lock:
+        dm_ids = list(dms_by_member.get(u_id, ()))
+
+    return sorted(dm_ids)
+
+
+def get_dm(dm_id):
+    '''
+    Finds a dm by its id
+
+    Arguments:
+        dm_id :: [int] - the dm's id
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        dm :: [dict] - the dm, or None if there is no such dm
+    '''
+
+    try:
+        return dms_by_id.get(dm_id)
+    except TypeError:
+        # dm_id is not a valid id (e.g. a list or dict was passed in)
+        return None
+
+
+def remove_dm(dm_id):
+    '''
+    Removes a dm along with all of its messages
+
+    Arguments:
+        dm_id :: [int] - the dm's id
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    dm = dms_by_id.pop(dm_id)
+    with membership_lock:
+        for u_id in dm["all_members"]:
+            dms_by_member.get(u_id, set()).discard(dm_id)
+        for u_id in dm["owner_members"]:
+            dms_by_owner.get(u_id, set()).discard(dm_id)
+    for segment in dm["segments"]:
+        for message in read_segment(segment["segment_id"]):
+            if messages_by_id.pop(message["message_id"], None) is not None:
+                forget_message_text(message)
+        retire_segment(segment["segment_id"])
+    for message in dm["messages"]:
+        if messages_by_id.pop(message["message_id"], None) is not None:
+            forget_message_text(message)
+    message_times.pop((False, dm_id), None)
+    removed_message_times.pop((False, dm_id), None)
+    pinned_messages.pop((False, dm_id), None)
+    dms.remove(dm)
+
+
+def add_message(container, is_channel, message):
+    '''
+    Appends a message to a channel or dm, counting it as sent by its author
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        is_channel :: [bool] - True if container is a channel, False if it is a dm
+        message :: [dict] - the new message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    container["messages"].append(message)
+    position = message_count(container) - 1
+    messages_by_id[message["message_id"]] = (container, is_channel, position)
+    index_message_text(message)
+
+    with activity_lock:
+        container["activity"]["messages_sent"] += 1
+        author = users_by_id.get(message["u_id"])
+        if author is not None:
+            author["activity"]["messages_sent"] += 1
+
+    times = message_times.setdefault((is_channel, container["id"]), [])
+    entry = (message["time_created"], message["message_id"])
+    if not times or entry >= times[-1]:
+        times.append(entry)
+    else:
+        # Sent late (by message_sendlater_thread or finish_standup) after a newer message
+        bisect.insort(times, entry)
+
+
+def find_message(message_id):
+    '''
+    Finds a message in any channel or dm
+
+    Arguments:
+        message_id :: [int] - id of the message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        (container, is_channel, message) - the channel or dm holding the message, whether
+        it is a channel, and the message itself. None if the message does not exist
+    '''
+
+    try:
+        location = messages_by_id.get(message_id)
+    except TypeError:
+        return None
+    if location is None:
+        return None
+
+    container, is_channel, position = location
+    return container, is_channel, message_at(container, position)
+
+
+def message_position(container, message_id):
+    '''
+    Finds where a message is in a channel or dm
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        message_id :: [int] - id of the message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        position :: [int] - index of the message among every message in the channel or dm
+        (sealed ones first), or None if the message is not in this channel or dm
+    '''
+
+    try:
+        location = messages_by_id.get(message_id)
+    except TypeError:
+        return None
+    if location is None or location[0] is not container:
+        return None
+
+    return location[2]
+
+
+def remove_message(message_id):
+    '''
+    Removes a message from its channel or dm. The message is left where it is as a
+    tombstone, which every lookup, page and search skips, so no later message moves and
+    removing costs the same however many messages the channel or dm holds. Tombstones
+    are cleared out by compact_tombstones.
+
+    Arguments:
+        message_id :: [int] - id of the message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [bool] - True once the channel or dm holds config.tombstone_compact_threshold
+        tombstones and should be compacted
+    '''
+
+    container, is_channel, position = messages_by_id.pop(message_id)
+    message = message_at(container, position)
+    cold = cold_count(container)
+
+    entry = (message["time_created"], message_id)
+    bisect.insort(removed_message_times.setdefault((is_channel, container["id"]), []), entry)
+
+    if message["is_pinned"] == True:
+        unindex_pin(container, is_channel, message)
+        if position < cold:
+            container["segments"][segment_index(container, position)]["pinned"].remove(message_id)
+
+    forget_message_text(message)
+
+    bisect.insort(container["tombstones"], position)
+
+    return len(container["tombstones"]) >= config.tombstone_compact_threshold
+
+
+def messages_between(container, is_channel, time_start, time_end, start, count):
+    '''
+    Finds the messages of a channel or dm created between two times, using bisection
+    on the time index rather than looking at every message
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        is_channel :: [bool] - True if container is a channel, False if it is a dm
+        time_start :: [int] - unix timestamp, messages created before it are left out
+        time_end :: [int] - unix timestamp, messages created after it are left out
+        start :: [int] - number of the most recent matching messages to skip
+        count :: [int] - most messages to return
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        (messages, total) - up to count of the matching messages, most recent first,
+        and the total number of matching messages
+    '''
+
+    times = message_times.get((is_channel, container["id"]), [])
+    low = bisect.bisect_left(times, (time_start,))
+    high = bisect.bisect_right(times, (time_end, float("inf")))
+
+    # Entries of removed messages are still in times, and are skipped
+    removed = removed_message_times.get((is_channel, container["id"]), [])
+    removed_high = bisect.bisect_right(removed, (time_end, float("inf")))
+    total = max(high - low - (removed_high - bisect.bisect_left(removed, (time_start,))), 0)
+
+    # The lowest index with at most start matching messages after it is the most recent
+    # message to return, as in messages_page
+    first = low
+    last = high
+    while first < last:
+        middle = (first + last) // 2
+        after = high - middle - 1
+        if middle + 1 < high:
+            after -= removed_high - bisect.bisect_left(removed, times[middle + 1])
+        if after <= start:
+            last = middle
+        else:
+            first = middle + 1
+
+    messages = []
+    idx = first
+    while idx >= low and len(messages) < count and start + len(messages) < total:
+        location = messages_by_id.get(times[idx][1])
+        if location is not None:
+            messages.append(message_at(container, location[2]))
+        idx -= 1
+
+    return messages, total
+
+
+def message_details(message, u_id):
+    '''
+    Builds the details of a message shown to a user
+
+    Arguments:
+        message :: [dict] - the message
+        u_id :: [int] - id of the user the message is shown to
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        (dict) containing message_id, u_id, message, time_created, reacts and is_pinned
+    '''
+
+    reacts = []
+    for react_id in config.react_ids:
+        u_ids = message["reacts"].get(react_id, ())
+        reacts.append({
+            "react_id": react_id,
+            "u_ids": sorted(u_ids),
+            "is_this_user_reacted": u_id in u_ids
+        })
+
+    return {
+        "message_id": message["message_id"],
+        "u_id": message["u_id"],
+        "message": message_text(message),
+        "time_created": message["time_created"],
+        "reacts": reacts,
+        "is_pinned": message["is_pinned"]
+    }
+
+
+def message_text(message):
+    '''
+    Puts together the text shown for a message. A message sharing another message
+    shows its comment followed by the current text of the shared message, so editing
+    the shared message changes every share of it. Once the shared message has been
+    removed its text is shown as REMOVED_SHARE_TEXT. Shares of shares are followed
+    back to the first message.
+
+    Arguments:
+        message :: [dict] - the message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        text :: [str] - the text of the message
+    '''
+
+    comments = []
+    while message is not None and message.get("shared_message_id") is not None:
+        comments.append(message["message"])
+        location = find_message(message["shared_message_id"])
+        message = location[2] if location is not None else None
+
+    text = message["message"] if message is not None else REMOVED_SHARE_TEXT
+    for comment in reversed(comments):
+        text = f"{comment}:\n  \"\"\n  {text}\n  \"\""
+
+    return text
+
+
+def cold_count(container):
+    '''
+    Counts the messages of a channel or dm that have been sealed into segments
+
+    Arguments:
+        container :: [dict] - the channel or dm
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        count :: [int] - number of sealed messages
+    '''
+
+    segments = container["segments"]
+    if not segments:
+        return 0
+
+    return segments[-1]["start"] + len(segments[-1]["message_ids"])
+
+
+def message_count(container):
+    '''
+    Counts every message in a channel or dm, sealed or in memory
+
+    Arguments:
+        container :: [dict] - the channel or dm
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        count :: [int] - number of messages
+    '''
+
+    return cold_count(container) + len(container["messages"])
+
+
+def segment_index(container, position):
+    '''
+    Finds the segment holding a sealed message
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        position :: [int] - position of the message, less than cold_count(container)
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        idx :: [int] - index of the segment in the container's segments list
+    '''
+
+    # bisect only takes a key from Python 3.10, so the segments are bisected by hand
+    segments = container["segments"]
+    low, high = 0, len(segments)
+    while low < high:
+        middle = (low + high) // 2
+        if segments[middle]["start"] <= position:
+            low = middle + 1
+        else:
+            high = middle
+
+    return low - 1
+
+
+def message_at(container, position):
+    '''
+    Finds the message at a position in a channel or dm, reading it from its segment
+    (through the segment cache) if it has been sealed
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        position :: [int] - position of the message, 0 being the oldest message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        message :: [dict] - the message
+    '''
+
+    cold = cold_count(container)
+    if position >= cold:
+        return container["messages"][position - cold]
+
+    segment = container["segments"][segment_index(container, position)]
+    return read_segment(segment["segment_id"])[position - segment["start"]]
+
+
+def iter_messages(container):
+    '''
+    Goes through every message in a channel or dm, oldest first, reading sealed
+    segments one at a time. Removed messages are skipped.
+
+    Arguments:
+        container :: [dict] - the channel or dm
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        messages :: [iterator] - the messages
+    '''
+
+    tombstones = set(container["tombstones"])
+
+    for segment in container["segments"]:
+        for offset, message in enumerate(read_segment(segment["segment_id"])):
+            if segment["start"] + offset not in tombstones:
+                yield message
+
+    yield from live_hot_messages(container)
+
+
+def live_hot_messages(container):
+    '''
+    Goes through the messages of a channel or dm held in memory, oldest first,
+    skipping removed messages
+
+    Arguments:
+        container :: [dict] - the channel or dm
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        messages :: [iterator] - the messages
+    '''
+
+    cold = cold_count(container)
+    tombstones = container["tombstones"]
+    if not tombstones or tombstones[-1] < cold:
+        yield from container["messages"]
+        return
+
+    tombstones = set(tombstones)
+    for offset, message in enumerate(container["messages"]):
+        if cold + offset not in tombstones:
+            yield message
+
+
+def is_tombstone(container, position):
+    '''
+    Checks if the message at a position of a channel or dm has been removed
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        position :: [int] - position of the message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [bool] - True if the message has been removed, otherwise False
+    '''
+
+    tombstones = container["tombstones"]
+    idx = bisect.bisect_left(tombstones, position)
+    return idx < len(tombstones) and tombstones[idx] == position
+
+
+def live_count(container):
+    '''
+    Counts the messages of a channel or dm which have not been removed
+
+    Arguments:
+        container :: [dict] - the channel or dm
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        count :: [int] - number of messages
+    '''
+
+    return message_count(container) - len(container["tombstones"])
+
+
+def newer_count(container, position):
+    '''
+    Counts the messages of a channel or dm at or after a position which have not been
+    removed, i.e. the index (0 being the most recent) of the message just before it
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        position :: [int] - the position
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        count :: [int] - number of messages
+    '''
+
+    tombstones = container["tombstones"]
+    removed = len(tombstones) - bisect.bisect_left(tombstones, position)
+
+    return message_count(container) - position - removed
+
+
+def messages_page(container, start, count):
+    '''
+    Finds a page of a channel or dm's messages, skipping removed messages. Index 0 is
+    the most recent message. The position of index start is found by bisection, then
+    the page is read backwards from it.
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        start :: [int] - index of the first message of the page
+        count :: [int] - largest number of messages to return
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        messages :: [list] - the messages, most recent first
+    '''
+
+    # The lowest position with at most start messages after it is the position of index
+    # start, as newer_count(position + 1) only ever drops by one
+    low = 0
+    high = message_count(container)
+    while low < high:
+        middle = (low + high) // 2
+        if newer_count(container, middle + 1) <= start:
+            high = middle
+        else:
+            low = middle + 1
+
+    tombstones = container["tombstones"]
+    idx = bisect.bisect_right(tombstones, low) - 1
+
+    messages = []
+    position = low
+    while position >= 0 and len(messages) < count and start + len(messages) < live_count(container):
+        if idx >= 0 and tombstones[idx] == position:
+            idx -= 1
+        else:
+            messages.append(message_at(container, position))
+        position -= 1
+
+    return messages
+
+
+def is_sealed(message_id):
+    '''
+    Checks if a message has been sealed into a segment
+
+    Arguments:
+        message_id :: [int] - id of the message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [bool] - True if the message is in a segment, False if it is in memory or does
+        not exist
+    '''
+
+    try:
+        location = messages_by_id.get(message_id)
+    except TypeError:
+        return False
+    if location is None:
+        return False
+
+    container, _, position = location
+    return position < cold_count(container)
+
+
+def writable_message(message_id):
+    '''
+    Finds a message in order to change it. A sealed message is changed in a copy of
+    its segment kept in memory, which the next snapshot writes out as a new segment.
+
+    Arguments:
+        message_id :: [int] - id of the message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        message :: [dict] - the message
+    '''
+
+    container, _, position = messages_by_id[message_id]
+    cold = cold_count(container)
+    if position >= cold:
+        return container["messages"][position - cold]
+
+    segment = container["segments"][segment_index(container, position)]
+    return change_segment(segment["segment_id"])[position - segment["start"]]
+
+
+def compact_tombstones():
+    '''
+    Rewrites the messages of every channel or dm holding at least
+    config.tombstone_compact_threshold removed messages without them. Segments holding
+    removed messages are changed, and written out as new segments by seal_segments.
+    Called by write_snapshot while no change is being made, as positions in the
+    journal must match the snapshot they are replayed into.
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    for container in channels + dms:
+        tombstones = container["tombstones"]
+        if len(tombstones) < config.tombstone_compact_threshold:
+            continue
+
+        is_channel = channels_by_id.get(container["id"]) is container
+        cold = cold_count(container)
+        removed = set(tombstones)
+
+        shift = 0
+        for segment in container["segments"]:
+            start = segment["start"]
+            segment["start"] = start - shift
+            offsets = [
+                position - start for position in tombstones[
+                    bisect.bisect_left(tombstones, start):
+                    bisect.bisect_left(tombstones, start + len(segment["message_ids"]))
+                ]
+            ]
+            if not offsets:
+                continue
+
+            messages = change_segment(segment["segment_id"])
+            for offset in reversed(offsets):
+                del messages[offset]
+                del segment["message_ids"][offset]
+                del segment["times"][offset]
+            shift += len(offsets)
+
+        container["messages"] = [
+            message for offset, message in enumerate(container["messages"])
+            if cold + offset not in removed
+        ]
+        tombstones.clear()
+
+        removed_times = set(removed_message_times.pop((is_channel, container["id"]), []))
+        times = message_times.get((is_channel, container["id"]), [])
+        times[:] = [entry for entry in times if entry not in removed_times]
+
+        index_messages(container, is_channel, 0)
+
+
+def seal_segments():
+    '''
+    Writes every changed segment out as a new segment, and seals the oldest messages
+    of each channel or dm into new segments once more than
+    config.hot_message_count + config.segment_size messages are in memory. Called by
+    write_snapshot while no change is being made, so data.json and the segments it
+    refers to always match.
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    for container in channels + dms:
+        segments = container["segments"]
+
+        for segment in list(segments):
+            messages = changed_segments.get(segment["segment_id"])
+            if messages is None:
+                continue
+            retire_segment(segment["segment_id"])
+            if not messages:
+                segments.remove(segment)
+                continue
+            segment["segment_id"] = next_id("segments")
+            write_segment(segment["segment_id"], messages)
+
+        hot = container["messages"]
+        while len(hot) >= config.hot_message_count + config.segment_size:
+            sealed = hot[:config.segment_size]
+            start = cold_count(container)
+            segment = {
+                "segment_id": next_id("segments"),
+                "start": start,
+                "message_ids": [message["message_id"] for message in sealed],
+                "times": [message["time_created"] for message in sealed],
+                "pinned": [
+                    message["message_id"] for offset, message in enumerate(sealed)
+                    if message["is_pinned"] == True and is_tombstone(container, start + offset) == False
+                ],
+            }
+            write_segment(segment["segment_id"], sealed)
+            segments.append(segment)
+            del hot[:config.segment_size]
+
+
+def segment_ids_in_use():
+    '''
+    Finds the id of every segment in the data store
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        segment_ids :: [set] - the segment ids
+    '''
+
+    return {
+        segment["segment_id"]
+        for container in channels + dms
+        for segment in container["segments"]
+    }
+
+
+def words(text):
+    '''
+    Finds every distinct word of a piece of text, a word being a run of letters, digits
+    and underscores
+
+    Arguments:
+        text :: [str] - the text
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [set] - the words of text
+    '''
+
+    return set(WORD_PATTERN.findall(text))
+
+
+def query_words(query_str):
+    '''
+    Splits a query into its words, noting which end of each word is cut off by the
+    query. A word in the middle of the query must be a whole word of a matching
+    message, the first word may be the end of a longer word, the last word may be the
+    start of one, and a query of a single word may be anywhere inside one.
+
+    Arguments:
+        query_str :: [str] - the text to search for
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [list] - (word, starts_word, ends_word) for each word of the query, where
+        starts_word is True if the word can not be the end of a longer word and
+        ends_word is True if it can not be the start of one
+    '''
+
+    return [
+        (match.group(), match.start() > 0, match.end() < len(query_str))
+        for match in WORD_PATTERN.finditer(query_str)
+    ]
+
+
+def word_matches(indexed, word, starts_word, ends_word):
+    '''
+    Checks if an indexed word could hold a word of a query
+
+    Arguments:
+        indexed :: [str] - the indexed word
+        word :: [str] - the word of the query
+        starts_word :: [bool] - True if the word must start the indexed word
+        ends_word :: [bool] - True if the word must end the indexed word
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [bool] - True if the indexed word could hold the word of the query
+    '''
+
+    if starts_word == True and ends_word == True:
+        return indexed == word
+    if starts_word == True:
+        return indexed.startswith(word)
+    if ends_word == True:
+        return indexed.endswith(word)
+    return word in indexed
+
+
+def word_posting(word, starts_word, ends_word):
+    '''
+    Finds the messages which could contain a word of a query. A whole word is looked up
+    directly, otherwise every indexed word is checked, which costs as much as the
+    number of distinct words rather than the number of messages.
+
+    Arguments:
+        word :: [str] - the word of the query
+        starts_word :: [bool] - True if the word must start an indexed word
+        ends_word :: [bool] - True if the word must end an indexed word
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        message_ids :: [array or set] - ids of the messages which could contain the
+        word, a sorted array for a whole word
+    '''
+
+    if starts_word == True and ends_word == True:
+        return message_words.get(word, array("q"))
+
+    message_ids = set()
+    for indexed, posting in message_words.items():
+        if word_matches(indexed, word, starts_word, ends_word) == True:
+            message_ids.update(posting)
+
+    return message_ids
+
+
+def posting_contains(posting, message_id):
+    '''
+    Checks if a posting of the search index holds a message, by bisection for a
+    sorted array
+
+    Arguments:
+        posting :: [array or set] - message_ids, see word_posting
+        message_id :: [int] - id of the message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [bool] - True if the posting holds message_id
+    '''
+
+    if isinstance(posting, set):
+        return message_id in posting
+
+    idx = bisect.bisect_left(posting, message_id)
+    return idx < len(posting) and posting[idx] == message_id
+
+
+def sharing_posting(posting, word, starts_word, ends_word):
+    '''
+    Finds the messages which could contain a word of a query through a message they
+    share, directly or through other shares, as the text of a share holds the words
+    of every message it leads back to (see message_text). Only the shares of messages
+    in the posting are followed, along with the shares of removed messages if the
+    word could be part of REMOVED_SHARE_TEXT.
+
+    Arguments:
+        posting :: [array or set] - ids of the messages which could contain the word
+        word :: [str] - the word of the query
+        starts_word :: [bool] - True if the word must start an indexed word
+        ends_word :: [bool] - True if the word must end an indexed word
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        message_ids :: [set] - ids of the shares which could contain the word
+    '''
+
+    if len(posting) < len(message_shares):
+        pending = [message_id for message_id in posting if message_id in message_shares]
+    else:
+        pending = [message_id for message_id in message_shares if posting_contains(posting, message_id)]
+
+    if any(word_matches(removed, word, starts_word, ends_word) for removed in words(REMOVED_SHARE_TEXT)):
+        pending.extend(message_id for message_id in message_shares if message_id not in messages_by_id)
+
+    message_ids = set()
+    while pending:
+        for share_id in message_shares.get(pending.pop(), ()):
+            if share_id not in message_ids:
+                message_ids.add(share_id)
+                pending.append(share_id)
+
+    return message_ids
+
+
+def index_message_text(message):
+    '''
+    Adds a message to the search index. Each posting is a sorted array of message_ids,
+    which costs 8 bytes a message rather than the ~70 of a set. Messages sharing
+    another message are also added to the index of shares, as their text is only put
+    together when read.
+
+    Arguments:
+        message :: [dict] - the message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with index_lock:
+        message_id = message["message_id"]
+        for word in words(message["message"]):
+            posting = message_words.get(word)
+            if posting is None:
+                message_words[word] = array("q", [message_id])
+            elif posting[-1] < message_id:
+                posting.append(message_id)
+            else:
+                # Messages sent later or replayed keep the id they were given when scheduled
+                idx = bisect.bisect_left(posting, message_id)
+                if idx < len(posting) and posting[idx] == message_id:
+                    continue
+                posting.insert(idx, message_id)
+            search_index_state["entries"] += 1
+
+        shared_message_id = message.get("shared_message_id")
+        if shared_message_id is not None:
+            message_shares.setdefault(shared_message_id, set()).add(message_id)
+
+
+def unindex_message_text(message):
+    '''
+    Removes a message from the search index straight away, for a message whose text is
+    changed. Removed messages are left to forget_message_text.
+
+    Arguments:
+        message :: [dict] - the message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with index_lock:
+        message_id = message["message_id"]
+        for word in words(message["message"]):
+            posting = message_words.get(word)
+            if posting is None:
+                continue
+            idx = bisect.bisect_left(posting, message_id)
+            if idx == len(posting) or posting[idx] != message_id:
+                continue
+            del posting[idx]
+            search_index_state["entries"] -= 1
+            if not posting:
+                del message_words[word]
+
+        unindex_message_share(message)
+
+
+def forget_message_text(message):
+    '''
+    Drops a removed message from the search index. Its ids are left in the postings,
+    as taking them out of a long posting moves the rest of it, and searches skip ids
+    no longer in messages_by_id. They are cleared out by compact_search_index.
+
+    Arguments:
+        message :: [dict] - the message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with index_lock:
+        search_index_state["stale"] += len(words(message["message"]))
+        unindex_message_share(message)
+
+
+def unindex_message_share(message):
+    '''
+    Removes a message from the index of shares. Called holding index_lock.
+
+    Arguments:
+        message :: [dict] - the message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    shares = message_shares.get(message.get("shared_message_id"))
+    if shares is not None:
+        shares.discard(message["message_id"])
+        if not shares:
+            del message_shares[message["shared_message_id"]]
+
+
+def compact_search_index():
+    '''
+    Rewrites the postings of the search index without removed messages, once they
+    make up config.search_index_stale_ratio of its entries. Called by write_snapshot
+    while no change is being made.
+
+    Arguments:
+        None
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    with index_lock:
+        if search_index_state["stale"] <= search_index_state["entries"] * config.search_index_stale_ratio:
+            return
+
+        entries = 0
+        for word in list(message_words):
+            posting = array("q", [message_id for message_id in message_words[word] if message_id in messages_by_id])
+            if posting:
+                message_words[word] = posting
+                entries += len(posting)
+            else:
+                del message_words[word]
+
+        search_index_state["entries"] = entries
+        search_index_state["stale"] = 0
+
+
+def set_message_text(message, text):
+    '''
+    Changes the text of a message, keeping the search index up to date. The whole text
+    shown is replaced, so a message sharing another message stops sharing it and only
+    shows the new text.
+
+    Arguments:
+        message :: [dict] - the message
+        text :: [str] - the new text
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    indexed = message["message_id"] in messages_by_id
+    if indexed == True:
+        unindex_message_text(message)
+
+    changed = [message]
+    if is_sealed(message["message_id"]) == True:
+        # Sealed messages are changed in a copy of their segment
+        changed.append(writable_message(message["message_id"]))
+
+    for changed_message in changed:
+        changed_message["message"] = text
+        if changed_message.get("shared_message_id") is not None:
+            changed_message["shared_message_id"] = None
+
+    if indexed == True:
+        index_message_text(message)
+
+
+def set_message_pinned(message, is_pinned):
+    '''
+    Pins or unpins a message, keeping the pin index up to date
+
+    Arguments:
+        message :: [dict] - the message
+        is_pinned :: [bool] - True to pin the message, False to unpin it
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    message_id = message["message_id"]
+    container, is_channel, position = messages_by_id[message_id]
+
+    if is_sealed(message_id) == True:
+        # Sealed messages are changed in a copy of their segment
+        writable_message(message_id)["is_pinned"] = is_pinned
+        segment = container["segments"][segment_index(container, position)]
+        if is_pinned == True:
+            segment["pinned"].append(message_id)
+        else:
+            segment["pinned"].remove(message_id)
+
+    message["is_pinned"] = is_pinned
+
+    if is_pinned == True:
+        entry = (message["time_created"], message_id)
+        bisect.insort(pinned_messages.setdefault((is_channel, container["id"]), []), entry)
+    else:
+        unindex_pin(container, is_channel, message)
+
+
+def unindex_pin(container, is_channel, message):
+    '''
+    Removes a message from the pin index
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        is_channel :: [bool] - True if container is a channel, False if it is a dm
+        message :: [dict] - the message
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    pins = pinned_messages.get((is_channel, container["id"]), [])
+    entry = (message["time_created"], message["message_id"])
+    idx = bisect.bisect_left(pins, entry)
+    if idx < len(pins) and pins[idx] == entry:
+        del pins[idx]
+
+
+def pinned_in(container, is_channel):
+    '''
+    Finds the pinned messages of a channel or dm, in O(pins). Pins are ordered by
+    when their message was sent, as messages sent later keep the id they were given
+    when scheduled.
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        is_channel :: [bool] - True if container is a channel, False if it is a dm
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        messages :: [list] - the pinned messages, most recent first
+    '''
+
+    pins = pinned_messages.get((is_channel, container["id"]), [])
+
+    return [find_message(message_id)[2] for _, message_id in reversed(pins)]
+
+
+def has_reacted(message, react_id, u_id):
+    '''
+    Checks if a user has reacted to a message
+
+    Arguments:
+        message :: [dict] - the message
+        react_id :: [int] - id of the react
+        u_id :: [int] - id of the user
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [bool] - True if the user has reacted with react_id, otherwise False
+    '''
+
+    return u_id in message["reacts"].get(react_id, ())
+
+
+def add_react(message, react_id, u_id):
+    '''
+    Adds a user's react to a message, counting it as given by the user and received by
+    the message's author
+
+    Arguments:
+        message :: [dict] - the message
+        react_id :: [int] - id of the react
+        u_id :: [int] - id of the user
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    if is_sealed(message["message_id"]) == True:
+        # Sealed messages are changed in a copy of their segment
+        writable_message(message["message_id"])["reacts"].setdefault(react_id, set()).add(u_id)
+
+    message["reacts"].setdefault(react_id, set()).add(u_id)
+
+    with activity_lock:
+        users_by_id[u_id]["activity"]["reacts_given"] += 1
+        author = users_by_id.get(message["u_id"])
+        if author is not None:
+            author["activity"]["reacts_received"] += 1
+
+
+def remove_react(message, react_id, u_id):
+    '''
+    Removes a user's react from a message, so it no longer counts as given by the user
+    nor received by the message's author
+
+    Arguments:
+        message :: [dict] - the message
+        react_id :: [int] - id of the react
+        u_id :: [int] - id of the user
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    if has_reacted(message, react_id, u_id) == False:
+        return
+
+    changed = [message]
+    if is_sealed(message["message_id"]) == True:
+        # Sealed messages are changed in a copy of their segment
+        changed.append(writable_message(message["message_id"]))
+
+    for reacts in [changed_message["reacts"] for changed_message in changed]:
+        u_ids = reacts.get(react_id)
+        if u_ids is None:
+            continue
+        u_ids.discard(u_id)
+        # react_ids nobody has reacted with are not stored
+        if not u_ids:
+            del reacts[react_id]
+
+    with activity_lock:
+        users_by_id[u_id]["activity"]["reacts_given"] -= 1
+        author = users_by_id.get(message["u_id"])
+        if author is not None:
+            author["activity"]["reacts_received"] -= 1
+
+
+def search_messages(query_str, containers):
+    '''
+    Finds every message in the given channels/dms whose text contains query_str.
+    Candidates in memory are found by intersecting the postings of the query's
+    words (see query_words) and then checked with a substring test, so the results are
+    exactly the same as testing every message. Queries without any word are answered
+    by scanning the containers instead. Sealed messages are in the search index too,
+    and only the segments holding a candidate are read, through the segment cache.
+    Messages sharing another message are matched against the text put together by
+    message_text, and are found by following the shares of each word's posting (see
+    sharing_posting).
+
+    Arguments:
+        query_str :: [str] - the text to search for
+        containers :: [list] - the channels/dms to search, in the order results are returned
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        messages :: [list] - matching messages, ordered by container then by position
+    '''
+
+    parts = query_words(query_str)
+    if not parts:
+        return [
+            message
+            for container in containers
+            for message in iter_messages(container)
+            if query_str in message_text(message)
+        ]
+
+    # Other threads change the search index while it is read
+    with index_lock:
+        postings = []
+        for word, starts_word, ends_word in parts:
+            posting = word_posting(word, starts_word, ends_word)
+            postings.append((posting, sharing_posting(posting, word, starts_word, ends_word)))
+
+        # Whole words are looked up first, shortest posting first, as they cost the least
+        # and match the fewest messages
+        postings.sort(key=lambda posting: (not isinstance(posting[0], array), len(posting[0]) + len(posting[1])))
+        candidates = set(postings[0][0]) | postings[0][1]
+        for posting, shares in postings[1:]:
+            if not candidates:
+                break
+            candidates = {
+                message_id for message_id in candidates
+                if message_id in shares or posting_contains(posting, message_id)
+            }
+
+    ranks = {id(container): rank for rank, container in enumerate(containers)}
+
+    located = []
+    for message_id in candidates:
+        # Postings still hold removed messages until compact_search_index
+        location = messages_by_id.get(message_id)
+        if location is None:
+            continue
+        container, _, position = location
+        rank = ranks.get(id(container))
+        if rank is not None:
+            located.append((rank, position, container))
+
+    # In order, so each segment holding candidates is read once
+    located.sort(key=lambda candidate: (candidate[0], candidate[1]))
+
+    matches = []
+    for _, position, container in located:
+        message = message_at(container, position)
+        if query_str in message_text(message):
+            matches.append(message)
+
+    return matches
+
+
+def is_member(container, u_id):
+    '''
+    Checks if a user is a member of a channel or dm
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        u_id :: [int] - the user's id
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [bool] - True if the user is a member
+    '''
+
+    try:
+        return container["id"] in member_index(container).get(u_id, ())
+    except TypeError:
+        # u_id is not a valid id (e.g. a list or dict was passed in)
+        return False
+
+
+def is_owner(container, u_id):
+    '''
+    Checks if a user is an owner of a channel or dm
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        u_id :: [int] - the user's id
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        [bool] - True if the user is an owner
+    '''
+
+    try:
+        return container["id"] in owner_index(container).get(u_id, ())
+    except TypeError:
+        # u_id is not a valid id (e.g. a list or dict was passed in)
+        return False
+
+
+def add_member(container, u_id):
+    '''
+    Adds a user to the members of a channel or dm. Whether they already are one is
+    looked up in the membership index rather than the list of members.
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        u_id :: [int] - the user's id
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    if is_member(container, u_id) == True:
+        return
+    container["all_members"].append(u_id)
+    with membership_lock:
+        member_index(container).setdefault(u_id, set()).add(container["id"])
+
+
+def remove_member(container, u_id):
+    '''
+    Removes a user from the members (and owners) of a channel or dm. Only a user found
+    in the membership index is looked for in the list of members, which keeps the
+    order they joined in.
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        u_id :: [int] - the user's id
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    remove_owner(container, u_id)
+    if is_member(container, u_id) == False:
+        return
+    container["all_members"].remove(u_id)
+    with membership_lock:
+        member_index(container)[u_id].discard(container["id"])
+
+
+def add_owner(container, u_id):
+    '''
+    Makes a member of a channel or dm one of its owners
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        u_id :: [int] - the user's id
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    if is_owner(container, u_id) == True:
+        return
+    container["owner_members"].append(u_id)
+    with membership_lock:
+        owner_index(container).setdefault(u_id, set()).add(container["id"])
+
+
+def remove_owner(container, u_id):
+    '''
+    Removes a user from the owners of a channel or dm. They remain a member.
+
+    Arguments:
+        container :: [dict] - the channel or dm
+        u_id :: [int] - the user's id
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    if is_owner(container, u_id) == False:
+        return
+    container["owner_members"].remove(u_id)
+    with membership_lock:
+        owner_index(container)[u_id].discard(container["id"])
+
+
+def member_profiles(u_ids):
+    '''
+    Looks up the profile of each member of a channel or dm. Membership only stores
+    u_ids, so profiles always reflect the user's current name, email and handle.
+
+    Arguments:
+        u_ids :: [list] - u_ids of the members
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        profiles :: [list] - dictionaries containing u_id, email, name_first, name_last
+        and handle_str, in the same order as u_ids
+    '''
+
+    profiles = []
+    for u_id in u_ids:
+        user = users_by_id[u_id]
+        profiles.append({
+            'u_id': u_id,
+            'email': user['email'],
+            'name_first': user['name_first'],
+            'name_last': user['name_last'],
+            'handle_str': user['handle_str'],
+        })
+
+    return profiles
+
+
+def normalise_members(container):
+    '''
+    Converts the members of a channel or dm saved as profile dictionaries (by older
+    versions of Dreams) into u_ids
+
+    Arguments:
+        container :: [dict] - the channel or dm
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    for key in ["owner_members", "all_members"]:
+        container[key] = [
+            member["u_id"] if isinstance(member, dict) else member
+            for member in container[key]
+        ]
+
+
+def normalise_segments(container):
+    '''
+    Adds the pinned message_ids to segments saved before segments recorded them,
+    reading each such segment once. Removed messages are dropped from them, as a
+    removal replayed from the journal only adds a tombstone.
+
+    Arguments:
+        container :: [dict] - the channel or dm
+
+    Exceptions:
+        N/A
+
+    Return Value:
+        None
+    '''
+
+    for segment in container["segments"]:
+        if "pinned" not in segment:
+            segment["pinned"] = [
+                message["message_id"]
+                for message in read_segment(segment["segment_id"])
+                if message["is_pinned"] == True
+            ]
+
+        segment["pinned"] = [
+            message_id for message_id in segment["pinned"]
+            if is_tombstone(container, segment["start"] + segment["message_ids"].index(message_id)) == False
+        ]
@@ -1,10 +1,13 @@
-import re
-
-from src.data import users, channels, dms, sessions
+from src.data import users, channels, dms, channels_by_member, dms_by_member, messages_by_id
 import src.other
 from src.error import InputError, AccessError
+from src.store import get_user, get_user_by_email, get_user_by_handle, set_user_email, \
+    set_user_handle, remove_user, is_removed, set_message_text, remove_member, \
+    iter_messages, EMAIL_PATTERN
+from src.locks import locks_registry, container_lock
 
 
+@locks_registry
 def user_profile_setname_v2(token, name_first, name_last):
     '''
     Update the authorised user's first and last name
@@ -30,36 +33,16 @@ def user_profile_setname_v2(token, name_first, name_last):
 
     u_id = src.other.check_session_id(token)
 
-    for profile in users:
-        if profile["u_id"] == u_id:
-            profile["name_first"] = name_first
-            profile["name_last"] = name_last
-
-    for channel in channels:
-        for user in channel["owner_members"]:
-            if user["u_id"] == u_id:
-                user["name_first"] = name_first
-                user["name_last"] = name_last
-        for user in channel["all_members"]:
-            if user["u_id"] == u_id:
-                user["name_first"] = name_first
-                user["name_last"] = name_last
-
-    for dm in dms:
-        for user in dm["owner_members"]:
-            if user["u_id"] == u_id:
-                user["name_first"] = name_first
-                user["name_last"] = name_last
-        for user in dm["all_members"]:
-            if user["u_id"] == u_id:
-                user["name_first"] = name_first
-                user["name_last"] = name_last
+    profile = get_user(u_id)
+    profile["name_first"] = name_first
+    profile["name_last"] = name_last
 
     src.other.update_data_write()
     return {
     }
 
 
+@locks_registry
 def user_profile_setemail_v2(token, email):
     '''
     Update the authorised user's email address
@@ -81,34 +64,13 @@ def user_profile_setemail_v2(token, email):
 
     u_id = src.other.check_session_id(token)
 
-    regex = '^[a-zA-Z0-9]+[\\._]?[a-zA-Z0-9]+[@]\\w+[.]\\w{2,3}$'
-    if not re.search(regex, email):
+    if not EMAIL_PATTERN.search(email):
         raise InputError(description="Invalid Email")
 
-    for profile in users:
-        if profile["email"].lower() == email.lower() and \
-        not (profile["name_first"] == "Removed" and profile["name_last"] == "user"):
-            raise InputError(description="Email address is already in use")
-
-    for profile in users:
-        if profile["u_id"] == u_id:
-            profile["email"] = email
-
-    for channel in channels:
-        for user in channel["owner_members"]:
-            if user["u_id"] == u_id:
-                user["email"] = email
-        for user in channel["all_members"]:
-            if user["u_id"] == u_id:
-                user["email"] = email
+    if get_user_by_email(email) is not None:
+        raise InputError(description="Email address is already in use")
 
-    for dm in dms:
-        for user in dm["owner_members"]:
-            if user["u_id"] == u_id:
-                user["email"] = email
-        for user in dm["all_members"]:
-            if user["u_id"] == u_id:
-                user["email"] = email
+    set_user_email(get_user(u_id), email)
 
     src.other.update_data_write()
 
@@ -116,6 +78,7 @@ def user_profile_setemail_v2(token, email):
     }
 
 
+@locks_registry
 def user_profile_sethandle_v1(token, handle_str):
     '''
     Update the authorised user's handle (i.e. display name)
@@ -140,29 +103,10 @@ def user_profile_sethandle_v1(token, handle_str):
     if len(handle_str) < 3 or len(handle_str) > 20:
         raise InputError(description="Handle must be between 3 and 20 characters inclusive in length")
 
-    for profile in users:
-        if profile["handle_str"] == handle_str:
-            raise InputError(description="Handle is already in use")
+    if get_user_by_handle(handle_str) is not None:
+        raise InputError(description="Handle is already in use")
 
-    for profile in users:
-        if profile["u_id"] == u_id:
-            profile["handle_str"] = handle_str
-
-    for channel in channels:
-        for user in channel["owner_members"]:
-            if user["u_id"] == u_id:
-                user["handle_str"] = handle_str
-        for user in channel["all_members"]:
-            if user["u_id"] == u_id:
-                user["handle_str"] = handle_str
-
-    for dm in dms:
-        for user in dm["owner_members"]:
-            if user["u_id"] == u_id:
-                user["handle_str"] = handle_str
-        for user in dm["all_members"]:
-            if user["u_id"] == u_id:
-                user["handle_str"] = handle_str
+    set_user_handle(get_user(u_id), handle_str)
 
     src.other.update_data_write()
 
@@ -190,12 +134,9 @@ def user_profile_v2(token, u_id):
 
     src.other.check_session_id(token)
 
-    user_profile = False
-    for profile in users:
-        if profile["u_id"] == u_id:
-            user_profile = profile
+    user_profile = get_user(u_id)
     
-    if user_profile == False:
+    if user_profile is None:
         raise InputError(description="User with u_id is not a valid user")
 
     user = {
@@ -211,6 +152,7 @@ def user_profile_v2(token, u_id):
     }
 
 
+@locks_registry
 def admin_userpermission_change_v1(token, u_id, permission_id):
     """
     Given a User by their user ID, set their permissions to new permissions described by permission_id
@@ -238,25 +180,16 @@ def admin_userpermission_change_v1(token, u_id, permission_id):
     if permission_id != 1  and permission_id != 2:
         raise InputError(description="permission_id does not refer to a valid permission")
 
-    is_owner = False
-    valid_user = False
-    for user in users:
-        if user["u_id"] == auth_user_id:
-            if user["permission_id"] == 1:
-                is_owner = True
-        if user["u_id"] == u_id: 
-            if not (user['name_first'] == "Removed" and user['name_last'] == "user"):
-                valid_user = True
+    is_owner = get_user(auth_user_id)["permission_id"] == 1
+    user = get_user(u_id)
 
     if is_owner == False:
         raise AccessError(description="The authorised user is not an owner")
     
-    if valid_user == False:
+    if user is None or is_removed(user):
         raise InputError(description="User with u_id is not a valid user")
 
-    for user in users:
-        if user["u_id"] == u_id:
-            user["permission_id"] = permission_id
+    user["permission_id"] = permission_id
 
 
     src.other.update_data_write()
@@ -307,6 +240,76 @@ def users_all_v1(token):
     }
 
 
+def user_stats_v1(token):
+    """
+    Provides the authorised user's activity in Dreams. Every figure is kept up to date
+    as messages are sent and reacted to and channels and dms are joined, so no message
+    is looked at here.
+
+    Arguments:
+        token :: [str] - session token for user calling the function
+
+    Exceptions:
+        AccessError - Occurs when:
+            - token in invalid
+
+    Return Value:
+        {user_stats} - where user_stats is a dictionary containing channels_joined,
+        dms_joined, messages_sent, reacts_given, reacts_received and involvement_rate
+    """
+
+    u_id = src.other.check_session_id(token)
+
+    activity = get_user(u_id)["activity"]
+    channels_joined = len(channels_by_member.get(u_id, ()))
+    dms_joined = len(dms_by_member.get(u_id, ()))
+
+    # Messages the user sent which have since been removed still count as sent
+    involvement = channels_joined + dms_joined + activity["messages_sent"]
+    total = len(channels) + len(dms) + len(messages_by_id)
+    involvement_rate = min(involvement / total, 1) if total > 0 else 0
+
+    return {
+        "user_stats": {
+            "channels_joined": channels_joined,
+            "dms_joined": dms_joined,
+            "messages_sent": activity["messages_sent"],
+            "reacts_given": activity["reacts_given"],
+            "reacts_received": activity["reacts_received"],
+            "involvement_rate": involvement_rate,
+        }
+    }
+
+
+def users_stats_v1(token):
+    """
+    Provides the number of channels, dms and messages in Dreams, without looking at
+    any of them
+
+    Arguments:
+        token :: [str] - session token for user calling the function
+
+    Exceptions:
+        AccessError - Occurs when:
+            - token in invalid
+
+    Return Value:
+        {dreams_stats} - where dreams_stats is a dictionary containing channels_exist,
+        dms_exist and messages_exist
+    """
+
+    src.other.check_session_id(token)
+
+    return {
+        "dreams_stats": {
+            "channels_exist": len(channels),
+            "dms_exist": len(dms),
+            "messages_exist": len(messages_by_id),
+        }
+    }
+
+
+@locks_registry
 def admin_user_remove_v1(token, u_id):
     """
     Removes the user with the user id u_id from Dreams
@@ -329,92 +332,44 @@ def admin_user_remove_v1(token, u_id):
 
     auth_user_id = src.other.check_session_id(token)
 
-    is_owner = False
-    valid_user = False
-    num_owners = 0
+    is_owner = get_user(auth_user_id)["permission_id"] == 1
+    user = get_user(u_id)
 
-    for idx, user in enumerate(users):
-        if user["u_id"] == auth_user_id:
-            if user["permission_id"] == 1:
-                is_owner = True
-        
-        if user["u_id"] == u_id and not (user["name_first"] == "Removed" and \
-        user["name_last"] == "user"):
-            valid_user = True
-            remove_idx = idx
-
-        if user["permission_id"] == 1 and not (user["name_first"] == "Removed" and \
-        user["name_last"] == "user"):
+    num_owners = 0
+    for profile in users:
+        if profile["permission_id"] == 1 and not is_removed(profile):
             num_owners += 1
 
     if is_owner == False:
         raise AccessError(description="The authorised user is not an owner")
     
-    if valid_user == False:
+    if user is None or is_removed(user):
         raise InputError(description="User with u_id is not a valid user")    
 
     if num_owners == 1 and auth_user_id == u_id:
         raise InputError(description="The user is currently the only owner")
 
-    users[remove_idx]['name_first'] = "Removed"
-    users[remove_idx]['name_last'] = "user"
-
-    new_sessions_list = []
-    for user in sessions:
-        if not user["u_id"] == u_id:
-            new_sessions_list.append(user)
+    remove_user(user)
 
-    # rebuild the list of sessions which does not contain the removed user's sessions  
-    sessions.clear()
-    sessions.extend(new_sessions_list)
+    # log out every session of the removed user
+    src.other.end_user_sessions(u_id)
 
+    # their messages remain, but the text is replaced
     for channel in channels:
-        new_channel_members = []
-        new_channel_owners = []
+        with container_lock(True, channel["id"]):
+            for message in iter_messages(channel):
+                if message['u_id'] == u_id:
+                    set_message_text(message, 'Removed user')
 
-        for message in channel['messages']:
-            if message['u_id'] == u_id:
-                message['message'] = 'Removed user'
-
-        for member in channel['all_members']:
-            if not member['u_id'] == u_id:
-                new_channel_members.append(member)
-
-        # rebuild the list of channel members which does not contain the removed user
-        channel['all_members'].clear()
-        channel['all_members'].extend(new_channel_members)
-
-        for owner in channel['owner_members']:
-            if not owner['u_id'] == u_id:
-                new_channel_owners.append(owner)
-
-        # rebuild the list of channel owners which does not contain the removed user
-        channel['owner_members'].clear()
-        channel['owner_members'].extend(new_channel_owners)
+            remove_member(channel, u_id)
 
     for dm in dms:
-        new_dm_members = []
-        new_dm_owners = []
-
-        for message in dm['messages']:
-            if message['u_id'] == u_id:
-                message['message'] = 'Removed user'
-
-        for member in dm['all_members']:
-            if not member['u_id'] == u_id:
-                new_dm_members.append(member)
-
-        # rebuild the list of dm members which does not contain the removed user
-        dm['all_members'].clear()
-        dm['all_members'].extend(new_dm_members)
-
-        for owner in dm['owner_members']:
-            if not owner['u_id'] == u_id:
-                new_dm_owners.append(owner)
+        with container_lock(False, dm["id"]):
+            for message in iter_messages(dm):
+                if message['u_id'] == u_id:
+                    set_message_text(message, 'Removed user')
 
-        # rebuild the list of dm owners which does not contain the removed user
-        dm['owner_members'].clear()
-        dm['owner_members'].extend(new_dm_owners)
+            remove_member(dm, u_id)
 
     src.other.update_data_write()
 
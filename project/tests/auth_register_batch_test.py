@@ -0,0 +1,125 @@
+import pytest
+import json
+
+from src.auth import auth_register_v2, auth_register_batch_v1, auth_login_v2
+from src.error import InputError, AccessError
+from src.other import clear_v1
+from src.user import user_profile_v2
+from src.import_users import import_users
+
+
+@pytest.fixture
+def owner():
+    clear_v1()
+    return auth_register_v2('validemail@gmail.com', '123abc!@#', 'Hayden', 'Smith')
+
+def row(idx, **fields):
+    user = {"email": f"student{idx}@gmail.com", "password": "123abc!@#",
+            "name_first": "Hayden", "name_last": "Smith"}
+    user.update(fields)
+    return user
+
+def test_batch_register(owner):
+    result = auth_register_batch_v1(owner["token"], [
+        row(0),
+        row(1, email="notanemail"),
+        row(2),
+        {"email": "student3@gmail.com"},
+        row(4, email="student0@gmail.com"),
+        row(5, password="short"),
+        None,
+    ])
+
+    assert [user["row"] for user in result["users"]] == [0, 2]
+    assert result["errors"] == [
+        {"row": 1, "error": "Invalid Email"},
+        {"row": 3, "error": "Missing password"},
+        {"row": 4, "error": "Email address already in use"},
+        {"row": 5, "error": "Password must be more than 6 characters long"},
+        {"row": 6, "error": "Row is not a valid user"},
+    ]
+
+    # Handles carry on from the users already registered
+    u_id = result["users"][1]["auth_user_id"]
+    assert user_profile_v2(owner["token"], u_id)["user"]["handle_str"] == "haydensmith1"
+
+    # Registered users can log in, but no session was started for them
+    assert auth_login_v2("student2@gmail.com", "123abc!@#")["auth_user_id"] == u_id
+
+def test_batch_wrong_types(owner):
+    result = auth_register_batch_v1(owner["token"], [
+        row(0),
+        row(1, name_first=["Hayden"]),
+        row(2, name_last={"name": "Smith"}),
+        row(3, email=3),
+        row(4, password=None),
+        row(5),
+    ])
+
+    assert [user["row"] for user in result["users"]] == [0, 5]
+    assert result["errors"] == [
+        {"row": 1, "error": "name_first must be a string"},
+        {"row": 2, "error": "name_last must be a string"},
+        {"row": 3, "error": "email must be a string"},
+        {"row": 4, "error": "password must be a string"},
+    ]
+
+    # The rest of the batch was still persisted
+    with open("./src/data.json", "r") as FILE:
+        data = json.load(FILE)
+    assert [user["email"] for user in data["users"]][1:] == ["student0@gmail.com", "student5@gmail.com"]
+
+def test_batch_persisted(owner):
+    auth_register_batch_v1(owner["token"], [row(idx) for idx in range(3)])
+
+    with open("./src/data.json", "r") as FILE:
+        data = json.load(FILE)
+    assert [user["email"] for user in data["users"]][1:] == \
+        [f"student{idx}@gmail.com" for idx in range(3)]
+
+def test_batch_not_owner(owner):
+    user = auth_register_v2('anothervalidemail@gmail.com', '123abc!@#', 'M', 'J')
+
+    with pytest.raises(AccessError):
+        auth_register_batch_v1(user["token"], [row(0)])
+
+    with pytest.raises(AccessError):
+        auth_register_batch_v1("invalid token", [row(0)])
+
+def test_batch_not_list(owner):
+    with pytest.raises(InputError):
+        auth_register_batch_v1(owner["token"], row(0))
+
+def test_import_csv(owner, tmp_path):
+    path = tmp_path / "users.csv"
+    path.write_text(
+        "email,password,name_first,name_last\n"
+        "student0@gmail.com,123abc!@#,John,Smith\n"
+        "invalid,123abc!@#,John,Smith\n"
+        "student2@gmail.com,123abc!@#,John,Smith\n"
+    )
+
+    result = import_users(str(path))
+    assert [user["row"] for user in result["users"]] == [0, 2]
+    assert result["errors"] == [{"row": 1, "error": "Invalid Email"}]
+    assert auth_login_v2("student2@gmail.com", "123abc!@#")
+
+    clear_v1()
+
+def test_import_ndjson(owner, tmp_path):
+    path = tmp_path / "users.ndjson"
+    path.write_text(
+        json.dumps(row(0)) + "\n" +
+        "{not json\n" +
+        "\n" +
+        json.dumps(row(2)) + "\n"
+    )
+
+    result = import_users(str(path))
+    assert [user["row"] for user in result["users"]] == [0, 2]
+    assert result["errors"] == [{"row": 1, "error": "Row is not a valid user"}]
+
+    # The existing users were loaded first, so the owner is still there
+    assert auth_login_v2("validemail@gmail.com", "123abc!@#")
+
+    clear_v1()
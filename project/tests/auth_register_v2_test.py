@@ -4,6 +4,7 @@ from src.auth import auth_login_v2, auth_register_v2
 from src.error import InputError, AccessError
 from src.other import clear_v1
 from src.channels import channels_create_v2
+from src.user import user_profile_v2, user_profile_sethandle_v1
 
 
 @pytest.fixture
@@ -121,3 +122,27 @@ def test_same_names(valid_emails):
     auth_login_v2(valid_emails[2], 'Password824378234')
 
     clear_v1()
+
+def handle_of(user):
+    return user_profile_v2(user["token"], user["auth_user_id"])["user"]["handle_str"]
+
+def test_repeated_handles():
+    clear_v1()
+    users = [auth_register_v2(f"john{idx}@gmail.com", "Password824378234", "John", "Smith")
+             for idx in range(12)]
+    assert [handle_of(user) for user in users] == \
+        ["johnsmith"] + [f"johnsmith{idx}" for idx in range(11)]
+
+    # The number replaces the end of a long handle
+    users = [auth_register_v2(f"long{idx}@gmail.com", "Password824378234", "Abcdefghij", "klmnopqrs")
+             for idx in range(12)]
+    assert handle_of(users[0]) == "abcdefghijklmnopqrs"
+    assert handle_of(users[1]) == "abcdefghijklmnopqrs0"
+    assert handle_of(users[11]) == "abcdefghijklmnopqr10"
+
+    # A handle freed by sethandle is given out again
+    user_profile_sethandle_v1(users[3]["token"], "somethingelse")
+    user = auth_register_v2("long12@gmail.com", "Password824378234", "Abcdefghij", "klmnopqrs")
+    assert handle_of(user) == "abcdefghijklmnopqrs2"
+
+    clear_v1()
@@ -117,6 +117,34 @@ def test_110_messages(users, channels):
     assert message_list["start"] == 50
     assert message_list["end"] == 100
 
+def test_before_cursor(users, channels):
+    message_ids = []
+    for x in range(110):
+        message_ids.append(message_send_v2(users[0]["token"], channels[0], f"test{x}")["message_id"])
+    message_ids.reverse()
+
+    # Walk back through the channel one page at a time using the oldest message as the cursor
+    pages = []
+    message_list = channel_messages_v2(users[0]["token"], channels[0], 0)
+    pages.append(message_list)
+    while message_list["end"] != -1:
+        before = message_list["messages"][-1]["message_id"]
+        # Newer messages sent while scrolling back do not shift the pages
+        message_send_v2(users[0]["token"], channels[0], "new message")
+        message_list = channel_messages_v2(users[0]["token"], channels[0], 0, before)
+        pages.append(message_list)
+
+    assert len(pages) == 3
+    seen = [message["message_id"] for page in pages for message in page["messages"]]
+    assert seen == message_ids
+
+    with pytest.raises(InputError):
+        channel_messages_v2(users[0]["token"], channels[0], 0, 42)
+
+    other_message = message_send_v2(users[1]["token"], channels[1], "hi")["message_id"]
+    with pytest.raises(InputError):
+        channel_messages_v2(users[0]["token"], channels[0], 0, other_message)
+
 def test_invalid_channel(users):
     with pytest.raises(InputError):
         channel_messages_v2(users[0]["token"], 'channel 1', 0)
@@ -127,6 +155,15 @@ def test_invalid_channel(users):
     with pytest.raises(InputError):
         channel_messages_v2(users[0]["token"], {'channel_id': 42}, 0)
 
+def test_negative_start(users, channels):
+    message_send_v2(users[0]["token"], channels[0], "hello")
+
+    with pytest.raises(InputError):
+        channel_messages_v2(users[0]["token"], channels[0], -1)
+
+    with pytest.raises(InputError):
+        channel_messages_v2(users[0]["token"], channels[0], -5)
+
 def test_user_not_member(users, channels):
     with pytest.raises(AccessError):
         channel_messages_v2(users[1]["token"], channels[0], 0)
@@ -0,0 +1,80 @@
+import pytest
+import jwt
+
+from src import config
+from src import other
+from src.auth import auth_register_v2, auth_login_v2, auth_logout_v1
+from src.user import admin_user_remove_v1
+from src.error import AccessError
+from src.other import clear_v1, check_session_id
+
+
+@pytest.fixture
+def users():
+    clear_v1()
+    user = auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+    user_2 = auth_register_v2('anothervalidemail@gmail.com', '123abc!@#', 'Hayden', 'Smith')
+    return [user, user_2]
+
+@pytest.fixture
+def decode_count(monkeypatch):
+    count = {"calls": 0}
+    real_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        count["calls"] += 1
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(jwt, "decode", counting_decode)
+    return count
+
+def test_token_decoded_once(users, decode_count):
+    # Tokens issued by register and login are cached straight away
+    token = auth_login_v2('validemail@gmail.com', '123abc!@#')["token"]
+    for _ in range(5):
+        assert check_session_id(users[0]["token"]) == users[0]["auth_user_id"]
+        assert check_session_id(token) == users[0]["auth_user_id"]
+    assert decode_count["calls"] == 0
+
+    # Once evicted, a token is verified again then cached
+    other.token_cache.clear()
+    for _ in range(5):
+        assert check_session_id(token) == users[0]["auth_user_id"]
+    assert decode_count["calls"] == 1
+
+def test_logout_invalidates(users):
+    token = auth_login_v2('validemail@gmail.com', '123abc!@#')["token"]
+    check_session_id(token)
+
+    auth_logout_v1(token)
+    with pytest.raises(AccessError):
+        check_session_id(token)
+    with pytest.raises(AccessError):
+        auth_logout_v1(token)
+
+    # Other sessions of the same user are still logged in
+    assert check_session_id(users[0]["token"]) == users[0]["auth_user_id"]
+
+def test_remove_invalidates(users):
+    token = auth_login_v2('anothervalidemail@gmail.com', '123abc!@#')["token"]
+    check_session_id(token)
+    check_session_id(users[1]["token"])
+
+    admin_user_remove_v1(users[0]["token"], users[1]["auth_user_id"])
+
+    with pytest.raises(AccessError):
+        check_session_id(token)
+    with pytest.raises(AccessError):
+        check_session_id(users[1]["token"])
+    assert token not in other.token_cache
+
+def test_cache_is_bounded(users, monkeypatch):
+    monkeypatch.setattr(config, "token_cache_size", 3)
+
+    tokens = [auth_login_v2('validemail@gmail.com', '123abc!@#')["token"] for _ in range(5)]
+
+    assert len(other.token_cache) == 3
+    assert list(other.token_cache) == tokens[2:]
+
+    # Evicted tokens still work, they are just decoded again
+    assert check_session_id(tokens[0]) == users[0]["auth_user_id"]
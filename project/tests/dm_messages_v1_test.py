@@ -116,6 +116,26 @@ def test_110_messages(users, dms):
     assert message_list["end"] == 100
 
 
+def test_before_cursor(users, dms):
+    message_ids = []
+    for x in range(60):
+        message_ids.append(message_senddm_v1(users[0]["token"], dms[0], f"test{x}")["message_id"])
+
+    message_list = dm_messages_v1(users[0]["token"], dms[0], 0, message_ids[10])
+    assert [message["message_id"] for message in message_list["messages"]] == \
+        list(reversed(message_ids[:10]))
+    assert message_list["start"] == 50
+    assert message_list["end"] == -1
+
+    # The oldest message has nothing before it
+    message_list = dm_messages_v1(users[0]["token"], dms[0], 0, message_ids[0])
+    assert message_list["messages"] == []
+    assert message_list["end"] == -1
+
+    with pytest.raises(InputError):
+        dm_messages_v1(users[0]["token"], dms[0], 0, 42)
+
+
 def test_invalid_dm(users):
     with pytest.raises(InputError):
         dm_messages_v1(users[0]["token"], 'dm 1', 0)
@@ -138,6 +158,16 @@ def test_invalid_start(users, dms):
         dm_messages_v1(users[0]["token"], dms[0], 1)
 
 
+def test_negative_start(users, dms):
+    message_senddm_v1(users[0]["token"], dms[0], "hello")
+
+    with pytest.raises(InputError):
+        dm_messages_v1(users[0]["token"], dms[0], -1)
+
+    with pytest.raises(InputError):
+        dm_messages_v1(users[0]["token"], dms[0], -5)
+
+
 def test_user_not_member(users, dms):
     with pytest.raises(AccessError):
         dm_messages_v1(users[1]["token"], dms[0], 0)
@@ -0,0 +1,70 @@
+import pytest
+import threading
+
+from src import config
+from src.ids import new_message_id, NODE_BITS, SEQUENCE_BITS
+from src.auth import auth_register_v2
+from src.channels import channels_create_v2
+from src.dm import dm_create_v1, dm_remove_v1
+from src.message import message_send_v2
+from src.other import clear_v1, update_data_read, update_data_write
+
+
+@pytest.fixture
+def users():
+    clear_v1()
+    user = auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+    user_2 = auth_register_v2('anothervalidemail@gmail.com', '123abc!@#', 'Hayden', 'Smith')
+    return [user, user_2]
+
+def test_message_ids_increase():
+    message_ids = [new_message_id() for _ in range(5000)]
+    assert message_ids == sorted(message_ids)
+    assert len(set(message_ids)) == len(message_ids)
+    # Exact as a JavaScript number
+    assert max(message_ids) < 2 ** 53
+
+def test_message_ids_unique_across_threads():
+    message_ids = []
+    def generate():
+        ids = [new_message_id() for _ in range(2000)]
+        message_ids.extend(ids)
+
+    threads = [threading.Thread(target=generate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(message_ids)) == 8000
+
+def test_node_in_message_id(monkeypatch):
+    monkeypatch.setattr(config, "id_node", 5)
+    message_id = new_message_id()
+    assert (message_id >> SEQUENCE_BITS) & ((1 << NODE_BITS) - 1) == 5
+
+def test_message_ids_sorted_by_send_time(users):
+    channel_id = channels_create_v2(users[0]["token"], "channel", True)["channel_id"]
+    message_ids = [message_send_v2(users[0]["token"], channel_id, f"{idx}")["message_id"]
+                   for idx in range(10)]
+    assert message_ids == sorted(message_ids)
+
+def test_sequential_ids(users):
+    assert [user["auth_user_id"] for user in users] == [1, 2]
+    assert channels_create_v2(users[0]["token"], "channel 1", True)["channel_id"] == 1
+    assert channels_create_v2(users[0]["token"], "channel 2", True)["channel_id"] == 2
+
+def test_dm_id_not_reused(users):
+    dm_create_v1(users[0]["token"], [])
+    dm_id = dm_create_v1(users[0]["token"], [users[1]["auth_user_id"]])["dm_id"]
+    dm_remove_v1(users[0]["token"], dm_id)
+
+    assert dm_create_v1(users[0]["token"], [])["dm_id"] == dm_id + 1
+
+    # The counter is saved, so removed ids are not reused after a restart either
+    dm_remove_v1(users[0]["token"], dm_id + 1)
+    update_data_write()
+    update_data_read()
+    assert dm_create_v1(users[0]["token"], [])["dm_id"] == dm_id + 2
+
+    clear_v1()
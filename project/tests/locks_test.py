@@ -0,0 +1,173 @@
+import pytest
+import json
+import threading
+import traceback
+
+from src import config
+from src.auth import auth_register_v2
+from src.channels import channels_create_v2, channels_list_v2
+from src.channel import channel_join_v2, channel_messages_v2, channel_messages_range_v1, channel_pins_v1, \
+    channel_details_v2
+from src.message import message_send_v2, message_edit_v2, message_react_v1, message_remove_v1, message_pin_v1
+from src.data import users, channels
+from src.locks import store_mutation, registry_lock, snapshot_state
+from src.other import clear_v1, update_data_read, update_data_write, write_snapshot, search_v2, \
+    notifications_get_v1
+from src.store import find_message, get_channel, membership_lock
+
+
+@pytest.fixture
+def users_list():
+    clear_v1()
+    user = auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+    user_2 = auth_register_v2('anothervalidemail@gmail.com', '123abc!@#', 'Hayden', 'Smith')
+    return [user, user_2]
+
+@pytest.fixture
+def channel_ids(users_list):
+    channel_1 = channels_create_v2(users_list[0]["token"], "channel 1", True)["channel_id"]
+    channel_2 = channels_create_v2(users_list[1]["token"], "channel 2", True)["channel_id"]
+    channel_join_v2(users_list[1]["token"], channel_1)
+    return [channel_1, channel_2]
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target, args=(idx,)) for idx in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def test_concurrent_sends(users_list, channel_ids):
+    sent = []
+
+    def send(idx):
+        user = users_list[idx % 2]
+        channel_id = channel_ids[0] if idx % 2 == 0 else channel_ids[idx % 4 // 2]
+        for count in range(25):
+            message_id = message_send_v2(user["token"], channel_id, f"{idx} {count}")["message_id"]
+            message_react_v1(user["token"], message_id, 1)
+            sent.append((channel_id, message_id))
+
+    run_threads(send, 8)
+
+    assert len(sent) == 200
+    for channel_id, message_id in sent:
+        container, _, message = find_message(message_id)
+        assert container is get_channel(channel_id)
+        assert len(message["reacts"]) == 1
+
+    # The journal holds every change, in an order which replays to the same store
+    update_data_read()
+    total = sum(len(channel["messages"]) for channel in channels)
+    assert total == 200
+
+def test_concurrent_registers(users_list):
+    def register(idx):
+        auth_register_v2(f'user{idx}@gmail.com', '123abc!@#', 'Same', 'Name')
+
+    run_threads(register, 20)
+
+    assert len({user["u_id"] for user in users}) == 22
+    assert len({user["handle_str"] for user in users}) == 22
+
+def test_snapshots_are_consistent(users_list, channel_ids, monkeypatch):
+    monkeypatch.setattr(config, "persistence_mode", "snapshot")
+    message_ids = [
+        message_send_v2(users_list[0]["token"], channel_ids[0], "original")["message_id"]
+        for _ in range(10)
+    ]
+
+    def edit(idx):
+        for count in range(10):
+            message_edit_v2(users_list[0]["token"], message_ids[idx], f"edit {count}")
+
+    run_threads(edit, 10)
+
+    with open("./src/data.json", "r") as FILE:
+        data = json.load(FILE)
+    assert [message["message"] for message in data["channels"][0]["messages"]] == ["edit 9"] * 10
+
+def test_snapshot_deferred_inside_mutation(users_list, monkeypatch):
+    monkeypatch.setattr(config, "persistence_mode", "snapshot")
+    write_snapshot()
+
+    with store_mutation(registry_lock):
+        users[0]["name_first"] = "Changed"
+        # Would wait forever for this thread's own change to finish if not deferred
+        write_snapshot()
+        with open("./src/data.json", "r") as FILE:
+            assert json.load(FILE)["users"][0]["name_first"] == "M"
+
+    with open("./src/data.json", "r") as FILE:
+        assert json.load(FILE)["users"][0]["name_first"] == "Changed"
+    assert snapshot_state == {"mutating": 0, "snapshotting": False, "waiting": 0}
+
+    clear_v1()
+
+def test_reads_during_writes(users_list, channel_ids, monkeypatch):
+    # Small enough that messages are sealed and compacted while being read
+    monkeypatch.setattr(config, "hot_message_count", 20)
+    monkeypatch.setattr(config, "segment_size", 10)
+    monkeypatch.setattr(config, "tombstone_compact_threshold", 5)
+    writing = threading.Event()
+    writing.set()
+    errors = []
+
+    def write(idx):
+        token = users_list[0]["token"]
+        for count in range(150):
+            message_id = message_send_v2(token, channel_ids[0], f"hello @haydensmith {idx} {count}")["message_id"]
+            message_react_v1(token, message_id, 1)
+            if count % 3 == 0:
+                message_pin_v1(token, message_id)
+            if count % 2 == 0:
+                message_remove_v1(token, message_id)
+            if count % 25 == 0:
+                update_data_write()
+
+    def read(idx):
+        token = users_list[idx % 2]["token"]
+        while writing.is_set():
+            notifications_get_v1(users_list[1]["token"])
+            search_v2(token, "hello")
+            channel_messages_v2(token, channel_ids[0], 0)
+            channel_messages_range_v1(token, channel_ids[0], 0, 2 ** 40)
+            channel_pins_v1(token, channel_ids[0])
+            channel_details_v2(token, channel_ids[0])
+
+    def run(target, idx):
+        try:
+            target(idx)
+        except Exception:
+            errors.append(traceback.format_exc())
+            writing.clear()
+
+    readers = [threading.Thread(target=run, args=(read, idx)) for idx in range(4)]
+    for reader in readers:
+        reader.start()
+    run_threads(lambda idx: run(write, idx), 4)
+    writing.clear()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    assert len(search_v2(users_list[0]["token"], "hello")["messages"]) == 300
+    assert snapshot_state == {"mutating": 0, "snapshotting": False, "waiting": 0}
+
+    clear_v1()
+
+def test_membership_index_locked(users_list):
+    channel_id = channels_create_v2(users_list[0]["token"], "channel", True)["channel_id"]
+
+    # Lists of a user's channels are copied holding membership_lock, so a join into
+    # any channel waits for it rather than changing the set being copied
+    with membership_lock:
+        joiner = threading.Thread(target=channel_join_v2, args=(users_list[1]["token"], channel_id))
+        joiner.start()
+        joiner.join(0.2)
+        assert joiner.is_alive()
+    joiner.join()
+
+    assert channels_list_v2(users_list[1]["token"]) == {"channels": [{"channel_id": channel_id, "name": "channel"}]}
+
+    clear_v1()
@@ -1,4 +1,5 @@
 import pytest
+import json
 
 from src.auth import auth_login_v2, auth_register_v2, auth_logout_v1
 from src.channels import channels_create_v2
@@ -6,7 +7,9 @@ from src.message import message_send_v2, message_senddm_v1, message_react_v1, me
 from src.channel import channel_invite_v2, channel_join_v2, channel_messages_v2
 from src.dm import dm_invite_v1, dm_create_v1, dm_messages_v1
 from src.error import AccessError, InputError
-from src.other import clear_v1, notifications_get_v1
+from src.other import clear_v1, notifications_get_v1, update_data_read, update_data_write
+from src.store import find_message
+from src import config
 
 @pytest.fixture
 def users():
@@ -144,4 +147,55 @@ def test_op_user_reacting_and_unreacting_in_dm(users, channels):
     assert message_list[0]["reacts"][0]["react_id"] == 1
     assert message_list[0]["reacts"][0]["is_this_user_reacted"] == False
 
-    clear_v1()
\ No newline at end of file
+    clear_v1()
+
+
+def test_multiple_react_ids(users, channels, monkeypatch):
+    monkeypatch.setattr(config, "react_ids", [1, 2])
+    message_id = message_send_v2(users[0]["token"], channels[0], "hello")["message_id"]
+    channel_join_v2(users[1]["token"], channels[0])
+
+    message_react_v1(users[0]["token"], message_id, 1)
+    message_react_v1(users[0]["token"], message_id, 2)
+    message_react_v1(users[1]["token"], message_id, 2)
+    with pytest.raises(InputError):
+        message_react_v1(users[1]["token"], message_id, 2)
+    with pytest.raises(InputError):
+        message_react_v1(users[1]["token"], message_id, 3)
+
+    reacts = channel_messages_v2(users[1]["token"], channels[0], 0)["messages"][0]["reacts"]
+    assert reacts == [
+        {"react_id": 1, "u_ids": [users[0]["auth_user_id"]], "is_this_user_reacted": False},
+        {"react_id": 2, "u_ids": [users[0]["auth_user_id"], users[1]["auth_user_id"]],
+         "is_this_user_reacted": True},
+    ]
+
+    message_unreact_v1(users[0]["token"], message_id, 1)
+    assert find_message(message_id)[2]["reacts"] == {2: {users[0]["auth_user_id"], users[1]["auth_user_id"]}}
+
+    # React changes are replayed from the journal
+    update_data_read()
+    reacts = channel_messages_v2(users[0]["token"], channels[0], 0)["messages"][0]["reacts"]
+    assert reacts[0] == {"react_id": 1, "u_ids": [], "is_this_user_reacted": False}
+    assert reacts[1]["u_ids"] == [users[0]["auth_user_id"], users[1]["auth_user_id"]]
+
+    clear_v1()
+
+def test_reacts_saved_as_u_id_list(users, channels):
+    message_id = message_send_v2(users[0]["token"], channels[0], "hello")["message_id"]
+    update_data_write()
+
+    # data.json written before messages could have more than one react_id
+    with open("./src/data.json", "r") as FILE:
+        data = json.load(FILE)
+    data["channels"][0]["messages"][0]["reacts"] = [users[0]["auth_user_id"]]
+    with open("./src/data.json", "w") as FILE:
+        json.dump(data, FILE)
+
+    update_data_read()
+    assert find_message(message_id)[2]["reacts"] == {1: {users[0]["auth_user_id"]}}
+    message_unreact_v1(users[0]["token"], message_id, 1)
+    message_list = channel_messages_v2(users[0]["token"], channels[0], 0)["messages"]
+    assert message_list[0]["reacts"][0]["u_ids"] == []
+
+    clear_v1()
@@ -1,12 +1,16 @@
 import pytest
 
+import src.store
 from src.auth import auth_login_v2, auth_register_v2, auth_logout_v1
 from src.channels import channels_create_v2
-from src.message import message_send_v2, message_senddm_v1, message_share_v1
+from src.message import message_send_v2, message_senddm_v1, message_share_v1, message_edit_v2, \
+    message_remove_v1
 from src.channel import channel_messages_v2, channel_join_v2
 from src.error import AccessError, InputError
-from src.other import clear_v1
+from src.other import clear_v1, search_v2, update_data_read, update_data_write
+from src.store import find_message
 from src.dm import dm_messages_v1, dm_create_v1, dm_invite_v1
+from src.user import admin_user_remove_v1
 
 
 
@@ -160,5 +164,122 @@ def test_invalid_token(users, channels):
         message_share_v1(42, message_id, "", channels[1], -1)
 
 
+def shared_text(comment, text):
+    return f"{comment}:\n  \"\"\n  {text}\n  \"\""
 
-    clear_v1()
\ No newline at end of file
+def latest(users, channel_id):
+    return channel_messages_v2(users[0]["token"], channel_id, 0)["messages"][0]["message"]
+
+def test_share_stores_reference(users, channels):
+    message_id = message_send_v2(users[0]["token"], channels[0], "x" * 1000)["message_id"]
+
+    # Only the comment is stored, so a long message can be shared with a comment
+    shared_message_id = message_share_v1(users[0]["token"], message_id, "look", channels[1], -1)["shared_message_id"]
+
+    shared = find_message(shared_message_id)[2]
+    assert shared["message"] == "look"
+    assert shared["shared_message_id"] == message_id
+    assert latest(users, channels[1]) == shared_text("look", "x" * 1000)
+
+    with pytest.raises(InputError):
+        message_share_v1(users[0]["token"], message_id, "x" * 1001, channels[1], -1)
+
+def test_share_follows_edits_and_removal(users, channels):
+    message_id = message_send_v2(users[0]["token"], channels[0], "Hello")["message_id"]
+    message_share_v1(users[0]["token"], message_id, "look", channels[1], -1)
+
+    message_edit_v2(users[0]["token"], message_id, "Goodbye")
+    assert latest(users, channels[1]) == shared_text("look", "Goodbye")
+
+    message_remove_v1(users[0]["token"], message_id)
+    assert latest(users, channels[1]) == shared_text("look", "[message removed]")
+
+def test_edit_replaces_share(users, channels):
+    message_id = message_send_v2(users[0]["token"], channels[0], "Hello world")["message_id"]
+    shared_message_id = message_share_v1(users[0]["token"], message_id, "look", channels[1], -1)["shared_message_id"]
+
+    # The whole text shown is replaced, and the share no longer follows the message
+    message_edit_v2(users[0]["token"], shared_message_id, "edited")
+    message_edit_v2(users[0]["token"], message_id, "Goodbye world")
+    assert latest(users, channels[1]) == "edited"
+    assert [message["message_id"] for message in search_v2(users[0]["token"], "world")["messages"]] == \
+        [message_id]
+
+    update_data_read()
+    assert latest(users, channels[1]) == "edited"
+    assert [message["message_id"] for message in search_v2(users[0]["token"], "world")["messages"]] == \
+        [message_id]
+
+def test_removed_user_share(users, channels):
+    channel_join_v2(users[1]["token"], channels[0])
+    channel_join_v2(users[1]["token"], channels[1])
+    message_id = message_send_v2(users[0]["token"], channels[0], "Hello world")["message_id"]
+    message_share_v1(users[1]["token"], message_id, "look", channels[1], -1)
+
+    # Nothing of a removed user's share is shown, including the message it shared
+    admin_user_remove_v1(users[0]["token"], users[1]["auth_user_id"])
+    assert latest(users, channels[1]) == "Removed user"
+    assert len(search_v2(users[0]["token"], "world")["messages"]) == 1
+
+    update_data_read()
+    assert latest(users, channels[1]) == "Removed user"
+
+def test_share_of_share(users, channels):
+    message_id = message_send_v2(users[0]["token"], channels[0], "Hello")["message_id"]
+    first_id = message_share_v1(users[0]["token"], message_id, "one", channels[1], -1)["shared_message_id"]
+    message_share_v1(users[0]["token"], first_id, "two", -1, channels[2])
+
+    assert dm_messages_v1(users[0]["token"], channels[2], 0)["messages"][0]["message"] == \
+        shared_text("two", shared_text("one", "Hello"))
+
+def test_search_shares(users, channels):
+    message_id = message_send_v2(users[0]["token"], channels[0], "Hello world")["message_id"]
+    shared_message_id = message_share_v1(users[0]["token"], message_id, "look", channels[1], -1)["shared_message_id"]
+
+    found = [message["message_id"] for message in search_v2(users[0]["token"], "world")["messages"]]
+    assert sorted(found) == sorted([message_id, shared_message_id])
+    assert [message["message_id"] for message in search_v2(users[0]["token"], "look")["messages"]] == \
+        [shared_message_id]
+
+    message_remove_v1(users[0]["token"], message_id)
+    assert search_v2(users[0]["token"], "world")["messages"] == []
+    assert [message["message_id"] for message in search_v2(users[0]["token"], "removed")["messages"]] == \
+        [shared_message_id]
+
+def test_search_follows_shares_of_matches(users, channels, monkeypatch):
+    message_id = message_send_v2(users[0]["token"], channels[0], "Hello world")["message_id"]
+    first_id = message_share_v1(users[0]["token"], message_id, "one", channels[1], -1)["shared_message_id"]
+    second_id = message_share_v1(users[0]["token"], first_id, "two", -1, channels[2])["shared_message_id"]
+    other_id = message_send_v2(users[0]["token"], channels[0], "unrelated")["message_id"]
+    message_share_v1(users[0]["token"], other_id, "other", channels[1], -1)
+
+    checked = []
+    message_text = src.store.message_text
+    monkeypatch.setattr(src.store, "message_text", lambda message: checked.append(message["message_id"]) or
+                        message_text(message))
+
+    found = [message["message_id"] for message in search_v2(users[0]["token"], "world")["messages"]]
+    assert found == [message_id, first_id, second_id]
+    # Shares of messages without the word are not looked at
+    assert set(checked) == set(found)
+
+    # A query may run from the comment of a share into the message it shares
+    found = [message["message_id"] for message in search_v2(users[0]["token"], 'two:\n  ""\n  one')["messages"]]
+    assert found == [second_id]
+
+def test_share_persisted(users, channels):
+    message_id = message_send_v2(users[0]["token"], channels[0], "Hello world")["message_id"]
+    message_share_v1(users[0]["token"], message_id, "look", channels[1], -1)
+    expected = shared_text("look", "Hello world")
+
+    # Replayed from the journal, then from a snapshot
+    update_data_read()
+    assert latest(users, channels[1]) == expected
+    assert len(search_v2(users[0]["token"], "world")["messages"]) == 2
+
+    update_data_write()
+    update_data_read()
+    assert latest(users, channels[1]) == expected
+    assert len(search_v2(users[0]["token"], "world")["messages"]) == 2
+
+    clear_v1()
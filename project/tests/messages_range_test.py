@@ -0,0 +1,123 @@
+import pytest
+import time
+
+from src.auth import auth_register_v2
+from src.channels import channels_create_v2
+from src.channel import channel_messages_range_v1
+from src.dm import dm_create_v1, dm_messages_range_v1
+from src.message import message_send_v2, message_senddm_v1, message_remove_v1, message_sendlater_thread
+from src.ids import new_message_id
+from src.error import InputError, AccessError
+from src.other import clear_v1, update_data_read
+
+
+@pytest.fixture
+def users():
+    clear_v1()
+    user = auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+    user_2 = auth_register_v2('anothervalidemail@gmail.com', '123abc!@#', 'Hayden', 'Smith')
+    return [user, user_2]
+
+@pytest.fixture
+def channel(users):
+    return channels_create_v2(users[0]["token"], "channel", True)["channel_id"]
+
+def send_late(user, channel_id, message, time_sent, is_channel=True):
+    message_id = new_message_id()
+    message_sendlater_thread(user["auth_user_id"], channel_id, message, time_sent, message_id, is_channel)
+    return message_id
+
+def texts(result):
+    return [message["message"] for message in result["messages"]]
+
+def test_range(users, channel):
+    now = int(time.time())
+    message_send_v2(users[0]["token"], channel, "now 1")
+    message_send_v2(users[0]["token"], channel, "now 2")
+    # Delivered after newer messages, so stored out of time order
+    send_late(users[0], channel, "late 100", now - 100)
+    send_late(users[0], channel, "late 50", now - 50)
+
+    result = channel_messages_range_v1(users[0]["token"], channel, now - 100, now - 50)
+    assert texts(result) == ["late 50", "late 100"]
+    assert result["start"] == 0
+    assert result["end"] == -1
+
+    assert texts(channel_messages_range_v1(users[0]["token"], channel, now - 60, now + 10)) == \
+        ["now 2", "now 1", "late 50"]
+    assert texts(channel_messages_range_v1(users[0]["token"], channel, now - 99, now - 51)) == []
+
+    message = channel_messages_range_v1(users[0]["token"], channel, now - 50, now - 50)["messages"][0]
+    assert set(message.keys()) == {"message_id", "u_id", "message", "time_created", "reacts", "is_pinned"}
+
+def test_range_pages(users, channel):
+    now = int(time.time())
+    for idx in range(60):
+        send_late(users[0], channel, f"{idx}", now - 60 + idx)
+
+    result = channel_messages_range_v1(users[0]["token"], channel, now - 60, now)
+    assert texts(result) == [f"{idx}" for idx in range(59, 9, -1)]
+    assert result["end"] == 50
+
+    result = channel_messages_range_v1(users[0]["token"], channel, now - 60, now, 50)
+    assert texts(result) == [f"{idx}" for idx in range(9, -1, -1)]
+    assert result["end"] == -1
+
+    with pytest.raises(InputError):
+        channel_messages_range_v1(users[0]["token"], channel, now - 60, now, 61)
+
+def test_range_after_remove_and_reload(users, channel):
+    now = int(time.time())
+    message_id = message_send_v2(users[0]["token"], channel, "removed")["message_id"]
+    message_send_v2(users[0]["token"], channel, "kept")
+    send_late(users[0], channel, "late", now - 10)
+    message_remove_v1(users[0]["token"], message_id)
+
+    assert texts(channel_messages_range_v1(users[0]["token"], channel, now - 10, now + 10)) == \
+        ["kept", "late"]
+
+    update_data_read()
+    assert texts(channel_messages_range_v1(users[0]["token"], channel, now - 10, now + 10)) == \
+        ["kept", "late"]
+
+    clear_v1()
+
+def test_dm_range(users):
+    now = int(time.time())
+    dm_id = dm_create_v1(users[0]["token"], [users[1]["auth_user_id"]])["dm_id"]
+    message_senddm_v1(users[1]["token"], dm_id, "now")
+    send_late(users[0], dm_id, "late", now - 30, False)
+
+    assert texts(dm_messages_range_v1(users[1]["token"], dm_id, now - 30, now - 30)) == ["late"]
+    assert texts(dm_messages_range_v1(users[1]["token"], dm_id, now - 30, now + 10)) == ["now", "late"]
+
+def test_range_errors(users, channel):
+    now = int(time.time())
+
+    with pytest.raises(InputError):
+        channel_messages_range_v1(users[0]["token"], 42, now - 10, now)
+
+    with pytest.raises(InputError):
+        channel_messages_range_v1(users[0]["token"], channel, now, now - 10)
+
+    with pytest.raises(AccessError):
+        channel_messages_range_v1(users[1]["token"], channel, now - 10, now)
+
+    with pytest.raises(InputError):
+        dm_messages_range_v1(users[0]["token"], 42, now - 10, now)
+
+    with pytest.raises(AccessError):
+        channel_messages_range_v1("invalid token", channel, now - 10, now)
+
+def test_range_invalid_numbers(users, channel):
+    now = int(time.time())
+    message_send_v2(users[0]["token"], channel, "hello")
+    dm_id = dm_create_v1(users[0]["token"], [users[1]["auth_user_id"]])["dm_id"]
+
+    for time_start, time_end, start in [(None, now, 0), (now - 10, None, 0), (now - 10, now, None),
+                                        ("1", now, 0), (now - 10, 1.5, 0), (now - 10, now, -1),
+                                        (True, now, 0)]:
+        with pytest.raises(InputError):
+            channel_messages_range_v1(users[0]["token"], channel, time_start, time_end, start)
+        with pytest.raises(InputError):
+            dm_messages_range_v1(users[0]["token"], dm_id, time_start, time_end, start)
@@ -6,7 +6,9 @@ from src.message import message_send_v2, message_senddm_v1
 from src.channel import channel_invite_v2, channel_join_v2
 from src.dm import dm_invite_v1, dm_create_v1
 from src.error import AccessError, InputError
-from src.other import clear_v1, notifications_get_v1
+from src import config
+from src.data import notifications
+from src.other import clear_v1, notifications_get_v1, update_data_write, update_data_read
 
 @pytest.fixture
 def users():
@@ -107,6 +109,59 @@ def test_multiple_notifications(users, channels):
             assert notifications_2[i]["notification_message"] == notification_message_1
 
 
+def test_inbox_is_bounded(users, channels, monkeypatch):
+    monkeypatch.setattr(config, "notification_inbox_size", 5)
+    channel_invite_v2(users[0]["token"], channels[0], users[1]["auth_user_id"])
+
+    for idx in range(10):
+        message_send_v2(users[0]["token"], channels[0], f"@haydensmith {idx}")
+
+    # Older notifications are dropped from the user's inbox
+    assert len(notifications[users[1]["auth_user_id"]]) == 5
+    expected = [f"mj tagged you in user 1's channel: @haydensmith {idx}" for idx in range(9, 4, -1)]
+    notifications_1 = notifications_get_v1(users[1]["token"])["notifications"]
+    assert [notification["notification_message"] for notification in notifications_1] == expected
+
+    # Users who were not tagged have their own inbox
+    assert len(notifications_get_v1(users[2]["token"])["notifications"]) == 1
+
+    # Inboxes survive a reload
+    update_data_write()
+    update_data_read()
+    notifications_1 = notifications_get_v1(users[1]["token"])["notifications"]
+    assert [notification["notification_message"] for notification in notifications_1] == expected
+
+
+def test_tags_resolved_in_one_pass(users, channels):
+    channel_invite_v2(users[0]["token"], channels[0], users[1]["auth_user_id"])
+
+    # nothaydensmith is not in the channel, which must not stop haydensmith being tagged
+    message_send_v2(users[0]["token"], channels[0], "@nothaydensmith@haydensmith!! @haydensmith")
+
+    notifications_1 = notifications_get_v1(users[1]["token"])["notifications"]
+    assert [notification["notification_message"] for notification in notifications_1] == [
+        "mj tagged you in user 1's channel: @nothaydensmith@hayd",
+        "mj added you to user 1's channel",
+        "mj added you to haydensmith, mj, nothaydensmith",
+    ]
+    assert len(notifications_get_v1(users[2]["token"])["notifications"]) == 1
+
+    # A handle which is a prefix of the tagged text is tagged as well
+    message_send_v2(users[0]["token"], channels[0], "@haydensmithy")
+    assert len(notifications_get_v1(users[1]["token"])["notifications"]) == 4
+
+
+def test_many_tags(users, channels):
+    channel_invite_v2(users[0]["token"], channels[0], users[1]["auth_user_id"])
+    channel_invite_v2(users[0]["token"], channels[0], users[2]["auth_user_id"])
+
+    message_send_v2(users[0]["token"], channels[0], "@haydensmith @nothaydensmith " * 30)
+
+    # Each user is tagged once however many times their handle appears
+    assert len(notifications_get_v1(users[1]["token"])["notifications"]) == 3
+    assert len(notifications_get_v1(users[2]["token"])["notifications"]) == 3
+
+
 def test_user_not_a_member():
     clear_v1()
     message = "Welcome to my channel @haydensmith and @nothaydensmith"
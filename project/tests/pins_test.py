@@ -0,0 +1,124 @@
+import pytest
+import time
+
+from src import config
+from src.auth import auth_register_v2
+from src.channels import channels_create_v2
+from src.channel import channel_pins_v1
+from src.dm import dm_create_v1, dm_pins_v1, dm_remove_v1
+from src.message import message_send_v2, message_senddm_v1, message_remove_v1, message_edit_v2, \
+    message_pin_v1, message_unpin_v1, message_sendlater_thread
+from src.ids import new_message_id
+from src.error import InputError, AccessError
+from src.other import clear_v1, update_data_read, update_data_write
+from src.data import pinned_messages
+from src.store import is_sealed
+
+
+@pytest.fixture
+def users():
+    clear_v1()
+    user = auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+    user_2 = auth_register_v2('anothervalidemail@gmail.com', '123abc!@#', 'Hayden', 'Smith')
+    return [user, user_2]
+
+@pytest.fixture
+def channel(users):
+    return channels_create_v2(users[0]["token"], "channel", True)["channel_id"]
+
+def texts(result):
+    return [message["message"] for message in result["messages"]]
+
+def test_channel_pins(users, channel):
+    message_ids = [message_send_v2(users[0]["token"], channel, f"{idx}")["message_id"] for idx in range(6)]
+    assert channel_pins_v1(users[0]["token"], channel) == {"messages": []}
+
+    for idx in [4, 1, 2, 5]:
+        message_pin_v1(users[0]["token"], message_ids[idx])
+    assert texts(channel_pins_v1(users[0]["token"], channel)) == ["5", "4", "2", "1"]
+    assert channel_pins_v1(users[0]["token"], channel)["messages"][0]["is_pinned"] == True
+
+    # Unpinning, removing and editing a message to be empty all drop it from the pins
+    message_unpin_v1(users[0]["token"], message_ids[4])
+    message_remove_v1(users[0]["token"], message_ids[1])
+    message_edit_v2(users[0]["token"], message_ids[5], "")
+    message_edit_v2(users[0]["token"], message_ids[2], "edited")
+    assert texts(channel_pins_v1(users[0]["token"], channel)) == ["edited"]
+
+    # The index is rebuilt from the messages on a restart
+    update_data_read()
+    assert texts(channel_pins_v1(users[0]["token"], channel)) == ["edited"]
+
+def test_dm_pins(users):
+    dm_id = dm_create_v1(users[0]["token"], [users[1]["auth_user_id"]])["dm_id"]
+    message_ids = [message_senddm_v1(users[1]["token"], dm_id, f"{idx}")["message_id"] for idx in range(3)]
+
+    message_pin_v1(users[1]["token"], message_ids[0])
+    message_pin_v1(users[0]["token"], message_ids[2])
+    assert texts(dm_pins_v1(users[1]["token"], dm_id)) == ["2", "0"]
+
+    dm_remove_v1(users[0]["token"], dm_id)
+    assert (False, dm_id) not in pinned_messages
+
+def test_sealed_pins(users, channel, monkeypatch):
+    monkeypatch.setattr(config, "hot_message_count", 2)
+    monkeypatch.setattr(config, "segment_size", 3)
+    message_ids = [message_send_v2(users[0]["token"], channel, f"{idx}")["message_id"] for idx in range(8)]
+    message_pin_v1(users[0]["token"], message_ids[0])
+    update_data_write()
+    assert is_sealed(message_ids[0]) == True
+
+    message_pin_v1(users[0]["token"], message_ids[4])
+    message_unpin_v1(users[0]["token"], message_ids[0])
+    message_pin_v1(users[0]["token"], message_ids[1])
+    message_pin_v1(users[0]["token"], message_ids[7])
+    message_remove_v1(users[0]["token"], message_ids[1])
+    assert texts(channel_pins_v1(users[0]["token"], channel)) == ["7", "4"]
+
+    update_data_read()
+    assert texts(channel_pins_v1(users[0]["token"], channel)) == ["7", "4"]
+
+    clear_v1()
+
+def test_pins_in_time_order(users, channel, monkeypatch):
+    # The later message is given its id when it is scheduled, before "now" is sent
+    later_id = new_message_id()
+    now_id = message_send_v2(users[0]["token"], channel, "now")["message_id"]
+    message_sendlater_thread(users[0]["auth_user_id"], channel, "later", int(time.time()) + 100, later_id, True)
+    earlier_id = new_message_id()
+    message_sendlater_thread(users[0]["auth_user_id"], channel, "earlier", int(time.time()) - 100, earlier_id, True)
+
+    for message_id in [now_id, later_id, earlier_id]:
+        message_pin_v1(users[0]["token"], message_id)
+    assert texts(channel_pins_v1(users[0]["token"], channel)) == ["later", "now", "earlier"]
+
+    message_unpin_v1(users[0]["token"], now_id)
+    assert texts(channel_pins_v1(users[0]["token"], channel)) == ["later", "earlier"]
+
+    # Also when rebuilt, including from sealed segments
+    monkeypatch.setattr(config, "hot_message_count", 1)
+    monkeypatch.setattr(config, "segment_size", 1)
+    message_pin_v1(users[0]["token"], now_id)
+    update_data_write()
+    assert is_sealed(later_id) == True
+    update_data_read()
+    assert texts(channel_pins_v1(users[0]["token"], channel)) == ["later", "now", "earlier"]
+
+    message_remove_v1(users[0]["token"], later_id)
+    assert texts(channel_pins_v1(users[0]["token"], channel)) == ["now", "earlier"]
+
+    clear_v1()
+
+def test_pins_errors(users, channel):
+    with pytest.raises(InputError):
+        channel_pins_v1(users[0]["token"], channel + 1)
+    with pytest.raises(AccessError):
+        channel_pins_v1(users[1]["token"], channel)
+    with pytest.raises(AccessError):
+        channel_pins_v1("invalid token", channel)
+
+    dm_id = dm_create_v1(users[0]["token"], [])["dm_id"]
+    with pytest.raises(InputError):
+        dm_pins_v1(users[0]["token"], dm_id + 1)
+    with pytest.raises(AccessError):
+        dm_pins_v1(users[1]["token"], dm_id)
@@ -0,0 +1,79 @@
+import pytest
+import json
+
+from src.auth import auth_register_v2
+from src.channels import channels_create_v2
+from src.channel import channel_messages_v2
+from src.message import message_send_v2, message_edit_v2, message_react_v1
+from src.other import clear_v1, search_v2, update_data_read, update_data_write
+from src.store import find_message
+from src.records import MessageRecord, message_record, record_fields
+from src.benchmark_messages import run_benchmark, sample_texts, measure_search_index
+
+
+@pytest.fixture
+def user():
+    clear_v1()
+    return auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+
+def test_record_behaves_like_dict():
+    fields = {
+        "message_id": 1, "u_id": 2, "message": "hello", "time_created": 3,
+        "reacts": {}, "is_pinned": False
+    }
+    record = message_record(fields)
+
+    assert record == fields
+    assert fields == record
+    assert dict(record) == fields
+    assert list(record.keys()) == list(fields.keys())
+    assert record.get("missing") is None
+    assert "u_id" in record and "keys" not in record
+    assert not hasattr(record, "__dict__")
+    assert message_record(record) is record
+
+    record.update({"message": "edited", "is_pinned": True})
+    assert record["message"] == "edited" and record.is_pinned == True
+
+    with pytest.raises(KeyError):
+        record["colour"] = "red"
+    with pytest.raises(KeyError):
+        record["colour"]
+    with pytest.raises(TypeError):
+        del record["message"]
+
+    assert json.loads(json.dumps([record], default=record_fields))[0] == record
+    with pytest.raises(TypeError):
+        json.dumps(object(), default=record_fields)
+
+def test_messages_stored_as_records(user):
+    channel_id = channels_create_v2(user["token"], "channel", True)["channel_id"]
+    message_id = message_send_v2(user["token"], channel_id, "hello")["message_id"]
+    message_edit_v2(user["token"], message_id, "hello there")
+    message_react_v1(user["token"], message_id, 1)
+    assert isinstance(find_message(message_id)[2], MessageRecord)
+
+    # Search returns plain dicts, ready to be serialised
+    messages = search_v2(user["token"], "hello")["messages"]
+    assert type(messages[0]) is dict
+    assert messages[0]["reacts"] == [
+        {"react_id": 1, "u_ids": [user["auth_user_id"]], "is_this_user_reacted": True}
+    ]
+
+    update_data_write()
+    update_data_read()
+    message = find_message(message_id)[2]
+    assert isinstance(message, MessageRecord)
+    assert message["message"] == "hello there"
+    assert channel_messages_v2(user["token"], channel_id, 0)["messages"][0]["reacts"][0]["u_ids"] == \
+        [user["auth_user_id"]]
+
+def test_benchmark():
+    results = run_benchmark(1000)
+    assert results["record"][0] < results["dict"][0]
+
+def test_search_index_size(user):
+    texts = sample_texts(10000)
+    allocated = measure_search_index(texts)
+    # The postings cost a few bytes for each word, not several times the text
+    assert allocated < 3 * sum(len(text) for text in texts)
@@ -0,0 +1,258 @@
+import pytest
+import time
+import types
+import datetime
+
+import src.message
+import src.retention
+
+from src import config
+from src.auth import auth_register_v2
+from src.channels import channels_create_v2
+from src.channel import channel_messages_v2, channel_join_v2, channel_pins_v1, channel_retention_set_v1
+from src.dm import dm_create_v1, dm_messages_v1, dm_retention_set_v1
+from src.message import message_send_v2, message_senddm_v1, message_pin_v1, message_react_v1
+from src.other import clear_v1, search_v2, notifications_get_v1, update_data_read, update_data_write
+from src.data import reset_codes, messages_by_id
+from src.error import InputError, AccessError
+from src.retention import admin_retention_sweep_v1, sweep_retention
+
+
+@pytest.fixture
+def users():
+    clear_v1()
+    owner = auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+    member = auth_register_v2('validemail2@gmail.com', '123abc!@#', 'A', 'B')
+    return owner, member
+
+@pytest.fixture
+def channel(users):
+    owner, member = users
+    channel_id = channels_create_v2(owner["token"], "channel", True)["channel_id"]
+    channel_join_v2(member["token"], channel_id)
+    return channel_id
+
+@pytest.fixture
+def dm(users):
+    owner, member = users
+    return dm_create_v1(owner["token"], [member["auth_user_id"]])["dm_id"]
+
+class FrozenDatetime(datetime.datetime):
+    when = 0
+
+    @classmethod
+    def now(cls, tz=None):
+        return datetime.datetime.fromtimestamp(cls.when, tz)
+
+def send_at(monkeypatch, when, send, *args):
+    # Sends a message as if it was sent at the unix timestamp when
+    FrozenDatetime.when = when
+    with monkeypatch.context() as patch:
+        patch.setattr(time, "time", lambda: when)
+        patch.setattr(src.message, "datetime", types.SimpleNamespace(
+            datetime=FrozenDatetime, timezone=datetime.timezone
+        ))
+        return send(*args)["message_id"]
+
+def sweep_at(monkeypatch, when):
+    with monkeypatch.context() as patch:
+        patch.setattr(time, "time", lambda: when)
+        return sweep_retention()
+
+def channel_texts(token, channel_id):
+    return [message["message"] for message in channel_messages_v2(token, channel_id, 0)["messages"]]
+
+def dm_texts(token, dm_id):
+    return [message["message"] for message in dm_messages_v1(token, dm_id, 0)["messages"]]
+
+def test_nothing_expires_by_default(users, channel, monkeypatch):
+    owner, member = users
+    message_send_v2(owner["token"], channel, "old @ab")
+    reset_codes.append({"u_id": member["auth_user_id"], "code": "old", "salt": "", "time_created": time.time()})
+
+    report = sweep_at(monkeypatch, time.time() + 10 ** 8)
+
+    assert report == {"messages_removed": 0, "notifications_removed": 0, "reset_codes_removed": 0}
+    assert channel_texts(owner["token"], channel) == ["old @ab"]
+    assert len(notifications_get_v1(member["token"])["notifications"]) == 1
+    assert [code["code"] for code in reset_codes] == ["old"]
+
+def test_global_rule(users, channel, dm, monkeypatch):
+    owner, _ = users
+    monkeypatch.setattr(config, "message_retention_seconds", 500)
+    now = time.time()
+
+    send_at(monkeypatch, now - 1000, message_send_v2, owner["token"], channel, "old channel")
+    send_at(monkeypatch, now - 1000, message_senddm_v1, owner["token"], dm, "old dm")
+    send_at(monkeypatch, now, message_send_v2, owner["token"], channel, "new channel")
+    send_at(monkeypatch, now, message_senddm_v1, owner["token"], dm, "new dm")
+
+    report = sweep_at(monkeypatch, now)
+
+    assert report["messages_removed"] == 2
+    assert channel_texts(owner["token"], channel) == ["new channel"]
+    assert dm_texts(owner["token"], dm) == ["new dm"]
+    assert [m["message"] for m in search_v2(owner["token"], "old")["messages"]] == []
+
+    # Sweeping again finds nothing new
+    assert sweep_at(monkeypatch, now)["messages_removed"] == 0
+
+def test_container_rules_override_global(users, channel, dm, monkeypatch):
+    owner, _ = users
+    monkeypatch.setattr(config, "message_retention_seconds", 500)
+    other_id = channels_create_v2(owner["token"], "other", True)["channel_id"]
+    now = time.time()
+
+    for container_id, send in [(channel, message_send_v2), (other_id, message_send_v2), (dm, message_senddm_v1)]:
+        send_at(monkeypatch, now - 1000, send, owner["token"], container_id, "old")
+        send_at(monkeypatch, now - 100, send, owner["token"], container_id, "recent")
+
+    # The channel keeps messages for longer than the global rule, the dm for less
+    channel_retention_set_v1(owner["token"], channel, 5000)
+    dm_retention_set_v1(owner["token"], dm, 50)
+
+    assert sweep_at(monkeypatch, now)["messages_removed"] == 3
+    assert channel_texts(owner["token"], channel) == ["recent", "old"]
+    assert channel_texts(owner["token"], other_id) == ["recent"]
+    assert dm_texts(owner["token"], dm) == []
+
+    # Going back to the global rule
+    channel_retention_set_v1(owner["token"], channel, None)
+    assert sweep_at(monkeypatch, now)["messages_removed"] == 1
+    assert channel_texts(owner["token"], channel) == ["recent"]
+
+def test_pins_and_reacts_go_with_messages(users, channel, monkeypatch):
+    owner, member = users
+    monkeypatch.setattr(config, "message_retention_seconds", 500)
+    now = time.time()
+
+    old_id = send_at(monkeypatch, now - 1000, message_send_v2, owner["token"], channel, "old")
+    new_id = send_at(monkeypatch, now, message_send_v2, owner["token"], channel, "new")
+    for message_id in [old_id, new_id]:
+        message_pin_v1(owner["token"], message_id)
+        message_react_v1(member["token"], message_id, 1)
+
+    sweep_at(monkeypatch, now)
+
+    assert old_id not in messages_by_id
+    assert [m["message_id"] for m in channel_pins_v1(owner["token"], channel)["messages"]] == [new_id]
+    assert channel_messages_v2(member["token"], channel, 0)["messages"][0]["reacts"][0]["u_ids"] == \
+        [member["auth_user_id"]]
+
+def test_chunks(users, channel, monkeypatch):
+    owner, _ = users
+    monkeypatch.setattr(config, "message_retention_seconds", 500)
+    monkeypatch.setattr(config, "retention_chunk_size", 3)
+    now = time.time()
+
+    for idx in range(10):
+        send_at(monkeypatch, now - 1000 + idx, message_send_v2, owner["token"], channel, f"old{idx}")
+    send_at(monkeypatch, now, message_send_v2, owner["token"], channel, "new")
+
+    # Each chunk carries on after the messages removed by the chunks before it
+    class LookupCounter:
+        lookups = 0
+
+        def __contains__(self, message_id):
+            LookupCounter.lookups += 1
+            return message_id in messages_by_id
+
+    monkeypatch.setattr(src.retention, "messages_by_id", LookupCounter())
+
+    assert sweep_at(monkeypatch, now)["messages_removed"] == 10
+    assert channel_texts(owner["token"], channel) == ["new"]
+    assert LookupCounter.lookups == 10
+
+def test_persisted(users, channel, dm, monkeypatch):
+    owner, _ = users
+    monkeypatch.setattr(config, "message_retention_seconds", 500)
+    monkeypatch.setattr(config, "retention_chunk_size", 2)
+    now = time.time()
+
+    for idx in range(5):
+        send_at(monkeypatch, now - 1000, message_send_v2, owner["token"], channel, f"old{idx}")
+        send_at(monkeypatch, now - 1000, message_senddm_v1, owner["token"], dm, f"old{idx}")
+    send_at(monkeypatch, now, message_send_v2, owner["token"], channel, "new")
+    dm_retention_set_v1(owner["token"], dm, 2000)
+
+    sweep_at(monkeypatch, now)
+
+    # Replayed from the journal, then from a snapshot
+    update_data_read()
+    assert channel_texts(owner["token"], channel) == ["new"]
+    assert len(dm_texts(owner["token"], dm)) == 5
+
+    update_data_write()
+    update_data_read()
+    assert channel_texts(owner["token"], channel) == ["new"]
+    assert len(dm_texts(owner["token"], dm)) == 5
+
+def test_sealed_messages(users, channel, monkeypatch):
+    owner, _ = users
+    monkeypatch.setattr(config, "message_retention_seconds", 500)
+    monkeypatch.setattr(config, "hot_message_count", 4)
+    monkeypatch.setattr(config, "segment_size", 4)
+    now = time.time()
+
+    for idx in range(12):
+        send_at(monkeypatch, now - 1000, message_send_v2, owner["token"], channel, f"old{idx}")
+    for idx in range(3):
+        send_at(monkeypatch, now, message_send_v2, owner["token"], channel, f"new{idx}")
+    update_data_write()
+
+    assert sweep_at(monkeypatch, now)["messages_removed"] == 12
+
+    update_data_write()
+    update_data_read()
+    assert channel_texts(owner["token"], channel) == ["new2", "new1", "new0"]
+
+def test_notifications_and_reset_codes(users, channel, monkeypatch):
+    owner, member = users
+    monkeypatch.setattr(config, "notification_retention_seconds", 500)
+    monkeypatch.setattr(config, "reset_code_retention_seconds", 500)
+    now = time.time()
+
+    send_at(monkeypatch, now - 1000, message_send_v2, owner["token"], channel, "@ab old")
+    send_at(monkeypatch, now, message_send_v2, owner["token"], channel, "@ab new")
+    reset_codes.append({"u_id": member["auth_user_id"], "code": "old", "salt": "", "time_created": now - 1000})
+    reset_codes.append({"u_id": member["auth_user_id"], "code": "new", "salt": "", "time_created": now})
+
+    report = sweep_at(monkeypatch, now)
+
+    assert report["notifications_removed"] == 1
+    assert report["reset_codes_removed"] == 1
+    assert [n["notification_message"] for n in notifications_get_v1(member["token"])["notifications"]] == \
+        ["mj tagged you in channel: @ab new"]
+    assert [code["code"] for code in reset_codes] == ["new"]
+
+    update_data_read()
+    assert len(notifications_get_v1(member["token"])["notifications"]) == 1
+    assert [code["code"] for code in reset_codes] == ["new"]
+
+def test_invalid_rules(users, channel, dm):
+    owner, member = users
+
+    for seconds in [0, -5, 1.5, "60", True]:
+        with pytest.raises(InputError):
+            channel_retention_set_v1(owner["token"], channel, seconds)
+        with pytest.raises(InputError):
+            dm_retention_set_v1(owner["token"], dm, seconds)
+
+    with pytest.raises(InputError):
+        channel_retention_set_v1(owner["token"], channel + 100, 60)
+    with pytest.raises(InputError):
+        dm_retention_set_v1(owner["token"], dm + 100, 60)
+
+def test_permissions(users, channel, dm):
+    owner, member = users
+
+    with pytest.raises(AccessError):
+        channel_retention_set_v1(member["token"], channel, 60)
+    with pytest.raises(AccessError):
+        dm_retention_set_v1(member["token"], dm, 60)
+    with pytest.raises(AccessError):
+        admin_retention_sweep_v1(member["token"])
+    with pytest.raises(AccessError):
+        admin_retention_sweep_v1("invalid token")
+
+    assert admin_retention_sweep_v1(owner["token"])["messages_removed"] == 0
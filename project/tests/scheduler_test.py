@@ -0,0 +1,97 @@
+import pytest
+import json
+import threading
+import time
+
+from src.auth import auth_register_v2
+from src.channels import channels_create_v2
+from src.message import message_sendlater_v1
+from src.store import get_channel
+from src.data import scheduled_jobs
+from src.error import AccessError
+from src.other import clear_v1, update_data_read, standup_start_v1, standup_send_v1, \
+    standup_active_v1
+from src.scheduler import scheduler_status_v1, scheduler_condition
+from src.journal import JOURNAL_PATH
+
+
+@pytest.fixture
+def user():
+    clear_v1()
+    return auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+
+@pytest.fixture
+def channel(user):
+    return channels_create_v2(user["token"], "user 1's channel", True)["channel_id"]
+
+def wait_for_messages(channel, count):
+    for _ in range(50):
+        if len(get_channel(channel)["messages"]) >= count:
+            break
+        time.sleep(0.1)
+    return get_channel(channel)["messages"]
+
+def test_one_thread_for_many_jobs(user, channel):
+    # Far enough ahead that no job is due before they have all been scheduled
+    send_time = int(time.time()) + 3
+    message_sendlater_v1(user["token"], channel, "warm up", send_time)
+    threads = threading.active_count()
+
+    for idx in range(200):
+        message_sendlater_v1(user["token"], channel, f"message {idx}", send_time)
+
+    assert threading.active_count() == threads
+
+    status = scheduler_status_v1(user["token"])
+    assert status["queue_depth"] == 201
+    assert status["next_due"] <= send_time + 1
+
+    messages = wait_for_messages(channel, 201)
+    assert len(messages) == 201
+    assert scheduler_status_v1(user["token"]) == {"queue_depth": 0, "next_due": None}
+
+def test_jobs_survive_restart(user, channel):
+    send_time = int(time.time()) + 1
+    message_id = message_sendlater_v1(user["token"], channel, "later", send_time)["message_id"]
+    standup_start_v1(user["token"], channel, 1)
+    standup_send_v1(user["token"], channel, "standup message")
+
+    # Simulate the server stopping before the jobs were run
+    with scheduler_condition:
+        scheduled_jobs.clear()
+    update_data_read()
+
+    assert scheduler_status_v1(user["token"])["queue_depth"] == 2
+
+    messages = wait_for_messages(channel, 2)
+    assert sorted(message["message"] for message in messages) == ["later", "mj: standup message"]
+    assert message_id in [message["message_id"] for message in messages]
+    assert standup_active_v1(user["token"], channel)["is_active"] == False
+
+def test_sent_job_not_rerun(user, channel):
+    message_sendlater_v1(user["token"], channel, "later", int(time.time()) + 1)
+    assert len(wait_for_messages(channel, 1)) == 1
+
+    # A crash after the message was journalled but before its job was removed
+    with open(JOURNAL_PATH, "r") as FILE:
+        lines = [line for line in FILE if json.loads(line)["op"] != "job_remove"]
+    with open(JOURNAL_PATH, "w") as FILE:
+        FILE.writelines(lines)
+
+    update_data_read()
+    assert scheduler_status_v1(user["token"])["queue_depth"] == 0
+    time.sleep(0.2)
+    assert [message["message"] for message in get_channel(channel)["messages"]] == ["later"]
+
+def test_clear_cancels_jobs(user, channel):
+    message_sendlater_v1(user["token"], channel, "later", int(time.time()) + 1)
+    clear_v1()
+
+    user = auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+    assert scheduler_status_v1(user["token"]) == {"queue_depth": 0, "next_due": None}
+
+def test_invalid_token():
+    with pytest.raises(AccessError):
+        scheduler_status_v1("invalid token")
+
+    clear_v1()
@@ -4,10 +4,13 @@ from src.other import search_v2
 from src.auth import auth_register_v2
 from src.channels import channels_create_v2
 from src.channel import channel_join_v2
-from src.message import message_send_v2, message_senddm_v1
+from src.message import message_send_v2, message_senddm_v1, message_edit_v2, message_remove_v1
 from src.dm import dm_create_v1
 from src.error import InputError, AccessError
-from src.other import clear_v1
+from src.other import clear_v1, update_data_write
+from src.data import message_words
+from src.store import search_index_state
+from src import config
 
 
 @pytest.fixture
@@ -164,6 +167,82 @@ def test_invalid_query_str(users):
         search_v2(users[0]['token'], long_string)
 
 
+def test_order_and_short_queries(users, c_message_ids, d_message_ids):
+    '''
+    A test which checks that matches are returned channel by channel, then dm by dm,
+    in the order they were sent, for both short and long queries
+    '''
+    expected = [c_message_ids[0], c_message_ids[1], c_message_ids[2],
+                d_message_ids[0], d_message_ids[1], d_message_ids[2]]
+
+    for query_str in ["message", "e", "ss", ""]:
+        output = search_v2(users[1]["token"], query_str)['messages']
+        output_ids = [message['message_id'] for message in output]
+        if query_str == "message":
+            assert output_ids == expected
+        else:
+            assert output_ids[:3] == expected[:3]
+
+    # Matches across a word boundary and are case sensitive
+    output = search_v2(users[1]["token"], "w channel n")['messages']
+    assert [message['message_id'] for message in output] == [c_message_ids[2]]
+    assert search_v2(users[1]["token"], "MESSAGE") == {"messages": []}
+
+
+def test_edit_and_remove(users, c_message_ids, d_message_ids):
+    '''
+    A test which checks that edited and removed messages are found by their new text only
+    '''
+    message_edit_v2(users[0]["token"], c_message_ids[0], 'changed text')
+    message_remove_v1(users[1]["token"], c_message_ids[1])
+    message_edit_v2(users[0]["token"], d_message_ids[0], '')
+
+    output = search_v2(users[1]["token"], "message")['messages']
+    assert [message['message_id'] for message in output] == [c_message_ids[2],
+                                                              d_message_ids[1], d_message_ids[2]]
+
+    output = search_v2(users[1]["token"], "changed")['messages']
+    assert [message['message_id'] for message in output] == [c_message_ids[0]]
+
+
+def test_same_as_scanning(users, channels):
+    '''
+    A test which checks that queries starting, ending or splitting words match the
+    same messages as testing every message
+    '''
+    texts = ["hello world", "helloworld", "say hello, world!", "yellow worlds", "o w",
+             "hi", "world hello", "a_b c-d", "ell"]
+    message_ids = [message_send_v2(users[0]["token"], channels[0], text)["message_id"] for text in texts]
+
+    for query_str in ["hello world", "lo wor", "o w", "hello", "ello", "hell", "world!",
+                      "ld", ", w", "b c", "_b c-", "low", "x", "ell", "o", " "]:
+        output = search_v2(users[0]["token"], query_str)['messages']
+        expected = [message_id for message_id, text in zip(message_ids, texts) if query_str in text]
+        assert [message['message_id'] for message in output] == expected
+
+
+def test_removed_messages_compacted(users, channels, monkeypatch):
+    '''
+    A test which checks that removed messages are left out of results, and out of the
+    search index once it is compacted
+    '''
+    monkeypatch.setattr(config, "search_index_stale_ratio", 0.25)
+    message_ids = [message_send_v2(users[0]["token"], channels[0], f"common word{idx}")["message_id"]
+                   for idx in range(4)]
+    for message_id in message_ids[:2]:
+        message_remove_v1(users[0]["token"], message_id)
+
+    output = search_v2(users[0]["token"], "common")['messages']
+    assert [message['message_id'] for message in output] == message_ids[2:]
+    assert search_index_state["stale"] == 4
+
+    update_data_write()
+
+    assert list(message_words["common"]) == message_ids[2:]
+    assert "word0" not in message_words
+    assert search_index_state == {"entries": 4, "stale": 0}
+
+
 def test_invalid_token():
     '''
     A test which checks if an AccessError is raised when the token passed in 
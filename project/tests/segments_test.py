@@ -0,0 +1,161 @@
+import pytest
+import os
+
+from src import config
+from src.auth import auth_register_v2
+from src.channels import channels_create_v2
+from src.channel import channel_messages_v2, channel_messages_range_v1
+from src.dm import dm_create_v1, dm_remove_v1
+from src.message import message_send_v2, message_senddm_v1, message_edit_v2, message_remove_v1, \
+    message_react_v1, message_pin_v1
+from src.user import admin_user_remove_v1
+from src.other import clear_v1, search_v2, update_data_read, update_data_write
+from src.store import get_channel, get_dm, find_message, is_sealed, iter_messages
+from src.segments import SEGMENT_DIR, segment_cache, segment_path
+
+
+@pytest.fixture
+def small_segments(monkeypatch):
+    monkeypatch.setattr(config, "hot_message_count", 5)
+    monkeypatch.setattr(config, "segment_size", 4)
+    monkeypatch.setattr(config, "segment_cache_size", 2)
+
+@pytest.fixture
+def users(small_segments):
+    clear_v1()
+    user = auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+    user_2 = auth_register_v2('anothervalidemail@gmail.com', '123abc!@#', 'Hayden', 'Smith')
+    return [user, user_2]
+
+@pytest.fixture
+def channel(users):
+    channel_id = channels_create_v2(users[0]["token"], "channel", True)["channel_id"]
+    message_ids = [message_send_v2(users[0]["token"], channel_id, f"msg{idx:02d}")["message_id"]
+                   for idx in range(20)]
+
+    # Snapshots seal the oldest messages, 20 -> 16 -> 12 -> 8 in memory
+    update_data_write()
+    return channel_id, message_ids
+
+def texts(messages):
+    return [message["message"] for message in messages]
+
+def segment_files():
+    return sorted(os.listdir(SEGMENT_DIR)) if os.path.isdir(SEGMENT_DIR) else []
+
+def test_oldest_messages_sealed(users, channel):
+    channel_id, message_ids = channel
+
+    assert texts(get_channel(channel_id)["messages"]) == [f"msg{idx:02d}" for idx in range(12, 20)]
+    assert len(get_channel(channel_id)["segments"]) == 3
+    assert len(segment_files()) == 3
+    assert is_sealed(message_ids[0]) == True
+    assert is_sealed(message_ids[12]) == False
+
+    result = channel_messages_v2(users[0]["token"], channel_id, 0)
+    assert texts(result["messages"]) == [f"msg{idx:02d}" for idx in range(19, -1, -1)]
+    assert result["end"] == -1
+
+    # Pages and cursors carry on into the sealed messages
+    result = channel_messages_v2(users[0]["token"], channel_id, 0, message_ids[10])
+    assert texts(result["messages"]) == [f"msg{idx:02d}" for idx in range(9, -1, -1)]
+    assert find_message(message_ids[3])[2]["message"] == "msg03"
+
+    assert len(segment_cache) <= 2
+
+def test_sealed_messages_searched(users, channel):
+    channel_id, _ = channel
+
+    assert texts(search_v2(users[0]["token"], "msg0")["messages"]) == [f"msg{idx:02d}" for idx in range(10)]
+    assert texts(search_v2(users[0]["token"], "g1")["messages"]) == [f"msg{idx:02d}" for idx in range(10, 20)]
+
+    messages = channel_messages_range_v1(users[0]["token"], channel_id, 0, 2 ** 40)["messages"]
+    assert len(messages) == 20
+
+def test_only_segments_with_matches_read(users, channel):
+    channel_id, message_ids = channel
+    segments = get_channel(channel_id)["segments"]
+
+    segment_cache.clear()
+    assert texts(search_v2(users[0]["token"], "msg05")["messages"]) == ["msg05"]
+    assert list(segment_cache) == [segments[1]["segment_id"]]
+
+    # Sealed messages are found by their new text once edited, and not once removed
+    message_edit_v2(users[0]["token"], message_ids[9], "edited sealed")
+    message_remove_v1(users[0]["token"], message_ids[2])
+    update_data_read()
+    segment_cache.clear()
+    assert texts(search_v2(users[0]["token"], "sealed")["messages"]) == ["edited sealed"]
+    assert search_v2(users[0]["token"], "msg02")["messages"] == []
+    assert search_v2(users[0]["token"], "msg09")["messages"] == []
+    assert len(segment_cache) == 1
+
+    clear_v1()
+
+def test_sealed_messages_changed(users, channel):
+    channel_id, message_ids = channel
+    old_files = segment_files()
+
+    message_edit_v2(users[0]["token"], message_ids[1], "edited")
+    message_react_v1(users[0]["token"], message_ids[2], 1)
+    message_pin_v1(users[0]["token"], message_ids[2])
+    message_remove_v1(users[0]["token"], message_ids[5])
+    message_edit_v2(users[0]["token"], message_ids[6], "")
+
+    # Changed segments are written out as new segments, the old files are deleted
+    assert len(segment_files()) == 3
+    assert segment_files() != old_files
+
+    # Everything survives a restart
+    update_data_read()
+    messages = channel_messages_v2(users[0]["token"], channel_id, 0)["messages"][::-1]
+    assert len(messages) == 18
+    assert texts(messages[:6]) == ["msg00", "edited", "msg02", "msg03", "msg04", "msg07"]
+    assert messages[2]["reacts"][0]["u_ids"] == [users[0]["auth_user_id"]]
+    assert messages[2]["is_pinned"] == True
+    assert find_message(message_ids[5]) is None
+    assert find_message(message_ids[19])[2]["message"] == "msg19"
+
+    clear_v1()
+
+def test_sealed_messages_of_removed_user(users, channel):
+    channel_id, _ = channel
+    channel_2 = channels_create_v2(users[1]["token"], "channel 2", True)["channel_id"]
+    for idx in range(10):
+        message_send_v2(users[1]["token"], channel_2, f"user 2 {idx}")
+    update_data_write()
+    assert len(get_channel(channel_2)["segments"]) == 1
+
+    admin_user_remove_v1(users[0]["token"], users[1]["auth_user_id"])
+
+    update_data_read()
+    assert texts(iter_messages(get_channel(channel_2))) == ["Removed user"] * 10
+    messages = channel_messages_v2(users[0]["token"], channel_id, 0)["messages"]
+    assert "Removed user" not in texts(messages)
+
+    clear_v1()
+
+def test_removed_dm_segments_deleted(users):
+    dm_id = dm_create_v1(users[0]["token"], [users[1]["auth_user_id"]])["dm_id"]
+    for idx in range(10):
+        message_senddm_v1(users[0]["token"], dm_id, f"{idx}")
+    update_data_write()
+
+    segment_ids = [segment["segment_id"] for segment in get_dm(dm_id)["segments"]]
+    assert segment_ids
+    dm_remove_v1(users[0]["token"], dm_id)
+
+    for segment_id in segment_ids:
+        assert not os.path.exists(segment_path(segment_id))
+
+def test_unused_segments_removed(users, channel):
+    os.makedirs(SEGMENT_DIR, exist_ok=True)
+    with open(os.path.join(SEGMENT_DIR, "9999.json.gz"), "w") as FILE:
+        FILE.write("left behind by a crash")
+
+    update_data_read()
+    assert "9999.json.gz" not in segment_files()
+    assert len(segment_files()) == 3
+
+    clear_v1()
+    assert segment_files() == []
@@ -0,0 +1,123 @@
+import pytest
+import os
+import json
+
+from src.other import standup_start_v1, standup_send_v1, standup_active_v1, finish_standup, clear_v1, \
+    update_data_read, update_data_write
+from src.auth import auth_register_v2
+from src.channel import channel_join_v2, channel_messages_v2
+from src.channels import channels_create_v2
+from src.user import user_profile_sethandle_v1
+from src.scheduler import pending_jobs
+from src.standup_log import STANDUP_LOG_DIR, standup_log_path
+from src.store import get_channel
+
+
+@pytest.fixture
+def users():
+    clear_v1()
+    user_1 = auth_register_v2("email1@gmail.com", "a123!$%", "Mark", "R")
+    user_2 = auth_register_v2("email2@gmail.com", "a123!$%", "Hayden", "S")
+    return [user_1, user_2]
+
+@pytest.fixture
+def channel_id(users):
+    channel_id = channels_create_v2(users[0]["token"], "channel", True)["channel_id"]
+    channel_join_v2(users[1]["token"], channel_id)
+    return channel_id
+
+def finish(channel_id):
+    for job in pending_jobs():
+        if job["kind"] == "standup" and job["args"]["channel_id"] == channel_id:
+            finish_standup(**job["args"])
+
+def log_files():
+    return os.listdir(STANDUP_LOG_DIR) if os.path.isdir(STANDUP_LOG_DIR) else []
+
+def test_sends_only_write_log(users, channel_id):
+    standup_start_v1(users[0]["token"], channel_id, 60)
+    modified = os.stat("./src/data.json").st_mtime_ns
+    journal_size = os.path.getsize("./src/data.journal")
+
+    standup_send_v1(users[0]["token"], channel_id, "first")
+    standup_send_v1(users[1]["token"], channel_id, "second")
+
+    assert os.stat("./src/data.json").st_mtime_ns == modified
+    assert os.path.getsize("./src/data.journal") == journal_size
+    assert len(log_files()) == 1
+
+    finish(channel_id)
+    messages = channel_messages_v2(users[0]["token"], channel_id, 0)["messages"]
+    assert messages[0]["message"] == "markr: first\nhaydens: second"
+    assert standup_active_v1(users[0]["token"], channel_id) == {"is_active": False, "time_finish": None}
+
+    # The log is deleted once the snapshot no longer refers to it
+    assert log_files() == []
+
+def test_standup_survives_restart(users, channel_id):
+    time_finish = standup_start_v1(users[0]["token"], channel_id, 60)["time_finish"]
+    standup_send_v1(users[0]["token"], channel_id, "before restart")
+
+    update_data_read()
+    assert standup_active_v1(users[1]["token"], channel_id) == {"is_active": True, "time_finish": time_finish}
+    standup_send_v1(users[1]["token"], channel_id, "after restart")
+
+    finish(channel_id)
+    messages = channel_messages_v2(users[0]["token"], channel_id, 0)["messages"]
+    assert messages[0]["message"] == "markr: before restart\nhaydens: after restart"
+
+def test_buffered_text_from_older_data(users, channel_id):
+    standup_start_v1(users[0]["token"], channel_id, 60)
+    update_data_write()
+
+    # data.json written before standups kept their parts in a log of their own
+    with open("./src/data.json", "r") as FILE:
+        data = json.load(FILE)
+    standup = data["channels"][0]["standup"][0]
+    standup["message"] = "markr: buffered\n"
+    del standup["log_id"]
+    with open("./src/data.json", "w") as FILE:
+        json.dump(data, FILE)
+
+    update_data_read()
+    standup_send_v1(users[1]["token"], channel_id, "new")
+    finish(channel_id)
+    messages = channel_messages_v2(users[0]["token"], channel_id, 0)["messages"]
+    assert messages[0]["message"] == "markr: buffered\nhaydens: new"
+
+def test_handle_kept_from_when_sent(users, channel_id):
+    standup_start_v1(users[0]["token"], channel_id, 60)
+    standup_send_v1(users[1]["token"], channel_id, "before")
+    user_profile_sethandle_v1(users[1]["token"], "renamed")
+    standup_send_v1(users[1]["token"], channel_id, "after")
+
+    # Including once read back from the log
+    update_data_read()
+    finish(channel_id)
+    messages = channel_messages_v2(users[0]["token"], channel_id, 0)["messages"]
+    assert messages[0]["message"] == "haydens: before\nrenamed: after"
+
+def test_parts_logged_without_handles(users, channel_id):
+    standup_start_v1(users[0]["token"], channel_id, 60)
+    update_data_write()
+    log_id = get_channel(channel_id)["standup"][0]["log_id"]
+    with open(standup_log_path(log_id), "a") as FILE:
+        FILE.write(json.dumps([users[1]["auth_user_id"], "older"]) + "\n")
+
+    update_data_read()
+    standup_send_v1(users[0]["token"], channel_id, "newer")
+    finish(channel_id)
+    messages = channel_messages_v2(users[0]["token"], channel_id, 0)["messages"]
+    assert messages[0]["message"] == "haydens: older\nmarkr: newer"
+
+def test_unused_logs_removed(users, channel_id):
+    standup_start_v1(users[0]["token"], channel_id, 60)
+    standup_send_v1(users[0]["token"], channel_id, "hello")
+    with open(standup_log_path(1), "w") as FILE:
+        FILE.write("left behind by a crash")
+
+    update_data_read()
+    assert len(log_files()) == 1
+
+    clear_v1()
+    assert log_files() == []
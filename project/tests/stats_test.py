@@ -0,0 +1,159 @@
+import pytest
+import json
+
+from src.auth import auth_register_v2
+from src.channels import channels_create_v2
+from src.channel import channel_join_v2, channel_stats_v1
+from src.dm import dm_create_v1, dm_stats_v1
+from src.message import message_send_v2, message_senddm_v1, message_share_v1, message_react_v1, \
+    message_unreact_v1, message_remove_v1
+from src.user import user_stats_v1, users_stats_v1
+from src.other import clear_v1, update_data_read, update_data_write
+from src.error import InputError, AccessError
+
+
+@pytest.fixture
+def users():
+    clear_v1()
+    user = auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+    user_2 = auth_register_v2('anothervalidemail@gmail.com', '123abc!@#', 'Hayden', 'Smith')
+    user_3 = auth_register_v2('yetanothervalidemail@gmail.com', '123abc!@#', 'Nothayden', 'Smith')
+    return [user, user_2, user_3]
+
+@pytest.fixture
+def activity(users):
+    channel_id = channels_create_v2(users[0]["token"], "channel", True)["channel_id"]
+    channel_join_v2(users[1]["token"], channel_id)
+    dm_id = dm_create_v1(users[0]["token"], [users[1]["auth_user_id"]])["dm_id"]
+
+    message_ids = [message_send_v2(users[0]["token"], channel_id, f"msg{idx}")["message_id"] for idx in range(3)]
+    message_senddm_v1(users[1]["token"], dm_id, "hello")
+    message_share_v1(users[1]["token"], message_ids[0], "look", -1, dm_id)
+
+    message_react_v1(users[1]["token"], message_ids[0], 1)
+    message_react_v1(users[1]["token"], message_ids[1], 1)
+    message_react_v1(users[0]["token"], message_ids[1], 1)
+    message_unreact_v1(users[1]["token"], message_ids[1], 1)
+
+    message_remove_v1(users[0]["token"], message_ids[2])
+
+    return channel_id, dm_id
+
+def expected_stats(users):
+    return [
+        {
+            "channels_joined": 1, "dms_joined": 1, "messages_sent": 3,
+            "reacts_given": 1, "reacts_received": 2, "involvement_rate": 5 / 6,
+        },
+        {
+            "channels_joined": 1, "dms_joined": 1, "messages_sent": 2,
+            "reacts_given": 1, "reacts_received": 0, "involvement_rate": 4 / 6,
+        },
+        {
+            "channels_joined": 0, "dms_joined": 0, "messages_sent": 0,
+            "reacts_given": 0, "reacts_received": 0, "involvement_rate": 0,
+        },
+    ]
+
+def check_stats(users, channel_id, dm_id):
+    for user, expected in zip(users, expected_stats(users)):
+        assert user_stats_v1(user["token"])["user_stats"] == expected
+
+    assert users_stats_v1(users[2]["token"])["dreams_stats"] == {
+        "channels_exist": 1, "dms_exist": 1, "messages_exist": 4,
+    }
+    # Removed messages still count as sent
+    assert channel_stats_v1(users[0]["token"], channel_id)["channel_stats"] == {
+        "messages_sent": 3, "messages_exist": 2, "members": 2,
+    }
+    assert dm_stats_v1(users[1]["token"], dm_id)["dm_stats"] == {
+        "messages_sent": 2, "messages_exist": 2, "members": 2,
+    }
+
+def test_no_activity(users):
+    assert user_stats_v1(users[0]["token"])["user_stats"] == expected_stats(users)[2]
+    assert users_stats_v1(users[0]["token"])["dreams_stats"] == {
+        "channels_exist": 0, "dms_exist": 0, "messages_exist": 0,
+    }
+
+def test_counters(users, activity):
+    check_stats(users, *activity)
+
+def test_unreact_uncounted(users):
+    channel_id = channels_create_v2(users[0]["token"], "channel", True)["channel_id"]
+    channel_join_v2(users[1]["token"], channel_id)
+    message_id = message_send_v2(users[0]["token"], channel_id, "hello")["message_id"]
+
+    # Toggling a react leaves the counters where they were
+    for _ in range(5):
+        message_react_v1(users[1]["token"], message_id, 1)
+        message_unreact_v1(users[1]["token"], message_id, 1)
+    message_react_v1(users[1]["token"], message_id, 1)
+
+    def reacts():
+        return (
+            user_stats_v1(users[1]["token"])["user_stats"]["reacts_given"],
+            user_stats_v1(users[0]["token"])["user_stats"]["reacts_received"],
+        )
+
+    assert reacts() == (1, 1)
+    update_data_read()
+    assert reacts() == (1, 1)
+
+    message_unreact_v1(users[1]["token"], message_id, 1)
+    assert reacts() == (0, 0)
+    update_data_read()
+    assert reacts() == (0, 0)
+
+def test_involvement_rate_capped(users):
+    channel_id = channels_create_v2(users[0]["token"], "channel", True)["channel_id"]
+    message_ids = [message_send_v2(users[0]["token"], channel_id, "hello")["message_id"] for _ in range(3)]
+    for message_id in message_ids:
+        message_remove_v1(users[0]["token"], message_id)
+
+    assert user_stats_v1(users[0]["token"])["user_stats"]["involvement_rate"] == 1
+
+def test_counters_persisted(users, activity):
+    # Replayed from the journal, then from a snapshot
+    update_data_read()
+    check_stats(users, *activity)
+
+    update_data_write()
+    update_data_read()
+    check_stats(users, *activity)
+
+def test_counters_of_older_data(users, activity):
+    update_data_write()
+
+    with open("./src/data.json", "r") as FILE:
+        data = json.load(FILE)
+    for owner in data["users"] + data["channels"] + data["dms"]:
+        del owner["activity"]
+    with open("./src/data.json", "w") as FILE:
+        json.dump(data, FILE)
+
+    update_data_read()
+
+    # Only the messages and reacts still held can be counted
+    assert user_stats_v1(users[0]["token"])["user_stats"]["messages_sent"] == 2
+    assert user_stats_v1(users[0]["token"])["user_stats"]["reacts_received"] == 2
+    assert user_stats_v1(users[1]["token"])["user_stats"]["reacts_given"] == 1
+    assert channel_stats_v1(users[0]["token"], activity[0])["channel_stats"]["messages_sent"] == 2
+    assert dm_stats_v1(users[0]["token"], activity[1])["dm_stats"]["messages_sent"] == 2
+
+def test_errors(users, activity):
+    channel_id, dm_id = activity
+
+    with pytest.raises(AccessError):
+        user_stats_v1("invalid token")
+    with pytest.raises(AccessError):
+        users_stats_v1("invalid token")
+
+    with pytest.raises(InputError):
+        channel_stats_v1(users[0]["token"], channel_id + 100)
+    with pytest.raises(AccessError):
+        channel_stats_v1(users[2]["token"], channel_id)
+    with pytest.raises(InputError):
+        dm_stats_v1(users[0]["token"], dm_id + 100)
+    with pytest.raises(AccessError):
+        dm_stats_v1(users[2]["token"], dm_id)
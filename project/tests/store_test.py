@@ -0,0 +1,181 @@
+import pytest
+import json
+
+from src.auth import auth_register_v2
+from src.channels import channels_create_v2
+from src.channel import channel_join_v2, channel_leave_v1, channel_details_v2, channel_addowner_v1, \
+    channel_removeowner_v1
+from src.dm import dm_create_v1, dm_remove_v1, dm_details_v1, dm_invite_v1, dm_leave_v1
+from src.message import message_send_v2, message_senddm_v1, message_remove_v1
+from src.user import user_profile_sethandle_v1, user_profile_setemail_v2, admin_user_remove_v1
+from src.other import clear_v1, update_data_read, update_data_write
+from src.store import get_user, get_user_by_email, get_user_by_handle, get_channel, get_dm, \
+    find_message, member_channel_ids, member_dm_ids, is_member, is_owner
+from src.data import channels_by_owner, dms_by_owner
+
+
+@pytest.fixture
+def users():
+    clear_v1()
+    user = auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+    user_2 = auth_register_v2('anothervalidemail@gmail.com', '123abc!@#', 'Hayden', 'Smith')
+    return [user, user_2]
+
+def test_user_indexes(users):
+    user = get_user(users[1]["auth_user_id"])
+    assert user["handle_str"] == "haydensmith"
+    assert get_user_by_email("AnotherValidEmail@gmail.com") is user
+    assert get_user_by_handle("haydensmith") is user
+
+    user_profile_sethandle_v1(users[1]["token"], "newhandle")
+    user_profile_setemail_v2(users[1]["token"], "newemail@gmail.com")
+    assert get_user_by_handle("haydensmith") is None
+    assert get_user_by_handle("newhandle") is user
+    assert get_user_by_email("anothervalidemail@gmail.com") is None
+    assert get_user_by_email("newemail@gmail.com") is user
+
+    # Removed users keep their handle but free up their email
+    admin_user_remove_v1(users[0]["token"], users[1]["auth_user_id"])
+    assert get_user_by_handle("newhandle") is user
+    assert get_user_by_email("newemail@gmail.com") is None
+
+def test_invalid_ids(users):
+    assert get_user([1]) is None
+    assert get_channel({}) is None
+    assert get_dm(-1) is None
+    assert find_message([]) is None
+
+def test_message_index(users):
+    channel_id = channels_create_v2(users[0]["token"], "channel", True)["channel_id"]
+    dm_id = dm_create_v1(users[0]["token"], [users[1]["auth_user_id"]])["dm_id"]
+
+    message_ids = [message_send_v2(users[0]["token"], channel_id, f"{idx}")["message_id"]
+                   for idx in range(5)]
+    dm_message_id = message_senddm_v1(users[0]["token"], dm_id, "dm")["message_id"]
+
+    container, is_channel, message = find_message(message_ids[3])
+    assert container is get_channel(channel_id)
+    assert is_channel == True
+    assert message["message"] == "3"
+
+    # Later messages are still found once an earlier message is removed
+    message_remove_v1(users[0]["token"], message_ids[1])
+    assert find_message(message_ids[1]) is None
+    for idx in [0, 2, 3, 4]:
+        assert find_message(message_ids[idx])[2]["message"] == f"{idx}"
+
+    container, is_channel, message = find_message(dm_message_id)
+    assert container is get_dm(dm_id)
+    assert is_channel == False
+
+    dm_remove_v1(users[0]["token"], dm_id)
+    assert find_message(dm_message_id) is None
+
+def test_indexes_rebuilt_on_read(users):
+    channel_id = channels_create_v2(users[0]["token"], "channel", True)["channel_id"]
+    message_id = message_send_v2(users[0]["token"], channel_id, "hello")["message_id"]
+
+    update_data_read()
+
+    assert get_user(users[0]["auth_user_id"])["handle_str"] == "mj"
+    assert find_message(message_id)[0] is get_channel(channel_id)
+
+def test_members_stored_as_u_ids(users):
+    channel_id = channels_create_v2(users[0]["token"], "channel", True)["channel_id"]
+    channel_join_v2(users[1]["token"], channel_id)
+    dm_id = dm_create_v1(users[0]["token"], [users[1]["auth_user_id"]])["dm_id"]
+
+    assert get_channel(channel_id)["all_members"] == [users[0]["auth_user_id"], users[1]["auth_user_id"]]
+    assert get_channel(channel_id)["owner_members"] == [users[0]["auth_user_id"]]
+    assert get_dm(dm_id)["all_members"] == [users[0]["auth_user_id"], users[1]["auth_user_id"]]
+
+    # Profile changes are seen by every channel and dm without updating them
+    user_profile_sethandle_v1(users[1]["token"], "newhandle")
+    members = channel_details_v2(users[0]["token"], channel_id)["all_members"]
+    assert members[1]["handle_str"] == "newhandle"
+    assert dm_details_v1(users[0]["token"], dm_id)["members"][1]["handle_str"] == "newhandle"
+
+def test_profile_members_normalised_on_read(users):
+    channel_id = channels_create_v2(users[0]["token"], "channel", True)["channel_id"]
+    update_data_write()
+
+    # data.json written before membership only stored u_ids
+    with open("./src/data.json", "r") as FILE:
+        data = json.load(FILE)
+    profile = {"u_id": users[0]["auth_user_id"], "email": "validemail@gmail.com",
+               "name_first": "M", "name_last": "J", "handle_str": "mj"}
+    data["channels"][0]["owner_members"] = [profile]
+    data["channels"][0]["all_members"] = [profile]
+    with open("./src/data.json", "w") as FILE:
+        json.dump(data, FILE)
+
+    update_data_read()
+    assert get_channel(channel_id)["all_members"] == [users[0]["auth_user_id"]]
+    assert channel_details_v2(users[0]["token"], channel_id)["owner_members"] == [profile]
+
+    clear_v1()
+
+def test_membership_index(users):
+    u_id_1 = users[0]["auth_user_id"]
+    u_id_2 = users[1]["auth_user_id"]
+    user_3 = auth_register_v2('thirdvalidemail@gmail.com', '123abc!@#', 'Third', 'User')
+
+    channel_1 = channels_create_v2(users[0]["token"], "channel 1", True)["channel_id"]
+    channel_2 = channels_create_v2(users[0]["token"], "channel 2", True)["channel_id"]
+    channel_join_v2(users[1]["token"], channel_2)
+    channel_join_v2(users[1]["token"], channel_1)
+    dm_1 = dm_create_v1(users[0]["token"], [u_id_2])["dm_id"]
+    dm_2 = dm_create_v1(users[0]["token"], [])["dm_id"]
+    dm_invite_v1(users[0]["token"], dm_2, user_3["auth_user_id"])
+
+    # Ordered by id regardless of the order they were joined in
+    assert member_channel_ids(u_id_2) == [channel_1, channel_2]
+    assert member_dm_ids(u_id_1) == [dm_1, dm_2]
+    assert member_dm_ids(user_3["auth_user_id"]) == [dm_2]
+    assert is_member(get_channel(channel_1), u_id_2) == True
+
+    channel_leave_v1(users[1]["token"], channel_1)
+    dm_leave_v1(users[1]["token"], dm_1)
+    dm_remove_v1(users[0]["token"], dm_2)
+    assert member_channel_ids(u_id_2) == [channel_2]
+    assert member_dm_ids(u_id_2) == []
+    assert member_dm_ids(user_3["auth_user_id"]) == []
+    assert is_member(get_channel(channel_1), u_id_2) == False
+
+    admin_user_remove_v1(users[0]["token"], u_id_2)
+    assert member_channel_ids(u_id_2) == []
+
+    update_data_read()
+    assert member_channel_ids(u_id_1) == [channel_1, channel_2]
+    assert member_dm_ids(u_id_1) == [dm_1]
+
+def test_ownership_index(users):
+    u_id_1 = users[0]["auth_user_id"]
+    u_id_2 = users[1]["auth_user_id"]
+    channel_id = channels_create_v2(users[0]["token"], "channel", True)["channel_id"]
+    dm_id = dm_create_v1(users[0]["token"], [u_id_2])["dm_id"]
+    channel_join_v2(users[1]["token"], channel_id)
+
+    channel_addowner_v1(users[0]["token"], channel_id, u_id_2)
+    assert is_owner(get_channel(channel_id), u_id_2) == True
+    assert is_owner(get_dm(dm_id), u_id_2) == False
+    assert channels_by_owner[u_id_2] == {channel_id}
+    assert get_channel(channel_id)["owner_members"] == [u_id_1, u_id_2]
+
+    channel_removeowner_v1(users[0]["token"], channel_id, u_id_2)
+    assert is_owner(get_channel(channel_id), u_id_2) == False
+    assert is_member(get_channel(channel_id), u_id_2) == True
+
+    # Leaving takes a member off the owners too
+    channel_addowner_v1(users[0]["token"], channel_id, u_id_2)
+    channel_leave_v1(users[1]["token"], channel_id)
+    assert is_owner(get_channel(channel_id), u_id_2) == False
+    assert get_channel(channel_id)["all_members"] == [u_id_1]
+    assert is_owner(get_channel(channel_id), [u_id_1]) == False
+
+    update_data_read()
+    assert is_owner(get_channel(channel_id), u_id_1) == True
+    assert is_owner(get_dm(dm_id), u_id_1) == True
+
+    dm_remove_v1(users[0]["token"], dm_id)
+    assert dms_by_owner[u_id_1] == set()
@@ -0,0 +1,192 @@
+import pytest
+import os
+import json
+import time
+
+from src import config
+from src.auth import auth_register_v2
+from src.channels import channels_create_v2
+from src.channel import channel_messages_v2, channel_messages_range_v1
+from src.dm import dm_create_v1, dm_messages_v1
+from src.message import message_send_v2, message_senddm_v1, message_remove_v1, message_edit_v2
+from src.other import clear_v1, search_v2, update_data_read, update_data_write
+from src.data import messages_by_id
+from src.error import InputError
+from src.journal import JOURNAL_PATH, journal_state
+from src.segments import SEGMENT_DIR, changed_segments
+from src.store import get_channel, find_message
+
+
+@pytest.fixture
+def user():
+    clear_v1()
+    return auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+
+@pytest.fixture
+def channel(user):
+    channel_id = channels_create_v2(user["token"], "channel", True)["channel_id"]
+    message_ids = [message_send_v2(user["token"], channel_id, f"msg{idx:03d}")["message_id"]
+                   for idx in range(120)]
+    return channel_id, message_ids
+
+def texts(messages):
+    return [message["message"] for message in messages]
+
+def expected(removed, count=120):
+    return [f"msg{idx:03d}" for idx in range(count - 1, -1, -1) if idx not in removed]
+
+def check_pages(user, channel_id, removed):
+    messages = []
+    start = 0
+    while start != -1:
+        result = channel_messages_v2(user["token"], channel_id, start)
+        assert len(result["messages"]) == 50 or result["end"] == -1
+        messages.extend(result["messages"])
+        start = result["end"]
+
+    assert texts(messages) == expected(removed)
+
+def test_removed_messages_skipped(user, channel):
+    channel_id, message_ids = channel
+    removed = set(range(0, 120, 3)) | {119, 118}
+    positions = {message_id: messages_by_id[message_id][2] for message_id in message_ids}
+
+    for idx in removed:
+        message_remove_v1(user["token"], message_ids[idx])
+
+    # Nothing moves, removed messages are left in place as tombstones
+    assert len(get_channel(channel_id)["messages"]) == 120
+    for idx, message_id in enumerate(message_ids):
+        if idx in removed:
+            assert find_message(message_id) is None
+        else:
+            assert messages_by_id[message_id][2] == positions[message_id]
+
+    check_pages(user, channel_id, removed)
+
+    with pytest.raises(InputError):
+        channel_messages_v2(user["token"], channel_id, 120 - len(removed) + 1)
+
+    result = channel_messages_v2(user["token"], channel_id, 0, message_ids[50])
+    assert texts(result["messages"]) == [text for text in expected(removed) if text < "msg050"][:50]
+
+    assert texts(search_v2(user["token"], "msg11")["messages"]) == \
+        [f"msg{idx}" for idx in range(110, 118) if idx not in removed]
+    assert "msg003" not in texts(search_v2(user["token"], "3")["messages"])
+
+def test_tombstones_replayed(user, channel):
+    channel_id, message_ids = channel
+    removed = {5, 60, 61, 119}
+    for idx in removed:
+        message_remove_v1(user["token"], message_ids[idx])
+    message_edit_v2(user["token"], message_ids[100], "")
+    removed.add(100)
+
+    update_data_read()
+    assert get_channel(channel_id)["tombstones"] == sorted(removed)
+    check_pages(user, channel_id, removed)
+
+def test_compaction(user, channel, monkeypatch):
+    monkeypatch.setattr(config, "tombstone_compact_threshold", 10)
+    channel_id, message_ids = channel
+    removed = set(range(100, 120, 2))
+
+    for idx in removed:
+        message_remove_v1(user["token"], message_ids[idx])
+
+    # The last removal passes the threshold, so a snapshot compacts the channel in the background
+    for _ in range(100):
+        if journal_state["compacting"] == False and get_channel(channel_id)["tombstones"] == []:
+            break
+        time.sleep(0.05)
+    assert get_channel(channel_id)["tombstones"] == []
+    assert len(get_channel(channel_id)["messages"]) == 110
+
+    check_pages(user, channel_id, removed)
+    assert find_message(message_ids[119])[2]["message"] == "msg119"
+
+    update_data_read()
+    check_pages(user, channel_id, removed)
+
+def test_compaction_crash(user, channel, monkeypatch):
+    channel_id, message_ids = channel
+    removed = {1, 2, 3}
+    for idx in removed:
+        message_remove_v1(user["token"], message_ids[idx])
+    with open(JOURNAL_PATH, "r") as FILE:
+        lines = FILE.readlines()
+
+    # A crash after the compacted snapshot is written but before the journal is
+    # truncated leaves removals at positions which have since moved
+    monkeypatch.setattr(config, "tombstone_compact_threshold", 1)
+    update_data_write()
+    monkeypatch.undo()
+    assert get_channel(channel_id)["tombstones"] == []
+    with open(JOURNAL_PATH, "a") as FILE:
+        FILE.writelines(lines)
+
+    # Removals made after the snapshot are still replayed
+    message_remove_v1(user["token"], message_ids[119])
+    removed.add(119)
+    with open(JOURNAL_PATH, "r") as FILE:
+        assert [json.loads(line)["op"] for line in FILE].count("message_remove") == 4
+
+    update_data_read()
+    check_pages(user, channel_id, removed)
+
+    clear_v1()
+
+def test_sealed_tombstones(user, channel, monkeypatch):
+    monkeypatch.setattr(config, "hot_message_count", 20)
+    monkeypatch.setattr(config, "segment_size", 25)
+    channel_id, message_ids = channel
+    update_data_write()
+    files = sorted(os.listdir(SEGMENT_DIR))
+    assert len(files) == 4
+
+    # Removing a sealed message does not change its segment
+    removed = {0, 30, 99}
+    for idx in removed:
+        message_remove_v1(user["token"], message_ids[idx])
+    assert changed_segments == {}
+    check_pages(user, channel_id, removed)
+    assert texts(search_v2(user["token"], "msg03")["messages"]) == [f"msg{idx:03d}" for idx in range(31, 40)]
+
+    update_data_read()
+    check_pages(user, channel_id, removed)
+
+    # Compacting rewrites the segments holding tombstones
+    monkeypatch.setattr(config, "tombstone_compact_threshold", 1)
+    update_data_write()
+    assert get_channel(channel_id)["tombstones"] == []
+    assert len(set(os.listdir(SEGMENT_DIR)) & set(files)) == 1
+    check_pages(user, channel_id, removed)
+
+    update_data_read()
+    check_pages(user, channel_id, removed)
+
+    clear_v1()
+
+def test_dm_tombstones(user):
+    dm_id = dm_create_v1(user["token"], [])["dm_id"]
+    message_ids = [message_senddm_v1(user["token"], dm_id, f"{idx}")["message_id"] for idx in range(5)]
+    message_remove_v1(user["token"], message_ids[3])
+
+    result = dm_messages_v1(user["token"], dm_id, 0, message_ids[4])
+    assert texts(result["messages"]) == ["2", "1", "0"]
+    assert texts(dm_messages_v1(user["token"], dm_id, 1)["messages"]) == ["2", "1", "0"]
+
+def test_range_skips_removed(user, channel):
+    channel_id, message_ids = channel
+    removed = {119, 117, 50}
+    for idx in removed:
+        message_remove_v1(user["token"], message_ids[idx])
+
+    now = int(time.time())
+    result = channel_messages_range_v1(user["token"], channel_id, now - 100, now + 100)
+    assert texts(result["messages"]) == expected(removed)[:50]
+    result = channel_messages_range_v1(user["token"], channel_id, now - 100, now + 100, 50)
+    assert texts(result["messages"]) == expected(removed)[50:100]
+    result = channel_messages_range_v1(user["token"], channel_id, now - 100, now + 100, 100)
+    assert texts(result["messages"]) == expected(removed)[100:]
+    assert result["end"] == -1
@@ -0,0 +1,73 @@
+import pytest
+import json
+import time
+
+from src import config
+from src.auth import auth_register_v2
+from src.channels import channels_create_v2
+from src.message import message_send_v2
+from src.other import clear_v1, update_data_flush
+
+
+@pytest.fixture
+def group_mode(monkeypatch):
+    monkeypatch.setattr(config, "persistence_mode", "group")
+    monkeypatch.setattr(config, "persistence_flush_interval_ms", 500)
+    monkeypatch.setattr(config, "persistence_flush_mutations", 1000)
+    yield
+    clear_v1()
+
+@pytest.fixture
+def user(group_mode):
+    clear_v1()
+    return auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+
+def read_snapshot():
+    with open("./src/data.json", "r") as FILE:
+        return json.load(FILE)
+
+def wait_for_messages(number):
+    for _ in range(50):
+        data = read_snapshot()
+        if data["channels"] and len(data["channels"][0]["messages"]) == number:
+            return data
+        time.sleep(0.1)
+    return read_snapshot()
+
+def test_mutations_are_coalesced(user):
+    channel_id = channels_create_v2(user["token"], "channel", True)["channel_id"]
+    for idx in range(5):
+        message_send_v2(user["token"], channel_id, f"message {idx}")
+
+    # Nothing has been written yet, the durability window is still open
+    assert read_snapshot()["users"] == []
+
+    data = wait_for_messages(5)
+    assert len(data["users"]) == 1
+    assert len(data["channels"][0]["messages"]) == 5
+
+def test_flush_after_enough_mutations(user, monkeypatch):
+    monkeypatch.setattr(config, "persistence_flush_interval_ms", 60000)
+    monkeypatch.setattr(config, "persistence_flush_mutations", 3)
+
+    channel_id = channels_create_v2(user["token"], "channel", True)["channel_id"]
+    message_send_v2(user["token"], channel_id, "hello")
+
+    data = wait_for_messages(1)
+    assert len(data["channels"][0]["messages"]) == 1
+
+def test_explicit_flush(user):
+    channel_id = channels_create_v2(user["token"], "channel", True)["channel_id"]
+    message_send_v2(user["token"], channel_id, "hello")
+
+    update_data_flush()
+    assert len(read_snapshot()["channels"][0]["messages"]) == 1
+
+def test_clear_flushes(user):
+    clear_v1()
+    data = read_snapshot()
+    assert data.pop("journal_generation") > 0
+    assert data == {
+        "users": [], "channels": [], "dms": [], "notifications": [], "reset_codes": [],
+        "scheduled_jobs": [], "id_counters": {"users": 1, "channels": 1, "dms": 1, "segments": 1}
+    }
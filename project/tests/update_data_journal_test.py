@@ -0,0 +1,135 @@
+import pytest
+import json
+import time
+
+from src import config
+from src.auth import auth_register_v2
+from src.channels import channels_create_v2
+from src.message import message_send_v2, message_edit_v2, message_remove_v1, message_react_v1
+from src.channel import channel_messages_v2, channel_join_v2
+from src.other import clear_v1, update_data_read, update_data_write, notifications_get_v1
+from src.journal import JOURNAL_PATH
+
+
+@pytest.fixture
+def users():
+    clear_v1()
+    user = auth_register_v2('validemail@gmail.com', '123abc!@#', 'M', 'J')
+    user_2 = auth_register_v2('anothervalidemail@gmail.com', '123abc!@#', 'Hayden', 'Smith')
+    return [user, user_2]
+
+@pytest.fixture
+def channel(users):
+    return channels_create_v2(users[0]["token"], "user 1's channel", True)["channel_id"]
+
+def read_journal():
+    with open(JOURNAL_PATH, "r") as FILE:
+        return [json.loads(line) for line in FILE]
+
+def test_message_send_appends_to_journal(users, channel):
+    message_id = message_send_v2(users[0]["token"], channel, "hello")["message_id"]
+
+    records = read_journal()
+    assert records[-1]["op"] == "message_add"
+    assert records[-1]["channel_id"] == channel
+    assert records[-1]["message"]["message_id"] == message_id
+
+    # The snapshot is not rewritten for a message
+    with open("./src/data.json", "r") as FILE:
+        data = json.load(FILE)
+    assert data["channels"][0]["messages"] == []
+
+def test_replay_restores_mutations(users, channel):
+    message_id_1 = message_send_v2(users[0]["token"], channel, "hello @haydensmith")["message_id"]
+    message_id_2 = message_send_v2(users[0]["token"], channel, "second")["message_id"]
+    message_id_3 = message_send_v2(users[0]["token"], channel, "third")["message_id"]
+    message_edit_v2(users[0]["token"], message_id_1, "edited")
+    message_remove_v1(users[0]["token"], message_id_2)
+    message_react_v1(users[0]["token"], message_id_3, 1)
+
+    update_data_read()
+
+    messages = channel_messages_v2(users[0]["token"], channel, 0)["messages"]
+    assert [message["message_id"] for message in messages] == [message_id_3, message_id_1]
+    assert messages[0]["reacts"][0]["u_ids"] == [users[0]["auth_user_id"]]
+    assert messages[1]["message"] == "edited"
+
+    # users[1] was not a member of the channel, so was never tagged
+    assert notifications_get_v1(users[1]["token"]) == {"notifications": []}
+
+    clear_v1()
+
+def test_replay_is_idempotent(users, channel):
+    message_send_v2(users[0]["token"], channel, "hello")
+    records = read_journal()
+
+    # Snapshot now contains the message, replaying the stale record must not duplicate it
+    update_data_write()
+    with open(JOURNAL_PATH, "a") as FILE:
+        for record in records:
+            FILE.write(json.dumps(record) + "\n")
+
+    update_data_read()
+    assert len(channel_messages_v2(users[0]["token"], channel, 0)["messages"]) == 1
+
+    clear_v1()
+
+def test_notification_replay_is_idempotent(users, channel):
+    channel_join_v2(users[1]["token"], channel)
+    message_id = message_send_v2(users[0]["token"], channel, "hello @haydensmith")["message_id"]
+    message_react_v1(users[1]["token"], message_id, 1)
+    records = read_journal()
+    assert [record["op"] for record in records].count("notification_add") == 2
+
+    # A crash after the snapshot is written but before the journal is truncated
+    update_data_write()
+    with open(JOURNAL_PATH, "a") as FILE:
+        for record in records:
+            FILE.write(json.dumps(record) + "\n")
+
+    update_data_read()
+    assert len(notifications_get_v1(users[1]["token"])["notifications"]) == 1
+    assert len(notifications_get_v1(users[0]["token"])["notifications"]) == 1
+
+    clear_v1()
+
+def test_partial_record_ignored(users, channel):
+    message_send_v2(users[0]["token"], channel, "hello")
+    with open(JOURNAL_PATH, "a") as FILE:
+        FILE.write('{"op": "message_add", "chan')
+
+    update_data_read()
+    assert len(channel_messages_v2(users[0]["token"], channel, 0)["messages"]) == 1
+
+    clear_v1()
+
+def test_compaction(users, channel, monkeypatch):
+    monkeypatch.setattr(config, "journal_compact_threshold", 3)
+
+    for idx in range(3):
+        message_send_v2(users[0]["token"], channel, f"message {idx}")
+
+    # Compaction runs in the background
+    for _ in range(50):
+        if read_journal() == []:
+            break
+        time.sleep(0.1)
+
+    assert read_journal() == []
+    with open("./src/data.json", "r") as FILE:
+        data = json.load(FILE)
+    assert len(data["channels"][0]["messages"]) == 3
+
+    clear_v1()
+
+def test_snapshot_mode(users, channel, monkeypatch):
+    monkeypatch.setattr(config, "persistence_mode", "snapshot")
+
+    message_send_v2(users[0]["token"], channel, "hello")
+
+    assert read_journal() == []
+    with open("./src/data.json", "r") as FILE:
+        data = json.load(FILE)
+    assert data["channels"][0]["messages"][0]["message"] == "hello"
+
+    clear_v1()